@@ -1,17 +1,27 @@
 import os
+import sys
 
 from aws_cdk import core
 from aws_cdk.core import Tags
 
 from infrastructure.infrastructure_stack import InfrastructureStack
 from infrastructure.utils.environment import Environment
+from infrastructure.utils.synth_cache import SynthCache
 
 app = core.App()
 env_name = os.environ.get("ENVIRONMENT", "dev")
+env_path = f"infrastructure/parameters/{env_name}.json"
 
-params = Environment.from_file(env_path=f"infrastructure/parameters/{env_name}.json", uncommitted_env_path="infrastructure/parameters/uncommitted/.env.json")
+params = Environment.from_file(env_path=env_path, uncommitted_env_path="infrastructure/parameters/uncommitted/.env.json")
+
+synth_cache = SynthCache.from_environment(env_path=env_path, params=params)
+if synth_cache and synth_cache.restore(app.outdir):
+    sys.exit(0)
 
 main_stack = InfrastructureStack(app, "CC-MainStack",
                                  env=core.Environment(region="eu-west-1"), params=params)
 Tags.of(main_stack).add("stack_name", "ChristianCalabreseStack")
-app.synth()
\ No newline at end of file
+app.synth()
+
+if synth_cache:
+    synth_cache.store(app.outdir)
@@ -60,3 +60,161 @@ Create the name of the service account to use
 {{- default "default" .Values.serviceAccount.name }}
 {{- end }}
 {{- end }}
+
+{{/*
+Service type, pods registered as ALB ip targets don't need a NodePort
+*/}}
+{{- define "ccekswebserver.serviceType" -}}
+{{- if eq .Values.ingress.targetType "ip" }}
+{{- "ClusterIP" }}
+{{- else }}
+{{- .Values.service.type }}
+{{- end }}
+{{- end }}
+
+{{/*
+ALB ingress annotations generated from the target type, target group attributes and health check values
+*/}}
+{{- define "ccekswebserver.ingressAnnotations" -}}
+{{- with .Values.ingress.annotations }}
+{{ toYaml . }}
+{{- end }}
+alb.ingress.kubernetes.io/target-type: {{ .Values.ingress.targetType }}
+{{- if .Values.rollout.enabled }}
+{{- $fullName := include "ccekswebserver.fullname" . }}
+{{- $port := .Values.service.port | toString }}
+{{- $stable := dict "serviceName" $fullName "servicePort" $port "weight" 100 }}
+{{- $canary := dict "serviceName" (printf "%s-canary" $fullName) "servicePort" $port "weight" 0 }}
+{{- $action := dict "type" "forward" "forwardConfig" (dict "targetGroups" (list $canary $stable)) }}
+{{- /* Initial forward action of the use-annotation backend, all to the stable service until Argo Rollouts sets the
+weights. Helm only patches it again when this value changes, the weights of a running canary are kept */}}
+alb.ingress.kubernetes.io/actions.{{ $fullName }}: {{ toJson $action | quote }}
+{{- end }}
+{{- with .Values.connection }}
+alb.ingress.kubernetes.io/load-balancer-attributes: {{ printf "idle_timeout.timeout_seconds=%v,routing.http2.enabled=%t" .idleTimeoutSeconds .http2 | quote }}
+{{- end }}
+{{- with .Values.ingress.targetGroupAttributes }}
+{{- $attributes := list }}
+{{- range $key, $value := . }}
+{{- $attributes = append $attributes (printf "%s=%v" $key $value) }}
+{{- end }}
+alb.ingress.kubernetes.io/target-group-attributes: {{ join "," $attributes | quote }}
+{{- end }}
+{{- with .Values.ingress.healthCheck }}
+alb.ingress.kubernetes.io/healthcheck-path: {{ .path }}
+alb.ingress.kubernetes.io/healthcheck-interval-seconds: {{ .intervalSeconds | quote }}
+alb.ingress.kubernetes.io/healthcheck-timeout-seconds: {{ .timeoutSeconds | quote }}
+alb.ingress.kubernetes.io/healthy-threshold-count: {{ .healthyThreshold | quote }}
+alb.ingress.kubernetes.io/unhealthy-threshold-count: {{ .unhealthyThreshold | quote }}
+{{- end }}
+{{- end }}
+
+{{/*
+nginx configuration environment variables, rendered into the image templates at startup
+*/}}
+{{- define "ccekswebserver.nginxEnv" -}}
+- name: NGINX_WORKER_PROCESSES
+  value: {{ .Values.nginx.workerProcesses | quote }}
+- name: NGINX_WORKER_CONNECTIONS
+  value: {{ .Values.nginx.workerConnections | quote }}
+- name: NGINX_WORKER_RLIMIT_NOFILE
+  value: {{ .Values.nginx.workerRlimitNofile | quote }}
+- name: NGINX_LISTEN_BACKLOG
+  value: {{ .Values.nginx.listenBacklog | quote }}
+- name: NGINX_KEEPALIVE_TIMEOUT
+  value: {{ .Values.connection.keepaliveTimeout | quote }}
+- name: NGINX_KEEPALIVE_REQUESTS
+  value: {{ .Values.connection.keepaliveRequests | quote }}
+- name: NGINX_OPEN_FILE_CACHE_MAX
+  value: {{ .Values.nginx.openFileCache.max | quote }}
+- name: NGINX_OPEN_FILE_CACHE_INACTIVE
+  value: {{ .Values.nginx.openFileCache.inactive | quote }}
+- name: NGINX_OPEN_FILE_CACHE_VALID
+  value: {{ .Values.nginx.openFileCache.valid | quote }}
+- name: NGINX_GZIP
+  value: {{ ternary "on" "off" .Values.nginx.gzip.enabled | quote }}
+- name: NGINX_GZIP_COMP_LEVEL
+  value: {{ .Values.nginx.gzip.compLevel | quote }}
+- name: NGINX_ASSET_MAX_AGE
+  value: {{ .Values.nginx.assetMaxAge | quote }}
+{{- end }}
+
+{{/*
+Node affinity towards the preferred node lifecycle, unless an affinity is given explicitly
+*/}}
+{{- define "ccekswebserver.affinity" -}}
+{{- if .Values.affinity }}
+{{- toYaml .Values.affinity }}
+{{- else if .Values.scheduling.preferredLifecycle }}
+nodeAffinity:
+  preferredDuringSchedulingIgnoredDuringExecution:
+    - weight: {{ .Values.scheduling.preferredLifecycleWeight }}
+      preference:
+        matchExpressions:
+          - key: lifecycle
+            operator: In
+            values:
+              - {{ .Values.scheduling.preferredLifecycle }}
+{{- end }}
+{{- end }}
+
+{{/*
+Tolerations, the PreferNoSchedule taint of the spot nodes is tolerated when they are the preferred ones
+*/}}
+{{- define "ccekswebserver.tolerations" -}}
+{{- with .Values.tolerations }}
+{{ toYaml . }}
+{{- end }}
+{{- if eq .Values.scheduling.preferredLifecycle "Ec2Spot" }}
+- key: spotInstance
+  operator: Equal
+  value: "true"
+  effect: PreferNoSchedule
+{{- end }}
+{{- end }}
+
+{{/*
+Topology spread constraints of the pods across the zones and the nodes
+*/}}
+{{- define "ccekswebserver.topologySpreadConstraints" -}}
+{{- range $spread, $topologyKey := dict "zone" "topology.kubernetes.io/zone" "node" "kubernetes.io/hostname" }}
+{{- with index $.Values.scheduling.topologySpread $spread }}
+{{- if .enabled }}
+- maxSkew: {{ .maxSkew }}
+  topologyKey: {{ $topologyKey }}
+  whenUnsatisfiable: {{ .whenUnsatisfiable }}
+  labelSelector:
+    matchLabels:
+      {{- include "ccekswebserver.selectorLabels" $ | nindent 6 }}
+{{- end }}
+{{- end }}
+{{- end }}
+{{- end }}
+
+{{/*
+Canary strategy of the Rollout: the ALB weights of the stable and canary target groups are shifted step by step while
+the analysis of the canary pods runs in the background, a failed analysis aborts the rollout and sends all the
+traffic back to the stable pods
+*/}}
+{{- define "ccekswebserver.canaryStrategy" -}}
+{{- $fullName := include "ccekswebserver.fullname" . -}}
+canary:
+  stableService: {{ $fullName }}
+  canaryService: {{ $fullName }}-canary
+  trafficRouting:
+    alb:
+      ingress: {{ $fullName }}
+      servicePort: {{ .Values.service.port }}
+  analysis:
+    templates:
+      - templateName: {{ $fullName }}-canary
+    startingStep: 1
+    args:
+      - name: canary-hash
+        valueFrom:
+          podTemplateHashValue: Latest
+  {{- with .Values.rollout.steps }}
+  steps:
+    {{- toYaml . | nindent 4 }}
+  {{- end }}
+{{- end }}
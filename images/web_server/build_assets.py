@@ -0,0 +1,217 @@
+"""Static asset pipeline of the web server image.
+
+Minifies text assets, fingerprints the file names of everything but the html entry points, rewrites the
+references to the fingerprinted names and writes gzip and brotli precompressed copies next to every
+compressible file, to be served by nginx gzip_static/brotli_static. Only the html src/href and css url()
+references are rewritten, so every fingerprinted file is also written under its original name for the
+other ones (js imports and fetches, srcset, manifests, external links), served with a revalidating
+Cache-Control by nginx.
+
+Processed files are stored in a content addressed cache directory, so that a rebuild only minifies and
+compresses the files whose content changed:
+
+    python build_assets.py site public --cache-dir .asset-cache
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import brotli
+except ImportError:  # the brotli copies are skipped when the package isn't installed
+    brotli = None
+
+# Bump to invalidate the cache when the processing below changes
+PIPELINE_VERSION = "1"
+
+HTML_EXTENSIONS = {".html", ".htm"}
+CSS_EXTENSIONS = {".css"}
+COMPRESSIBLE_EXTENSIONS = {".html", ".htm", ".css", ".js", ".mjs", ".json", ".svg", ".txt", ".xml", ".map",
+                           ".ico", ".ttf", ".otf", ".eot", ".wasm"}
+# Files requested by well known urls keep their names, like the html entry points
+ENTRY_POINT_NAMES = {"robots.txt", "favicon.ico", "sitemap.xml", "asset-manifest.json"}
+MIN_COMPRESS_SIZE = 1024
+FINGERPRINT_LENGTH = 8
+
+REFERENCE_PATTERNS = [
+    re.compile(r'(?P<prefix>(?:src|href)\s*=\s*["\'])(?P<path>[^"\'#?]+)'),
+    re.compile(r'(?P<prefix>url\(\s*["\']?)(?P<path>[^"\')#?]+)'),
+]
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def fingerprinted_name(relative_path: str, data: bytes) -> str:
+    base, extension = os.path.splitext(relative_path)
+    return f"{base}.{content_hash(data)[:FINGERPRINT_LENGTH]}{extension}"
+
+
+def extension_of(relative_path: str) -> str:
+    return os.path.splitext(relative_path)[1].lower()
+
+
+def is_entry_point(relative_path: str) -> bool:
+    return extension_of(relative_path) in HTML_EXTENSIONS or relative_path in ENTRY_POINT_NAMES \
+        or relative_path.startswith(".well-known/")
+
+
+def minify_html(text: str) -> str:
+    text = re.sub(r"<!--(?!\[if).*?-->", "", text, flags=re.DOTALL)
+    if not re.search(r"<(pre|textarea)[\s>]", text, flags=re.IGNORECASE):
+        # a single space keeps the separation between inline elements
+        text = re.sub(r">\s+<", "> <", text)
+    return text.strip()
+
+
+def minify_css(text: str) -> str:
+    text = re.sub(r"/\*.*?\*/", "", text, flags=re.DOTALL)
+    text = re.sub(r"\s+", " ", text)
+    text = re.sub(r"\s*([{};,>])\s*", r"\1", text)
+    return text.replace(";}", "}").strip()
+
+
+def minify(extension: str, data: bytes) -> bytes:
+    if extension in HTML_EXTENSIONS:
+        return minify_html(data.decode()).encode()
+    if extension in CSS_EXTENSIONS:
+        return minify_css(data.decode()).encode()
+    if extension == ".json":
+        return json.dumps(json.loads(data), separators=(",", ":")).encode()
+    return data
+
+
+def compress(data: bytes) -> dict:
+    variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants[".br"] = brotli.compress(data, quality=11)
+    # precompressed copies that don't save space would only waste disk and cpu at serve time
+    return {suffix: compressed for suffix, compressed in variants.items() if len(compressed) < len(data)}
+
+
+def process(job):
+    """Minify and compress a single file, storing the results in the cache entry of its content."""
+    extension, data, entry_dir = job
+    if os.path.exists(os.path.join(entry_dir, "done")):
+        return False
+    os.makedirs(entry_dir, exist_ok=True)
+    minified = minify(extension, data)
+    with open(os.path.join(entry_dir, "file"), "wb") as f:
+        f.write(minified)
+    if extension in COMPRESSIBLE_EXTENSIONS and len(minified) >= MIN_COMPRESS_SIZE:
+        for suffix, compressed in compress(minified).items():
+            with open(os.path.join(entry_dir, f"file{suffix}"), "wb") as f:
+                f.write(compressed)
+    open(os.path.join(entry_dir, "done"), "w").close()
+    return True
+
+
+def rewrite_references(text: str, source_path: str, manifest: dict) -> str:
+    directory = os.path.dirname(source_path)
+
+    def replace(match):
+        path = match.group("path")
+        if re.match(r"^[a-z]+:|^//", path):
+            return match.group(0)
+        relative = path.lstrip("/") if path.startswith("/") else os.path.normpath(os.path.join(directory, path))
+        target = manifest.get(relative)
+        if target is None:
+            return match.group(0)
+        if path.startswith("/"):
+            return f"{match.group('prefix')}/{target}"
+        return f"{match.group('prefix')}{os.path.relpath(target, directory or '.')}"
+
+    for pattern in REFERENCE_PATTERNS:
+        text = pattern.sub(replace, text)
+    return text
+
+
+def list_files(source_dir: str) -> list:
+    files = []
+    for root, dirs, names in os.walk(source_dir):
+        dirs.sort()
+        for name in sorted(names):
+            files.append(os.path.relpath(os.path.join(root, name), source_dir).replace(os.sep, "/"))
+    return files
+
+
+def build(source_dir: str, output_dir: str, cache_dir: str, workers: int = None) -> dict:
+    """Returns the manifest of the fingerprinted names and how many files had to be processed."""
+    files = list_files(source_dir)
+    # Assets referenced by stylesheets are fingerprinted first, then stylesheets, then html
+    stages = [
+        [f for f in files if extension_of(f) not in HTML_EXTENSIONS | CSS_EXTENSIONS],
+        [f for f in files if extension_of(f) in CSS_EXTENSIONS],
+        [f for f in files if extension_of(f) in HTML_EXTENSIONS],
+    ]
+    manifest = {}
+    processed = 0
+    if os.path.exists(output_dir):
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir)
+
+    # a single worker processes the files in this process, skipping the pool start up
+    executor = ProcessPoolExecutor(max_workers=workers) if workers != 1 else None
+    try:
+        for stage in stages:
+            jobs = []
+            for relative_path in stage:
+                extension = extension_of(relative_path)
+                with open(os.path.join(source_dir, relative_path), "rb") as f:
+                    data = f.read()
+                if extension in HTML_EXTENSIONS | CSS_EXTENSIONS:
+                    data = rewrite_references(data.decode(), relative_path, manifest).encode()
+                key = content_hash(PIPELINE_VERSION.encode() + extension.encode() + data)
+                entry_dir = os.path.join(cache_dir, key[:2], key)
+                jobs.append((relative_path, extension, data, entry_dir))
+
+            # identical files share the same cache entry and are processed once
+            unique_jobs = {entry_dir: (extension, data, entry_dir) for _, extension, data, entry_dir in jobs}
+            if executor:
+                results = executor.map(process, unique_jobs.values(), chunksize=64)
+            else:
+                results = map(process, unique_jobs.values())
+            processed += sum(results)
+
+            for relative_path, extension, data, entry_dir in jobs:
+                with open(os.path.join(entry_dir, "file"), "rb") as f:
+                    minified = f.read()
+                target = relative_path if is_entry_point(relative_path) else fingerprinted_name(relative_path,
+                                                                                               minified)
+                manifest[relative_path] = target
+                for name in os.listdir(entry_dir):
+                    if name.startswith("file"):
+                        for output_name in {target, relative_path}:
+                            destination = os.path.join(output_dir, output_name + name[len("file"):])
+                            os.makedirs(os.path.dirname(destination), exist_ok=True)
+                            shutil.copyfile(os.path.join(entry_dir, name), destination)
+    finally:
+        if executor:
+            executor.shutdown()
+
+    with open(os.path.join(output_dir, "asset-manifest.json"), "w") as f:
+        f.write(json.dumps(manifest, indent=2, sort_keys=True))
+    return {"manifest": manifest, "processed": processed, "total": len(files)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Minify, fingerprint and precompress the web server assets")
+    parser.add_argument("source_dir")
+    parser.add_argument("output_dir")
+    parser.add_argument("--cache-dir", default=".asset-cache")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    result = build(args.source_dir, args.output_dir, args.cache_dir, args.workers)
+    print(f"Processed {result['processed']} of {result['total']} files, the others were cached")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@ from aws_cdk import (
     core as cdk
 )
 
+from infrastructure.stacks.cdn_stack import CdnStack
 from infrastructure.stacks.eks_stack import EksStack
 from infrastructure.stacks.pipeline_stack import PipelineStack
 from infrastructure.stacks.vpc_stack import VpcStack
@@ -15,5 +16,9 @@ class InfrastructureStack(cdk.Stack):
         self.eks_stack = EksStack(scope=self, id="EKSStack", params=params,
                                   vpc_stack=self.vpc_stack)
 
+        cdn_params = params.get("cdn", None)
+        if cdn_params and cdn_params.enabled:
+            self.cdn_stack = CdnStack(scope=self, id="CdnStack", params=params, eks_stack=self.eks_stack)
+
         if params.get("ci_cd_enabled", False):
             self.pipeline_stack = PipelineStack(scope=self, id="PipelineStack", params=params, eks_stack=self.eks_stack)
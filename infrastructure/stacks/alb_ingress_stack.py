@@ -4,6 +4,14 @@ from aws_cdk import (
     core,
 )
 
+from infrastructure.utils.capacity import parse_duration
+
+LOAD_BALANCING_ALGORITHMS = ["round_robin", "least_outstanding_requests"]
+# Bounds of the ALB idle_timeout.timeout_seconds attribute
+MAX_IDLE_TIMEOUT_SECONDS = 4000
+# Below this nginx closes the ALB connections so often that they are reopened at every burst
+MIN_KEEPALIVE_REQUESTS = 100
+
 
 class ALBIngressController(core.Construct):
 
@@ -219,4 +227,64 @@ class ALBIngressController(core.Construct):
             ]
         }
 
-        alb_controller = eks.AlbController(self, "ALBIngressDeployment", cluster=cluster, version=eks.AlbControllerVersion.V2_3_0)
\ No newline at end of file
+        self.ingress_params = params.eks.web_server_ingress
+        self.validate_ingress_params()
+        self.connection_params = params.eks.web_server_connection
+        self.cdn_params = params.get("cdn", None)
+        self.validate_connection_params()
+
+        alb_controller = eks.AlbController(self, "ALBIngressDeployment", cluster=cluster, version=eks.AlbControllerVersion.V2_3_0)
+
+    def validate_ingress_params(self):
+        if self.ingress_params.target_type not in ("instance", "ip"):
+            raise ValueError(f"Unsupported ALB target type {self.ingress_params.target_type}, use instance or ip")
+        if self.ingress_params.load_balancing_algorithm not in LOAD_BALANCING_ALGORITHMS:
+            raise ValueError(f"Unsupported load balancing algorithm {self.ingress_params.load_balancing_algorithm}")
+        if self.ingress_params.load_balancing_algorithm == "least_outstanding_requests" \
+                and self.ingress_params.slow_start_seconds:
+            raise ValueError("ALB target groups can't combine slow start with least outstanding requests")
+
+    def validate_connection_params(self):
+        idle_timeout = self.connection_params.idle_timeout_seconds
+        if not 1 <= idle_timeout <= MAX_IDLE_TIMEOUT_SECONDS:
+            raise ValueError(f"idle_timeout_seconds of the web server ALB must be between 1 and "
+                             f"{MAX_IDLE_TIMEOUT_SECONDS}")
+        # An idle connection closed by nginx first can be picked by the ALB for a new request, answered with a 502
+        if parse_duration(self.connection_params.keepalive_timeout) <= idle_timeout:
+            raise ValueError(f"keepalive_timeout of nginx ({self.connection_params.keepalive_timeout}) must be longer "
+                             f"than the ALB idle timeout ({idle_timeout}s)")
+        if self.connection_params.keepalive_requests < MIN_KEEPALIVE_REQUESTS:
+            raise ValueError(f"keepalive_requests of nginx must be at least {MIN_KEEPALIVE_REQUESTS}")
+        # The same goes for the connections CloudFront keeps open to the ALB
+        if self.cdn_params and self.cdn_params.enabled and \
+                self.cdn_params.origin_keepalive_timeout_seconds >= idle_timeout:
+            raise ValueError(f"origin_keepalive_timeout_seconds of the CDN must be shorter than the ALB idle timeout "
+                             f"({idle_timeout}s)")
+
+    def web_server_connection_values(self):
+        return {
+            "idleTimeoutSeconds": self.connection_params.idle_timeout_seconds,
+            "http2": self.connection_params.http2,
+            "keepaliveTimeout": self.connection_params.keepalive_timeout,
+            "keepaliveRequests": self.connection_params.keepalive_requests
+        }
+
+    def web_server_ingress_values(self):
+        health_check = self.ingress_params.health_check
+        target_group_attributes = {
+            "deregistration_delay.timeout_seconds": self.ingress_params.deregistration_delay_seconds,
+            "load_balancing.algorithm.type": self.ingress_params.load_balancing_algorithm
+        }
+        if self.ingress_params.slow_start_seconds:
+            target_group_attributes["slow_start.duration_seconds"] = self.ingress_params.slow_start_seconds
+        return {
+            "targetType": self.ingress_params.target_type,
+            "targetGroupAttributes": target_group_attributes,
+            "healthCheck": {
+                "path": health_check.path,
+                "intervalSeconds": health_check.interval_seconds,
+                "timeoutSeconds": health_check.timeout_seconds,
+                "healthyThreshold": health_check.healthy_threshold,
+                "unhealthyThreshold": health_check.unhealthy_threshold
+            }
+        }
\ No newline at end of file
@@ -0,0 +1,77 @@
+from aws_cdk import (
+    aws_eks as eks,
+    core,
+)
+
+PROMETHEUS_ADDRESS = "http://prometheus-server.prometheus.svc.cluster.local"
+
+
+class ArgoRollouts(core.Construct):
+    """Argo Rollouts controller, running the progressive delivery of the web server.
+
+    With `eks.web_server_rollout.enabled` the web server chart adds a Rollout referencing its Deployment, which is
+    scaled to 0 by `scale_down_deployment` once the Rollout is healthy. A new version
+    receives the weights of `steps` through the ALB stable and canary target groups, while an analysis queries
+    Prometheus for the error rate and p95 latency of the canary pods. When a query fails `failure_limit` times the
+    rollout is aborted and all the traffic goes back to the stable pods.
+    """
+
+    def __init__(self, scope: core.Construct, id: str, params, cluster: eks.Cluster) -> None:
+        super().__init__(scope, id)
+        self.cluster = cluster
+        self.rollout_params = params.eks.web_server_rollout
+        self.validate_rollout_params()
+
+        self.chart = self.cluster.add_helm_chart(
+            "SimpleEKS-EKS-ArgoRollouts-HelmChart",
+            chart="argo-rollouts",
+            release="argo-rollouts",
+            version=self.rollout_params.chart_version,
+            namespace="argo-rollouts",
+            create_namespace=True,
+            repository="https://argoproj.github.io/argo-helm",
+            values={
+                # Aborting a rollout must not wait for a spot replacement of the controller
+                "controller": {
+                    "nodeSelector": {
+                        "lifecycle": "OnDemand"
+                    }
+                }
+            }
+        )
+
+    def validate_rollout_params(self):
+        weights = [step.weight for step in self.rollout_params.steps]
+        if not weights or weights != sorted(set(weights)) or not 0 < weights[0] or not weights[-1] < 100:
+            raise ValueError("The steps of the web server rollout need increasing weights between 1 and 99, "
+                             "the last step is followed by the full promotion")
+        if any(step.pause_seconds < 0 for step in self.rollout_params.steps):
+            raise ValueError("pause_seconds of the web server rollout steps can't be negative")
+        analysis = self.rollout_params.analysis
+        if not 0 <= analysis.max_error_rate <= 1:
+            raise ValueError("max_error_rate of the web server rollout analysis must be between 0 and 1")
+        # rate() needs at least two samples of every series in its window
+        if analysis.window_seconds < 2 * analysis.interval_seconds:
+            raise ValueError("window_seconds of the web server rollout analysis must be at least twice "
+                             "interval_seconds")
+
+    def web_server_rollout_values(self):
+        analysis = self.rollout_params.analysis
+        steps = []
+        for step in self.rollout_params.steps:
+            steps.append({"setWeight": step.weight})
+            if step.pause_seconds:
+                steps.append({"pause": {"duration": f"{step.pause_seconds}s"}})
+        return {
+            "enabled": True,
+            "scaleDownDeployment": self.rollout_params.get("scale_down_deployment", False),
+            "steps": steps,
+            "analysis": {
+                "prometheusAddress": PROMETHEUS_ADDRESS,
+                "interval": f"{analysis.interval_seconds}s",
+                "window": f"{analysis.window_seconds}s",
+                "failureLimit": analysis.failure_limit,
+                "maxErrorRate": analysis.max_error_rate,
+                "maxP95LatencySeconds": analysis.max_p95_latency_seconds
+            }
+        }
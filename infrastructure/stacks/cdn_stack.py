@@ -0,0 +1,63 @@
+from aws_cdk import (
+    aws_cloudfront as cloudfront,
+    aws_cloudfront_origins as origins,
+    aws_eks as eks,
+    core
+)
+
+from infrastructure.stacks.eks_stack import EksStack
+
+
+class CdnStack(core.NestedStack):
+    def __init__(self, scope: core.Construct, id: str, params, eks_stack: EksStack,
+                 **kwargs) -> None:
+        super().__init__(scope, id, **kwargs)
+        cdn_params = params.cdn
+
+        # The ALB is created by the load balancer controller from the web server ingress
+        self.load_balancer_dns = eks.KubernetesObjectValue(
+            self, "SimpleEKS-WebServer-Ingress-Hostname",
+            cluster=eks_stack.cluster,
+            object_type="ingress",
+            object_name=eks_stack.web_server_name,
+            object_namespace="default",
+            json_path=".status.loadBalancer.ingress[0].hostname",
+            timeout=core.Duration.minutes(10)
+        )
+        self.load_balancer_dns.node.add_dependency(eks_stack.web_server_chart)
+
+        self.cache_policy = cloudfront.CachePolicy(
+            self, "SimpleEKS-CloudFront-CachePolicy",
+            comment=f"Web server cache policy - {params.name}",
+            # the origin Cache-Control headers choose the ttl within these bounds
+            default_ttl=core.Duration.seconds(cdn_params.cache_policy.default_ttl_seconds),
+            min_ttl=core.Duration.seconds(cdn_params.cache_policy.min_ttl_seconds),
+            max_ttl=core.Duration.seconds(cdn_params.cache_policy.max_ttl_seconds),
+            query_string_behavior=cloudfront.CacheQueryStringBehavior.none(),
+            header_behavior=cloudfront.CacheHeaderBehavior.none(),
+            cookie_behavior=cloudfront.CacheCookieBehavior.none(),
+            enable_accept_encoding_gzip=cdn_params.compress,
+            enable_accept_encoding_brotli=cdn_params.compress
+        )
+
+        self.distribution = cloudfront.Distribution(
+            self, "SimpleEKS-CloudFront-Distribution",
+            comment=f"Web server edge cache - {params.name}",
+            price_class=cloudfront.PriceClass[cdn_params.price_class],
+            http_version=cloudfront.HttpVersion.HTTP2,
+            default_behavior=cloudfront.BehaviorOptions(
+                origin=origins.HttpOrigin(
+                    self.load_balancer_dns.value,
+                    protocol_policy=cloudfront.OriginProtocolPolicy.HTTP_ONLY,
+                    origin_shield_region=cdn_params.get("origin_shield_region", None),
+                    keepalive_timeout=core.Duration.seconds(cdn_params.origin_keepalive_timeout_seconds)
+                ),
+                cache_policy=self.cache_policy,
+                compress=cdn_params.compress,
+                viewer_protocol_policy=cloudfront.ViewerProtocolPolicy.REDIRECT_TO_HTTPS,
+                allowed_methods=cloudfront.AllowedMethods.ALLOW_GET_HEAD,
+                cached_methods=cloudfront.CachedMethods.CACHE_GET_HEAD
+            )
+        )
+
+        core.CfnOutput(self, "SimpleEKS-CloudFront-DomainName", value=self.distribution.distribution_domain_name)
@@ -0,0 +1,108 @@
+from aws_cdk import (
+    aws_eks as eks,
+    aws_iam as iam,
+    core,
+)
+
+EXPANDERS = ["random", "most-pods", "least-waste", "price", "priority"]
+
+
+class ClusterAutoscaler(core.Construct):
+
+    def __init__(self, scope: core.Construct, id: str, params, cluster: eks.Cluster,
+                 auto_scaling_groups: list) -> None:
+        super().__init__(scope, id)
+        self.cluster = cluster
+        self.autoscaler_params = params.eks.cluster_autoscaler
+        self.validate_autoscaler_params()
+        cluster_name = params.eks.cluster_name
+
+        # Tags used by the autoscaler to discover the node groups it can scale
+        for auto_scaling_group in auto_scaling_groups:
+            core.Tags.of(auto_scaling_group).add("k8s.io/cluster-autoscaler/enabled", "true")
+            core.Tags.of(auto_scaling_group).add(f"k8s.io/cluster-autoscaler/{cluster_name}", "owned")
+
+        self.service_account = self.cluster.add_service_account(
+            "SimpleEKS-ClusterAutoscaler-ServiceAccount",
+            name="cluster-autoscaler",
+            namespace="kube-system"
+        )
+        self.service_account.add_to_principal_policy(iam.PolicyStatement(
+            actions=[
+                "autoscaling:DescribeAutoScalingGroups",
+                "autoscaling:DescribeAutoScalingInstances",
+                "autoscaling:DescribeLaunchConfigurations",
+                "autoscaling:DescribeTags",
+                "ec2:DescribeInstanceTypes",
+                "ec2:DescribeLaunchTemplateVersions"
+            ],
+            resources=["*"],
+            effect=iam.Effect.ALLOW
+        ))
+        self.service_account.add_to_principal_policy(iam.PolicyStatement(
+            actions=[
+                "autoscaling:SetDesiredCapacity",
+                "autoscaling:TerminateInstanceInAutoScalingGroup"
+            ],
+            resources=["*"],
+            conditions={
+                "StringEquals": {
+                    f"autoscaling:ResourceTag/k8s.io/cluster-autoscaler/{cluster_name}": "owned"
+                }
+            },
+            effect=iam.Effect.ALLOW
+        ))
+
+        self.chart = self.cluster.add_helm_chart(
+            "SimpleEKS-EKS-ClusterAutoscaler-HelmChart",
+            chart="cluster-autoscaler",
+            release="cluster-autoscaler",
+            namespace="kube-system",
+            repository="https://kubernetes.github.io/autoscaler",
+            values=self.chart_values(cluster_name)
+        )
+        self.chart.node.add_dependency(self.service_account)
+
+    def validate_autoscaler_params(self):
+        for expander in self.autoscaler_params.expander.split(","):
+            if expander not in EXPANDERS:
+                raise ValueError(f"Unsupported cluster autoscaler expander {expander}")
+        if "priority" in self.autoscaler_params.expander and not self.autoscaler_params.get("expander_priorities",
+                                                                                            None):
+            raise ValueError("The priority expander needs expander_priorities")
+
+    def chart_values(self, cluster_name):
+        values = {
+            "autoDiscovery": {
+                "clusterName": cluster_name
+            },
+            "awsRegion": core.Stack.of(self).region,
+            "image": {
+                "tag": self.autoscaler_params.image_tag
+            },
+            "rbac": {
+                "serviceAccount": {
+                    "create": False,
+                    "name": "cluster-autoscaler"
+                }
+            },
+            # The autoscaler must not run on the spot nodes it may remove
+            "nodeSelector": {
+                "lifecycle": "OnDemand"
+            },
+            "extraArgs": {
+                "expander": self.autoscaler_params.expander,
+                "scale-down-delay-after-add": self.autoscaler_params.scale_down_delay_after_add,
+                "scale-down-unneeded-time": self.autoscaler_params.scale_down_unneeded_time,
+                "scale-down-utilization-threshold": self.autoscaler_params.scale_down_utilization_threshold,
+                "max-node-provision-time": self.autoscaler_params.max_node_provision_time,
+                "balance-similar-node-groups": True,
+                "skip-nodes-with-system-pods": False
+            }
+        }
+        if self.autoscaler_params.get("expander_priorities", None):
+            # Node groups matching the regular expressions of the highest priority are preferred
+            values["expanderPriorities"] = {
+                str(priority.priority): [priority.pattern] for priority in self.autoscaler_params.expander_priorities
+            }
+        return values
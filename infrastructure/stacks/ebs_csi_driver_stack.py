@@ -0,0 +1,145 @@
+from aws_cdk import (
+    aws_eks as eks,
+    aws_iam as iam,
+    core,
+)
+
+from infrastructure.utils.capacity import parse_memory
+
+# gp3 limits: the baseline 3000 IOPS and 125 MiB/s are included in the price of any volume size
+GP3_BASELINE_IOPS = 3000
+GP3_MAX_IOPS = 16000
+GP3_IOPS_PER_GIB = 500
+GP3_BASELINE_THROUGHPUT = 125
+GP3_MAX_THROUGHPUT = 1000
+GP3_THROUGHPUT_PER_IOPS = 0.25
+
+
+def storage_class_name(volume: str) -> str:
+    return f"gp3-{volume.replace('_', '-')}"
+
+
+def claim_name(volume: str) -> str:
+    # Not the name of the claims the charts created with the gp2 class, whose storage class can't be changed
+    return f"{volume.replace('_', '-')}-gp3"
+
+
+def volume_size_gib(size: str) -> int:
+    if not size.endswith("Gi") or not size[:-2].isdigit() or int(size[:-2]) < 1:
+        raise ValueError(f"EBS volume sizes are whole Gi quantities, got {size}")
+    return int(parse_memory(size) / 1024)
+
+
+class EbsCsiDriver(core.Construct):
+    """EBS CSI driver and the gp3 storage classes of the monitoring volumes.
+
+    The in-tree gp2 provisioner ties the IOPS of a volume to its size (3 IOPS per GiB), which throttles the small
+    volumes of Prometheus, Alertmanager and Grafana. Every volume of `eks.storage.volumes` gets its own gp3
+    StorageClass, named by `storage_class_name`, with the IOPS and throughput of its parameters. The claims are
+    created by `add_claim` under the names of `claim_name` and given to the charts as existing claims, since the
+    storage class of the claims the charts already created on a cluster can't be changed.
+    """
+
+    def __init__(self, scope: core.Construct, id: str, params, cluster: eks.Cluster) -> None:
+        super().__init__(scope, id)
+        self.cluster = cluster
+        self.storage_params = params.eks.storage
+        self.volumes = self.storage_params.volumes.__dict__
+        self.validate_volumes()
+
+        self.service_account = self.cluster.add_service_account(
+            "SimpleEKS-EbsCsiDriver-ServiceAccount",
+            name="ebs-csi-controller-sa",
+            namespace="kube-system"
+        )
+        self.service_account.role.add_managed_policy(
+            iam.ManagedPolicy.from_aws_managed_policy_name("service-role/AmazonEBSCSIDriverPolicy"))
+
+        self.chart = self.cluster.add_helm_chart(
+            "SimpleEKS-EKS-EbsCsiDriver-HelmChart",
+            chart="aws-ebs-csi-driver",
+            release="aws-ebs-csi-driver",
+            version=self.storage_params.ebs_csi_driver_chart_version,
+            namespace="kube-system",
+            repository="https://kubernetes-sigs.github.io/aws-ebs-csi-driver",
+            values={
+                "controller": {
+                    "serviceAccount": {
+                        "create": False,
+                        "name": "ebs-csi-controller-sa"
+                    },
+                    # The provisioning of the volumes must not wait for a spot replacement of the controller
+                    "nodeSelector": {
+                        "lifecycle": "OnDemand"
+                    }
+                }
+            }
+        )
+        self.chart.node.add_dependency(self.service_account)
+
+        self.storage_classes = {}
+        for volume, volume_params in self.volumes.items():
+            storage_class = self.cluster.add_manifest(f"SimpleEKS-StorageClass-{volume}",
+                                                      self.storage_class_manifest(volume, volume_params))
+            storage_class.node.add_dependency(self.chart)
+            self.storage_classes[volume] = storage_class
+
+    def add_claim(self, volume: str, namespace: str) -> eks.KubernetesManifest:
+        claim = self.cluster.add_manifest(f"SimpleEKS-PersistentVolumeClaim-{volume}", {
+            "apiVersion": "v1",
+            "kind": "PersistentVolumeClaim",
+            "metadata": {
+                "name": claim_name(volume),
+                "namespace": namespace
+            },
+            "spec": {
+                "accessModes": ["ReadWriteOnce"],
+                "storageClassName": storage_class_name(volume),
+                "resources": {
+                    "requests": {
+                        "storage": self.volumes[volume].size
+                    }
+                }
+            }
+        })
+        claim.node.add_dependency(self.storage_classes[volume])
+        return claim
+
+    def validate_volumes(self):
+        for volume, volume_params in self.volumes.items():
+            size_gib = volume_size_gib(volume_params.size)
+            if not GP3_BASELINE_IOPS <= volume_params.iops <= GP3_MAX_IOPS:
+                raise ValueError(f"The iops of the {volume} volume must be between {GP3_BASELINE_IOPS} and "
+                                 f"{GP3_MAX_IOPS}")
+            if volume_params.iops > GP3_BASELINE_IOPS and volume_params.iops > size_gib * GP3_IOPS_PER_GIB:
+                raise ValueError(f"The {volume} volume needs at least {volume_params.iops / GP3_IOPS_PER_GIB:g}Gi "
+                                 f"for {volume_params.iops} iops")
+            if not GP3_BASELINE_THROUGHPUT <= volume_params.throughput <= GP3_MAX_THROUGHPUT:
+                raise ValueError(f"The throughput of the {volume} volume must be between {GP3_BASELINE_THROUGHPUT} "
+                                 f"and {GP3_MAX_THROUGHPUT} MiB/s")
+            if volume_params.throughput > volume_params.iops * GP3_THROUGHPUT_PER_IOPS:
+                raise ValueError(f"The {volume} volume needs at least "
+                                 f"{volume_params.throughput / GP3_THROUGHPUT_PER_IOPS:g} iops for a throughput of "
+                                 f"{volume_params.throughput} MiB/s")
+
+    @staticmethod
+    def storage_class_manifest(volume: str, volume_params):
+        return {
+            "apiVersion": "storage.k8s.io/v1",
+            "kind": "StorageClass",
+            "metadata": {
+                "name": storage_class_name(volume)
+            },
+            "provisioner": "ebs.csi.aws.com",
+            # The volume is created in the availability zone of the node the pod is scheduled on
+            "volumeBindingMode": "WaitForFirstConsumer",
+            "allowVolumeExpansion": True,
+            "reclaimPolicy": "Delete",
+            "parameters": {
+                "type": "gp3",
+                "iops": str(volume_params.iops),
+                "throughput": str(volume_params.throughput),
+                "encrypted": "true",
+                "csi.storage.k8s.io/fstype": "ext4"
+            }
+        }
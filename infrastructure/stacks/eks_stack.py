@@ -2,7 +2,6 @@ import os
 
 from aws_cdk import (
     aws_ec2 as ec2,
-    aws_ecr_assets as ecr_assets,
     aws_eks as eks,
     aws_iam as iam,
     aws_s3_assets as s3_assets,
@@ -11,8 +10,47 @@ from aws_cdk import (
 )
 
 from infrastructure.stacks.alb_ingress_stack import ALBIngressController
+from infrastructure.stacks.argo_rollouts_stack import ArgoRollouts
+from infrastructure.stacks.cluster_autoscaler_stack import ClusterAutoscaler
+from infrastructure.stacks.ebs_csi_driver_stack import EbsCsiDriver, claim_name
 from infrastructure.stacks.metrics_server_stack import MetricsServerManifest
+from infrastructure.stacks.node_pool_stack import CPU_ARCHITECTURES, SpotNodePool
+from infrastructure.stacks.node_profile_stack import NodeProfile
+from infrastructure.stacks.node_termination_handler_stack import NodeTerminationHandler
+from infrastructure.stacks.prometheus_stack import Prometheus
 from infrastructure.stacks.vpc_stack import VpcStack
+from infrastructure.stacks.web_server_image_stack import WebServerImage
+from infrastructure.utils.capacity import CapacityProfile, parse_cpu, parse_memory, validate_node_group
+from infrastructure.utils.monitoring import POD_P95_LATENCY, POD_REQUESTS_RATE
+
+WEB_SERVER_CHART_NAME = "ccekswebserver"
+# Fixed name of the web server kubernetes objects, so that other stacks can look them up
+WEB_SERVER_NAME = "web-server"
+
+WHEN_UNSATISFIABLE = ["DoNotSchedule", "ScheduleAnyway"]
+# Burstable pods without a cpu limit aren't throttled, BestEffort ones are the first evicted under node pressure
+QOS_CLASSES = ["Guaranteed", "Burstable"]
+# Values of the lifecycle label given to the nodes at bootstrap
+NODE_LIFECYCLES = ["Ec2Spot", "OnDemand"]
+
+KUBERNETES_ARCHITECTURES = {
+    "x86_64": "amd64",
+    "arm64": "arm64"
+}
+
+# Custom metrics exposed to the HPA, read from the per pod series recorded by prometheus
+REQUESTS_PER_SECOND_METRIC = "nginx_http_requests_per_second"
+P95_LATENCY_METRIC = "nginx_http_request_duration_p95_seconds"
+
+PROMETHEUS_ADAPTER_RULES = [
+    {
+        "seriesQuery": f'{series}{{namespace!="",pod!=""}}',
+        "resources": {"overrides": {"namespace": {"resource": "namespace"}, "pod": {"resource": "pod"}}},
+        "name": {"matches": f"^{series}$", "as": metric},
+        "metricsQuery": "max(<<.Series>>{<<.LabelMatchers>>}) by (<<.GroupBy>>)"
+    }
+    for series, metric in ((POD_REQUESTS_RATE, REQUESTS_PER_SECOND_METRIC), (POD_P95_LATENCY, P95_LATENCY_METRIC))
+]
 
 
 class EksStack(core.NestedStack):
@@ -21,7 +59,9 @@ class EksStack(core.NestedStack):
                  **kwargs) -> None:
         super().__init__(scope, id, **kwargs)
         self.params = params
-        self.capacity_details = self.determine_cluster_size()
+        self.capacity_profile = self.determine_cluster_size()
+        self.web_server_metrics = self.web_server_metrics_values()
+        self.web_server_architecture = self.determine_web_server_architecture()
         self.cluster_admin = iam.Role(
             self,
             'AdminRole',
@@ -42,40 +82,66 @@ class EksStack(core.NestedStack):
             masters_role=self.cluster_admin,
             vpc=vpc_stack.vpc,
             vpc_subnets=[ec2.SubnetSelection(subnet_type=ec2.SubnetType.PRIVATE)],
-            **self.capacity_details
+            # the nodes are provided by the autoscaling groups below
+            default_capacity=0
         )
 
-        asg_spot = autoscaling.AutoScalingGroup(self, 'AsgSpot',
-                                                vpc=self.cluster.vpc,
-                                                spot_price='0.1094',
-                                                desired_capacity=self.params.eks.spot_instance_count,
-                                                max_capacity=10,
-                                                instance_type=self.capacity_details["default_capacity_instance"],
-                                                update_type=autoscaling.UpdateType.ROLLING_UPDATE,
-                                                machine_image=eks.EksOptimizedImage(
-                                                    kubernetes_version=eks.KubernetesVersion.of(
-                                                        self.params.eks.eks_version).version)
-
-                                                )
+        self.node_profile = NodeProfile(self, "SimpleEKS-NodeProfile", self.params, self.cluster)
 
         asg_on_demand = autoscaling.AutoScalingGroup(self, 'AsgOnDemand',
                                                      vpc=self.cluster.vpc,
-                                                     desired_capacity=self.params.eks.on_demand_instance_count,
-                                                     max_capacity=self.params.eks.on_demand_instance_count,
-                                                     instance_type=self.capacity_details["default_capacity_instance"],
+                                                     min_capacity=self.params.eks.on_demand_instance_count,
+                                                     max_capacity=self.params.eks.on_demand_max_instance_count,
+                                                     instance_type=ec2.InstanceType(
+                                                         self.capacity_profile.instance_types[0]),
                                                      update_type=autoscaling.UpdateType.ROLLING_UPDATE,
                                                      machine_image=eks.EksOptimizedImage(
+                                                         cpu_arch=CPU_ARCHITECTURES[
+                                                             self.capacity_profile.architecture],
                                                          kubernetes_version=eks.KubernetesVersion.of(
                                                              self.params.eks.eks_version).version)
                                                      )
 
-        asg_spot.scale_on_cpu_utilization("SimpleEKS-ScaleSpotOnCPUUtilization", target_utilization_percent=75)
-
+        self.cluster_autoscaler_enabled = self.params.eks.cluster_autoscaler.enabled
+        self.node_profile.apply(asg_on_demand)
         self.cluster.connect_auto_scaling_group_capacity(asg_on_demand,
-                                                         map_role=True)
+                                                         map_role=True,
+                                                         bootstrap_options=eks.BootstrapOptions(
+                                                             use_max_pods=False,
+                                                             kubelet_extra_args=self.node_profile
+                                                             .kubelet_extra_args(self.capacity_profile)))
+
+        self.spot_node_pools = [
+            SpotNodePool(self, f"SimpleEKS-SpotNodePool-{pool.name}", self.params, self.cluster, pool,
+                         self.node_profile)
+            for pool in self.params.eks.spot_node_pools
+        ]
+        if not self.cluster_autoscaler_enabled:
+            for pool in self.spot_node_pools:
+                pool.auto_scaling_group.scale_on_cpu_utilization("SimpleEKS-ScaleSpotOnCPUUtilization",
+                                                                 target_utilization_percent=75)
+
+        self.auto_scaling_groups = [pool.auto_scaling_group for pool in self.spot_node_pools] + [asg_on_demand]
 
-        self.cluster.connect_auto_scaling_group_capacity(asg_spot,
-                                                         map_role=True)
+        # Drains the nodes before they are reclaimed or terminated
+        if self.params.eks.node_termination_handler.enabled:
+            self.node_termination_handler = NodeTerminationHandler(self, "SimpleEKS-NodeTerminationHandler",
+                                                                   self.params, self.cluster,
+                                                                   self.auto_scaling_groups)
+        else:
+            self.spot_interrupt_handler_chart = self.cluster.add_helm_chart(
+                "SimpleEKS-EKS-SpotInterruptHandler-HelmChart",
+                chart="aws-node-termination-handler",
+                release="spot-interrupt-handler",
+                version="0.13.2",
+                repository="https://aws.github.io/eks-charts",
+                namespace="kube-system",
+                values={
+                    "nodeSelector": {
+                        "lifecycle": "Ec2Spot"
+                    }
+                }
+            )
 
         # TODO: Cover case in which deploying stack with role
         for user in self.params.eks.privileged_iam_principals.users:
@@ -101,47 +167,18 @@ class EksStack(core.NestedStack):
                 ]
             )
 
+        if self.cluster_autoscaler_enabled:
+            self.cluster_autoscaler = ClusterAutoscaler(self, "SimpleEKS-ClusterAutoscaler", self.params,
+                                                        self.cluster, self.auto_scaling_groups)
+
         self.metrics_server_manifest = MetricsServerManifest(self, "SimpleEKS-MetricsServer-Manifest", self.params,
                                                              self.cluster)
 
-        self.prometheus_chart = self.cluster.add_helm_chart(
-            "SimpleEKS-EKS-Prometheus-HelmChart",
-            release="prometheus",
-            chart="prometheus",
-            create_namespace=True,
-            namespace="prometheus",
-            repository="https://prometheus-community.github.io/helm-charts",
-            values={
-                "alertmanager": {
-                    "persistentVolume": {
-                        "storageClass": "gp2"
-                    }
-                },
-                "server": {
-                    "persistentVolume": {
-                        "storageClass": "gp2"
-                    }
-                },
-                "prometheus": {
-                    "prometheusSpec": {
-                        "additionalScrapeConfigs": [
-                            {
-                                "job_name": "nginx-ingress",
-                                "metrics_path": "/metrics",
-                                "scrape_interval": "5s",
-                                "static_configs": [
-                                    {
-                                        "targets": [
-                                            "nginx-ingress-controller-metrics:9113"
-                                        ]
-                                    }
-                                ]
-                            }
-                        ]
-                    }
-                }
-            }
-        )
+        self.ebs_csi_driver = EbsCsiDriver(self, "SimpleEKS-EbsCsiDriver", self.params, self.cluster)
+
+        self.prometheus = Prometheus(self, "SimpleEKS-Prometheus", self.params, self.cluster,
+                                     self.web_server_scrape_configs(), self.ebs_csi_driver)
+        self.prometheus_chart = self.prometheus.chart
 
         self.grafana_chart = self.cluster.add_helm_chart(
             "SimpleEKS-EKS-Grafana-HelmChart",
@@ -164,7 +201,7 @@ class EksStack(core.NestedStack):
                     }
                 },
                 "persistence": {
-                    "storageClassName": "gp2",
+                    "existingClaim": claim_name("grafana"),
                     "enabled": True
                 },
                 "adminPassword": "TestPWD!",
@@ -213,40 +250,304 @@ class EksStack(core.NestedStack):
                 }
             }
         )
+        self.grafana_claim = self.ebs_csi_driver.add_claim("grafana", "grafana")
+        self.grafana_claim.node.add_dependency(self.grafana_chart)
+
+        self.web_server_autoscaling = self.params.eks.get("web_server_autoscaling", None)
+        if self.web_server_autoscaling and self.web_server_autoscaling.enabled:
+            self.prometheus_adapter_chart = self.cluster.add_helm_chart(
+                "SimpleEKS-EKS-PrometheusAdapter-HelmChart",
+                release="prometheus-adapter",
+                chart="prometheus-adapter",
+                namespace="prometheus",
+                repository="https://prometheus-community.github.io/helm-charts",
+                values={
+                    "prometheus": {
+                        "url": "http://prometheus-server.prometheus.svc",
+                        "port": 80
+                    },
+                    "rules": {
+                        "default": False,
+                        "custom": PROMETHEUS_ADAPTER_RULES
+                    }
+                }
+            )
+            self.prometheus_adapter_chart.node.add_dependency(self.prometheus_chart)
 
         self.alb_ingress_stack = ALBIngressController(scope=self, id="ALBIngress", params=params,
                                                       cluster=self.cluster)
 
-        docker_image = ecr_assets.DockerImageAsset(
-            self, "SimpleEKS-ECR-WebServer-Image",
-            directory=f"{os.path.dirname(__file__)}/../../images/web_server",
-            file="Dockerfile",
-            repository_name=params.eks.container_image_name
-        )
+        web_server_rollout = self.params.eks.get("web_server_rollout", None)
+        self.argo_rollouts = None
+        if web_server_rollout and web_server_rollout.enabled:
+            self.argo_rollouts = ArgoRollouts(self, "SimpleEKS-ArgoRollouts", self.params, self.cluster)
+
+        self.web_server_image = WebServerImage(self, "SimpleEKS-WebServer-Image", self.params,
+                                               self.web_server_architecture)
 
         chart_asset = s3_assets.Asset(self, "ChartAsset",
                                       path=f"{os.path.dirname(__file__)}/../../helm/ccekswebserver"
                                       )
 
+        self.web_server_name = WEB_SERVER_NAME
         self.web_server_chart = self.cluster.add_helm_chart(
             "SimpleEKS-EKS-WebServer-HelmChart",
             chart_asset=chart_asset,
             namespace="default",
             timeout=core.Duration.minutes(10),
             values={
-                "image": {
-                    "uri": docker_image.image_uri
+                "fullnameOverride": self.web_server_name,
+                "image": self.web_server_image_values(),
+                "replicaCount": params.eks.web_server_replicas,
+                "autoscaling": self.web_server_autoscaling_values(),
+                "metrics": self.web_server_metrics,
+                "resources": self.web_server_resources_values(),
+                "nginx": self.web_server_nginx_values(),
+                "ingress": self.alb_ingress_stack.web_server_ingress_values(),
+                "connection": self.alb_ingress_stack.web_server_connection_values(),
+                "shutdown": self.web_server_shutdown_values(),
+                "podDisruptionBudget": self.web_server_pod_disruption_budget_values(),
+                "podSecurityContext": {
+                    "sysctls": self.node_profile.web_server_pod_sysctls()
+                },
+                "nodeSelector": {
+                    "kubernetes.io/arch": self.web_server_architecture
+                },
+                "scheduling": self.web_server_scheduling_values(),
+                "service": {
+                    "topologyAwareRouting": self.params.eks.web_server_scheduling.topology_aware_routing
                 },
-                "replicaCount": params.eks.web_server_replicas
+                "rollout": self.argo_rollouts.web_server_rollout_values() if self.argo_rollouts
+                else {"enabled": False}
             },
             wait=True
         )
+        if self.argo_rollouts:
+            # The Rollout and AnalysisTemplate kinds are installed by the controller chart
+            self.web_server_chart.node.add_dependency(self.argo_rollouts.chart)
 
-    def determine_cluster_size(self):
-        if self.params.eks.get("capacity_details", "small") == 'small':
-            instance_details = ec2.InstanceType.of(ec2.InstanceClass.BURSTABLE3, ec2.InstanceSize.SMALL)
-        elif self.params.eks.get("capacity_details", "small") == 'large':
-            instance_details = ec2.InstanceType.of(ec2.InstanceClass.COMPUTE5, ec2.InstanceSize.LARGE)
+    def web_server_image_values(self):
+        image_params = self.params.eks.web_server_image
+        return {
+            # the image tag is the hash of its sources and the digest its content, neither is ever pushed twice
+            "uri": self.web_server_image.image_uri if image_params.pin_digest
+            else self.web_server_image.image_asset.image_uri,
+            "pullPolicy": "IfNotPresent",
+            "prePull": {
+                "enabled": image_params.pre_pull
+            }
+        }
+
+    def web_server_metrics_values(self):
+        return {
+            "enabled": True,
+            "port": self.params.eks.web_server_metrics.port,
+            "path": self.params.eks.web_server_metrics.path
+        }
+
+    def web_server_resources_values(self):
+        resources_params = self.params.eks.web_server_resources
+        requests = dict(resources_params.requests.__dict__)
+        limits_params = resources_params.get("limits", None)
+        limits = dict(limits_params.__dict__) if limits_params else {}
+        if resources_params.qos not in QOS_CLASSES:
+            raise ValueError(f"Unsupported qos {resources_params.qos} of the web server, "
+                             f"use one of {', '.join(QOS_CLASSES)}")
+        if set(requests) != {"cpu", "memory"}:
+            raise ValueError("The web server resources need cpu and memory requests")
+        if resources_params.qos == "Guaranteed":
+            if limits and limits != requests:
+                raise ValueError("The limits of a Guaranteed web server must equal its requests, or be omitted")
+            limits = dict(requests)
+        elif parse_cpu(limits.get("cpu", requests["cpu"])) < parse_cpu(requests["cpu"]) or \
+                parse_memory(limits.get("memory", requests["memory"])) < parse_memory(requests["memory"]):
+            raise ValueError("The limits of the web server can't be lower than its requests")
+
+        cpu_millis = parse_cpu(requests["cpu"])
+        if resources_params.get("integer_cpus", False):
+            # Only Guaranteed pods with whole cpus get exclusive cores from the static cpu manager policy
+            if resources_params.qos != "Guaranteed" or cpu_millis % 1000:
+                raise ValueError("integer_cpus of the web server needs the Guaranteed qos and a whole cpu request")
+            if self.params.eks.web_server_nginx.worker_processes != cpu_millis // 1000:
+                raise ValueError(f"With integer_cpus the web server needs one nginx worker per cpu, "
+                                 f"worker_processes must be {cpu_millis // 1000}")
+
+        profiles = [self.capacity_profile] + [CapacityProfile.from_params(self.params, pool.capacity_profile)
+                                              for pool in self.params.eks.spot_node_pools]
+        if not [profile for profile in profiles
+                if KUBERNETES_ARCHITECTURES[profile.architecture] == self.web_server_architecture and
+                profile.pods_per_node(requests["cpu"], requests["memory"]) >= 1]:
+            raise ValueError(f"A web server pod requesting {requests['cpu']} cpu and {requests['memory']} memory "
+                             f"doesn't fit on any {self.web_server_architecture} node")
+        return {"requests": requests, "limits": limits}
+
+    def web_server_nginx_values(self):
+        nginx_params = self.params.eks.web_server_nginx
+        return {
+            "workerProcesses": nginx_params.worker_processes,
+            "workerConnections": nginx_params.worker_connections,
+            "workerRlimitNofile": nginx_params.worker_rlimit_nofile,
+            "listenBacklog": self.node_profile.listen_backlog(),
+            "openFileCache": {
+                "max": nginx_params.open_file_cache.max,
+                "inactive": nginx_params.open_file_cache.inactive,
+                "valid": nginx_params.open_file_cache.valid
+            },
+            "gzip": {
+                "enabled": nginx_params.gzip.enabled,
+                "compLevel": nginx_params.gzip.comp_level
+            },
+            "assetMaxAge": nginx_params.asset_max_age
+        }
 
-        return {'default_capacity': 0, 'default_capacity_instance': instance_details,
-                'default_capacity_type': eks.DefaultCapacityType.NODEGROUP}
+    def web_server_shutdown_values(self):
+        shutdown_params = self.params.eks.web_server_shutdown
+        # nginx needs the whole deregistration delay after the preStop sleep to drain the in flight requests
+        drain_seconds = shutdown_params.pre_stop_sleep_seconds + \
+            self.params.eks.web_server_ingress.deregistration_delay_seconds
+        if shutdown_params.termination_grace_period_seconds < drain_seconds:
+            raise ValueError(f"termination_grace_period_seconds of the web server must be at least {drain_seconds}, "
+                             f"the preStop sleep plus the target group deregistration delay")
+        return {
+            "preStopSleepSeconds": shutdown_params.pre_stop_sleep_seconds,
+            "terminationGracePeriodSeconds": shutdown_params.termination_grace_period_seconds
+        }
+
+    def web_server_pod_disruption_budget_values(self):
+        budget_params = self.params.eks.web_server_pod_disruption_budget
+        values = {"enabled": budget_params.enabled}
+        if budget_params.get("min_available", None):
+            values["minAvailable"] = budget_params.min_available
+        else:
+            values["maxUnavailable"] = budget_params.get("max_unavailable", 1)
+        return values
+
+    def web_server_scheduling_values(self):
+        scheduling_params = self.params.eks.web_server_scheduling
+        topology_spread = {}
+        for spread in ("zone", "node"):
+            spread_params = scheduling_params.get(f"{spread}_spread", None)
+            if not spread_params:
+                topology_spread[spread] = {"enabled": False}
+                continue
+            if spread_params.when_unsatisfiable not in WHEN_UNSATISFIABLE or spread_params.max_skew < 1:
+                raise ValueError(f"The {spread} spread of the web server needs max_skew >= 1 and when_unsatisfiable "
+                                 f"in {', '.join(WHEN_UNSATISFIABLE)}")
+            topology_spread[spread] = {
+                "enabled": True,
+                "maxSkew": spread_params.max_skew,
+                "whenUnsatisfiable": spread_params.when_unsatisfiable
+            }
+
+        preferred_lifecycle = scheduling_params.get("preferred_lifecycle", None) or ""
+        if preferred_lifecycle and preferred_lifecycle not in NODE_LIFECYCLES:
+            raise ValueError(f"Unsupported preferred_lifecycle {preferred_lifecycle} of the web server, "
+                             f"use one of {', '.join(NODE_LIFECYCLES)}")
+        if scheduling_params.topology_aware_routing and \
+                tuple(int(n) for n in self.params.eks.eks_version.split(".")) < (1, 23):
+            core.Annotations.of(self).add_warning(
+                "Topology aware routing of the web server service needs Kubernetes 1.23 or later, "
+                "it is ignored by the cluster until the upgrade")
+        return {
+            "topologySpread": topology_spread,
+            "preferredLifecycle": preferred_lifecycle,
+            "preferredLifecycleWeight": scheduling_params.get("preferred_lifecycle_weight", 100)
+        }
+
+    def web_server_scrape_configs(self):
+        return [
+            {
+                "job_name": "web-server",
+                "metrics_path": self.web_server_metrics["path"],
+                "scrape_interval": self.params.eks.web_server_metrics.scrape_interval,
+                # Pod discovery: during a rollout the stable and canary services only select their own pods, the
+                # endpoints of a single service would miss the canary
+                "kubernetes_sd_configs": [
+                    {
+                        "role": "pod",
+                        "namespaces": {"names": ["default"]}
+                    }
+                ],
+                "relabel_configs": [
+                    {
+                        "source_labels": ["__meta_kubernetes_pod_label_app_kubernetes_io_name"],
+                        "action": "keep",
+                        "regex": WEB_SERVER_CHART_NAME
+                    },
+                    {
+                        "source_labels": ["__meta_kubernetes_pod_container_port_name"],
+                        "action": "keep",
+                        "regex": "prometheus"
+                    },
+                    {
+                        "source_labels": ["__meta_kubernetes_namespace"],
+                        "target_label": "namespace"
+                    },
+                    {
+                        "source_labels": ["__meta_kubernetes_pod_name"],
+                        "target_label": "pod"
+                    },
+                    # Tells the canary pods of a rollout from the stable ones
+                    {
+                        "source_labels": ["__meta_kubernetes_pod_label_rollouts_pod_template_hash"],
+                        "target_label": "rollouts_pod_template_hash"
+                    }
+                ]
+            }
+        ]
+
+    def web_server_autoscaling_values(self):
+        autoscaling_params = self.web_server_autoscaling
+        if not autoscaling_params or not autoscaling_params.enabled:
+            return {"enabled": False}
+
+        values = {
+            "enabled": True,
+            "minReplicas": autoscaling_params.get("min_replicas", self.params.eks.web_server_replicas),
+            "maxReplicas": autoscaling_params.max_replicas,
+            "targetCPUUtilizationPercentage": autoscaling_params.get("target_cpu_utilization", None),
+            "customMetrics": {
+                "requestsPerSecond": REQUESTS_PER_SECOND_METRIC,
+                "p95LatencySeconds": P95_LATENCY_METRIC
+            },
+            "behavior": {}
+        }
+        if autoscaling_params.get("target_requests_per_second_per_pod", None):
+            values["targetRequestsPerSecondPerPod"] = str(autoscaling_params.target_requests_per_second_per_pod)
+        if autoscaling_params.get("target_p95_latency_seconds", None):
+            # quantities are expressed in milli units to keep sub second latencies integer
+            values["targetP95LatencySeconds"] = f"{int(autoscaling_params.target_p95_latency_seconds * 1000)}m"
+        for direction, key in (("scale_up", "scaleUp"), ("scale_down", "scaleDown")):
+            rules = autoscaling_params.get(direction, None)
+            if rules:
+                values["behavior"][key] = self.scaling_rules(rules)
+        return values
+
+    @staticmethod
+    def scaling_rules(rules):
+        policies = []
+        if rules.get("pods", None):
+            policies.append({"type": "Pods", "value": rules.pods, "periodSeconds": rules.period_seconds})
+        if rules.get("percent", None):
+            policies.append({"type": "Percent", "value": rules.percent, "periodSeconds": rules.period_seconds})
+        return {
+            "stabilizationWindowSeconds": rules.get("stabilization_window_seconds", 0),
+            "selectPolicy": rules.get("select_policy", "Max"),
+            "policies": policies
+        }
+
+    def determine_web_server_architecture(self):
+        """Kubernetes name of the architecture the web server image is built for and its pods are scheduled on."""
+        architecture = self.params.eks.get("web_server_architecture", "x86_64")
+        node_architectures = {self.capacity_profile.architecture} | \
+            {CapacityProfile.from_params(self.params, pool.capacity_profile).architecture
+             for pool in self.params.eks.spot_node_pools}
+        if architecture not in node_architectures:
+            raise ValueError(f"No node pool can run the {architecture} web server image")
+        return KUBERNETES_ARCHITECTURES[architecture]
+
+    def determine_cluster_size(self):
+        """Capacity profile of the on demand node group, validated together with the group size."""
+        validate_node_group("on demand", self.params.eks.on_demand_instance_count,
+                            self.params.eks.on_demand_max_instance_count)
+        return CapacityProfile.from_params(self.params, self.params.eks.compute_size)
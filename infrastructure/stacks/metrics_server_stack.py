@@ -3,6 +3,8 @@ from aws_cdk import (
     core,
 )
 
+from infrastructure.utils.manifests import add_bundled_manifest
+
 
 class MetricsServerManifest(core.Construct):
 
@@ -293,10 +295,5 @@ class MetricsServerManifest(core.Construct):
                     }
                 }
             ]
-        i = 0
-        for manifest in self.manifests:
-            self.cluster.add_manifest(
-                f"SimpleEKS-MetricsServer-{i}-Manifest",
-                manifest
-            )
-            i = i + 1
+        self.manifest_resources = add_bundled_manifest(self.cluster, "SimpleEKS-MetricsServer-Manifest",
+                                                       self.manifests)
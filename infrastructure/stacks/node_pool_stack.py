@@ -0,0 +1,123 @@
+from aws_cdk import (
+    aws_autoscaling as autoscaling,
+    aws_ec2 as ec2,
+    aws_eks as eks,
+    core,
+)
+
+from infrastructure.stacks.node_profile_stack import NodeProfile
+from infrastructure.utils.capacity import CapacityProfile, validate_node_group
+
+CPU_ARCHITECTURES = {
+    "x86_64": eks.CpuArch.X86_64,
+    "arm64": eks.CpuArch.ARM_64,
+}
+
+SPOT_ALLOCATION_STRATEGY = "capacity-optimized"
+
+
+class SpotNodePool(core.Construct):
+    """Self managed node group spreading its instances over the interchangeable instance types of a capacity profile.
+
+    The autoscaling group uses a mixed instances policy: the first `on_demand_base_capacity` nodes and
+    `on_demand_percentage_above_base_capacity` percent of the others are on demand, the rest are spot instances
+    taken from the pools with the most spare capacity, so that the reclaim of a single pool doesn't take down the
+    whole group.
+    """
+
+    def __init__(self, scope: core.Construct, id: str, params, cluster: eks.Cluster, pool_params,
+                 node_profile: NodeProfile) -> None:
+        super().__init__(scope, id)
+        self.cluster = cluster
+        self.pool_params = pool_params
+        self.node_profile = node_profile
+        self.capacity_profile = CapacityProfile.from_params(params, pool_params.capacity_profile)
+        self.validate_pool_params()
+
+        self.auto_scaling_group = autoscaling.AutoScalingGroup(
+            self, f"AsgSpot{pool_params.name}",
+            vpc=cluster.vpc,
+            min_capacity=pool_params.min_capacity,
+            max_capacity=pool_params.max_capacity,
+            instance_type=ec2.InstanceType(self.capacity_profile.instance_types[0]),
+            update_type=autoscaling.UpdateType.ROLLING_UPDATE,
+            machine_image=eks.EksOptimizedImage(
+                cpu_arch=CPU_ARCHITECTURES[self.capacity_profile.architecture],
+                kubernetes_version=eks.KubernetesVersion.of(params.eks.eks_version).version)
+        )
+        self.use_mixed_instances_policy()
+
+        # The default bootstrap labels the nodes from the spot price of the group, which a mixed group doesn't have
+        cluster.connect_auto_scaling_group_capacity(self.auto_scaling_group, map_role=True, bootstrap_enabled=False)
+        self.node_profile.apply(self.auto_scaling_group)
+        self.auto_scaling_group.add_user_data(*self.bootstrap_commands())
+
+    def validate_pool_params(self):
+        pool = self.pool_params
+        validate_node_group(pool.name, pool.min_capacity, pool.max_capacity)
+        if not 0 <= pool.get("on_demand_percentage_above_base_capacity", 0) <= 100:
+            raise ValueError(f"on_demand_percentage_above_base_capacity of the {pool.name} node pool must be "
+                             f"between 0 and 100")
+        if pool.get("on_demand_base_capacity", 0) > pool.max_capacity:
+            raise ValueError(f"on_demand_base_capacity of the {pool.name} node pool exceeds its max_capacity")
+
+    def use_mixed_instances_policy(self):
+        # CDK v1 autoscaling groups only support launch configurations: the launch configuration is replaced
+        # by a launch template with the same image, instance profile, security groups and user data
+        launch_configuration = self.auto_scaling_group.node.find_child("LaunchConfig")
+        instance_profile = self.auto_scaling_group.node.find_child("InstanceProfile")
+        launch_template = ec2.CfnLaunchTemplate(
+            self, "LaunchTemplate",
+            launch_template_data=ec2.CfnLaunchTemplate.LaunchTemplateDataProperty(
+                image_id=launch_configuration.image_id,
+                iam_instance_profile=ec2.CfnLaunchTemplate.IamInstanceProfileProperty(
+                    arn=instance_profile.attr_arn),
+                security_group_ids=launch_configuration.security_groups,
+                user_data=launch_configuration.user_data
+            )
+        )
+        launch_template.node.add_dependency(self.auto_scaling_group.role)
+        self.auto_scaling_group.node.try_remove_child("LaunchConfig")
+
+        pool = self.pool_params
+        cfn_auto_scaling_group = self.auto_scaling_group.node.default_child
+        cfn_auto_scaling_group.launch_configuration_name = None
+        cfn_auto_scaling_group.mixed_instances_policy = autoscaling.CfnAutoScalingGroup.MixedInstancesPolicyProperty(
+            instances_distribution=autoscaling.CfnAutoScalingGroup.InstancesDistributionProperty(
+                on_demand_base_capacity=pool.get("on_demand_base_capacity", 0),
+                on_demand_percentage_above_base_capacity=pool.get("on_demand_percentage_above_base_capacity", 0),
+                spot_allocation_strategy=SPOT_ALLOCATION_STRATEGY
+            ),
+            launch_template=autoscaling.CfnAutoScalingGroup.LaunchTemplateProperty(
+                launch_template_specification=autoscaling.CfnAutoScalingGroup.LaunchTemplateSpecificationProperty(
+                    launch_template_id=launch_template.ref,
+                    version=launch_template.attr_latest_version_number
+                ),
+                overrides=[
+                    autoscaling.CfnAutoScalingGroup.LaunchTemplateOverridesProperty(instance_type=instance_type)
+                    for instance_type in self.capacity_profile.instance_types
+                ]
+            )
+        )
+
+    def bootstrap_commands(self):
+        stack = core.Stack.of(self)
+        cfn_auto_scaling_group = self.auto_scaling_group.node.default_child
+        return [
+            "set -o xtrace",
+            'TOKEN=$(curl -s -X PUT http://169.254.169.254/latest/api/token '
+            '-H "X-aws-ec2-metadata-token-ttl-seconds: 60")',
+            'LIFECYCLE=$(curl -s -H "X-aws-ec2-metadata-token: $TOKEN" '
+            'http://169.254.169.254/latest/meta-data/instance-life-cycle)',
+            # Same labels and taints given by the default bootstrap to the spot and on demand nodes
+            'if [ "$LIFECYCLE" = "spot" ]; then '
+            'NODE_ARGS="--node-labels lifecycle=Ec2Spot '
+            '--register-with-taints=spotInstance=true:PreferNoSchedule"; '
+            'else NODE_ARGS="--node-labels lifecycle=OnDemand"; fi',
+            f'/etc/eks/bootstrap.sh {self.cluster.cluster_name} '
+            f'--kubelet-extra-args "$NODE_ARGS {self.node_profile.kubelet_extra_args(self.capacity_profile)}" '
+            f"--apiserver-endpoint '{self.cluster.cluster_endpoint}' "
+            f"--b64-cluster-ca '{self.cluster.cluster_certificate_authority_data}' --use-max-pods false",
+            f"/opt/aws/bin/cfn-signal --exit-code $? --stack {stack.stack_name} "
+            f"--resource {stack.get_logical_id(cfn_auto_scaling_group)} --region {stack.region}"
+        ]
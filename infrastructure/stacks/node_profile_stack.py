@@ -0,0 +1,175 @@
+import re
+
+from aws_cdk import (
+    aws_autoscaling as autoscaling,
+    aws_eks as eks,
+    core,
+)
+
+from infrastructure.utils.capacity import CapacityProfile, parse_memory
+
+CPU_MANAGER_POLICIES = ["none", "static"]
+# Sysctls a pod can set without the kubelet allowing them, the other namespaced ones are "unsafe"
+SAFE_SYSCTLS = ["kernel.shm_rmid_forced", "net.ipv4.ip_local_port_range", "net.ipv4.tcp_syncookies",
+                "net.ipv4.ping_group_range", "net.ipv4.ip_unprivileged_port_start"]
+# Sysctls isolated by the network and ipc namespaces of a pod, a value set on the host doesn't reach the pods
+NAMESPACED_SYSCTL_PREFIXES = ("net.", "kernel.shm", "kernel.msg", "kernel.sem", "fs.mqueue.")
+HOST_NET_SYSCTLS = ["net.core.netdev_max_backlog", "net.core.rmem_max", "net.core.wmem_max", "net.core.optmem_max",
+                    "net.netfilter.nf_conntrack_max"]
+SYSCTL_CONF = "/etc/sysctl.d/99-node-profile.conf"
+# Memory the EKS AMI reserves to the kubelet: 255Mi plus 11Mi per pod
+KUBELET_MEMORY_BASE_MIB = 255
+KUBELET_MEMORY_PER_POD_MIB = 11
+# Instance families without the Nitro system, on which the VPC CNI can't assign prefixes
+NON_NITRO_FAMILIES = ("t2", "m4", "c4", "r4", "x1", "x1e", "d2", "h1", "i3", "f1", "g3", "p2", "p3")
+# ENABLE_PREFIX_DELEGATION is ignored by older VPC CNI releases, and EKS creates the 1.21 clusters with 1.7.x
+MIN_PREFIX_DELEGATION_CNI_VERSION = (1, 9, 0)
+# Annotation changing with the add-on version, so that an add-on update re-applies the patch it overwrites
+CNI_VERSION_ANNOTATION = "node-profile/vpc-cni-version"
+# Default backlog of the nginx listen sockets on Linux
+DEFAULT_LISTEN_BACKLOG = 511
+
+
+class NodeProfile(core.Construct):
+    """Kernel and kubelet tuning shared by all the self managed node groups, from `eks.node_profile`.
+
+    `host_sysctls` are written by the user data before the bootstrap. The namespaced `pod_sysctls` (e.g. the listen
+    backlog and the ephemeral port range) only take effect inside the pods: the web server chart sets them in its pod
+    security context and the kubelet allows the unsafe ones. With `prefix_delegation.enabled` the VPC CNI assigns /28
+    prefixes instead of single addresses to the ENIs, so the `max_pods` of the capacity profiles is no longer bound
+    to the number of addresses of the instance type. The VPC CNI is then managed as the `vpc-cni` EKS add-on pinned
+    to `vpc_cni_version`, since the release installed with the cluster doesn't support the prefixes.
+    """
+
+    def __init__(self, scope: core.Construct, id: str, params, cluster: eks.Cluster) -> None:
+        super().__init__(scope, id)
+        self.cluster = cluster
+        self.profile_params = params.eks.node_profile
+        self.host_sysctls = self.profile_params.host_sysctls.__dict__
+        self.pod_sysctls = self.profile_params.pod_sysctls.__dict__
+        self.capacity_profiles = [CapacityProfile.from_params(params, params.eks.compute_size)] + \
+            [CapacityProfile.from_params(params, pool.capacity_profile) for pool in params.eks.spot_node_pools]
+        self.validate_profile_params()
+
+        self.vpc_cni_addon = None
+        vpc_cni_version = self.profile_params.get("vpc_cni_version", None)
+        if vpc_cni_version:
+            self.vpc_cni_addon = eks.CfnAddon(
+                self, "SimpleEKS-NodeProfile-VpcCniAddon",
+                addon_name="vpc-cni",
+                addon_version=vpc_cni_version,
+                cluster_name=self.cluster.cluster_name,
+                # Takes over the aws-node daemonset installed with the cluster
+                resolve_conflicts="OVERWRITE"
+            )
+
+        self.cni_patch = None
+        prefix_delegation = self.profile_params.prefix_delegation
+        if prefix_delegation.enabled:
+            self.cni_patch = eks.KubernetesPatch(
+                self, "SimpleEKS-NodeProfile-CniPrefixDelegation",
+                cluster=self.cluster,
+                resource_name="daemonset/aws-node",
+                resource_namespace="kube-system",
+                apply_patch=self.cni_patch_manifest(True, prefix_delegation.warm_prefix_target, vpc_cni_version),
+                restore_patch=self.cni_patch_manifest(False, prefix_delegation.warm_prefix_target, vpc_cni_version)
+            )
+            self.cni_patch.node.add_dependency(self.vpc_cni_addon)
+
+    def validate_profile_params(self):
+        if self.profile_params.cpu_manager_policy not in CPU_MANAGER_POLICIES:
+            raise ValueError(f"Unsupported cpu_manager_policy {self.profile_params.cpu_manager_policy}, "
+                             f"use one of {', '.join(CPU_MANAGER_POLICIES)}")
+        if not 0 <= self.profile_params.image_gc_low_threshold_percent < \
+                self.profile_params.image_gc_high_threshold_percent <= 100:
+            raise ValueError("The node image garbage collection needs 0 <= image_gc_low_threshold_percent < "
+                             "image_gc_high_threshold_percent <= 100")
+        for name in self.host_sysctls:
+            if self.is_namespaced(name):
+                raise ValueError(f"{name} is a namespaced sysctl, set it in pod_sysctls")
+        for name in self.pod_sysctls:
+            if not self.is_namespaced(name):
+                raise ValueError(f"{name} isn't a namespaced sysctl, set it in host_sysctls")
+
+        if self.profile_params.prefix_delegation.enabled and \
+                self.cni_version(self.profile_params.get("vpc_cni_version", None)) < MIN_PREFIX_DELEGATION_CNI_VERSION:
+            raise ValueError("The VPC CNI prefix delegation needs vpc_cni_version "
+                             f"v{'.'.join(str(n) for n in MIN_PREFIX_DELEGATION_CNI_VERSION)} or later")
+
+        for profile in self.capacity_profiles:
+            # More pods than the kubelet memory reservation accounts for starve the kubelet under load
+            needed_mib = KUBELET_MEMORY_BASE_MIB + KUBELET_MEMORY_PER_POD_MIB * profile.max_pods
+            if parse_memory(profile.kube_reserved.memory) < needed_mib:
+                raise ValueError(f"The {profile.name} capacity profile runs {profile.max_pods} pods, its kube_reserved "
+                                 f"memory must be at least {needed_mib}Mi")
+            if self.profile_params.prefix_delegation.enabled:
+                for instance_type in profile.instance_types:
+                    if instance_type.split(".")[0] in NON_NITRO_FAMILIES:
+                        raise ValueError(f"{instance_type} of the {profile.name} capacity profile isn't a Nitro "
+                                         f"instance type, the VPC CNI prefix delegation needs one")
+
+    @staticmethod
+    def is_namespaced(sysctl: str) -> bool:
+        return sysctl.startswith(NAMESPACED_SYSCTL_PREFIXES) and sysctl not in HOST_NET_SYSCTLS
+
+    @staticmethod
+    def cni_version(version) -> tuple:
+        """Release of a vpc-cni add-on version (e.g. v1.10.1-eksbuild.1), (0, 0, 0) when there's none."""
+        match = re.match(r"^v(\d+)\.(\d+)\.(\d+)", version or "")
+        if version and not match:
+            raise ValueError(f"Unsupported vpc_cni_version {version}, use the vX.Y.Z-eksbuild.N add-on versions")
+        return tuple(int(n) for n in match.groups()) if match else (0, 0, 0)
+
+    @staticmethod
+    def cni_patch_manifest(enabled: bool, warm_prefix_target: int, vpc_cni_version: str):
+        return {
+            "metadata": {
+                "annotations": {CNI_VERSION_ANNOTATION: vpc_cni_version}
+            },
+            "spec": {
+                "template": {
+                    "spec": {
+                        "containers": [{
+                            "name": "aws-node",
+                            "env": [
+                                {"name": "ENABLE_PREFIX_DELEGATION", "value": str(enabled).lower()},
+                                {"name": "WARM_PREFIX_TARGET", "value": str(warm_prefix_target)}
+                            ]
+                        }]
+                    }
+                }
+            }
+        }
+
+    def kubelet_extra_args(self, capacity_profile: CapacityProfile) -> str:
+        args = [
+            capacity_profile.kubelet_extra_args(),
+            f"--image-gc-high-threshold={self.profile_params.image_gc_high_threshold_percent}",
+            f"--image-gc-low-threshold={self.profile_params.image_gc_low_threshold_percent}",
+            f"--cpu-manager-policy={self.profile_params.cpu_manager_policy}"
+        ]
+        unsafe_sysctls = [name for name in self.pod_sysctls if name not in SAFE_SYSCTLS]
+        if unsafe_sysctls:
+            args.append(f"--allowed-unsafe-sysctls={','.join(unsafe_sysctls)}")
+        return " ".join(args)
+
+    def user_data_commands(self) -> list:
+        """Commands applying the host sysctls, run before the bootstrap of the node."""
+        if not self.host_sysctls:
+            return []
+        return [f"echo '{name} = {value}' >> {SYSCTL_CONF}" for name, value in self.host_sysctls.items()] + \
+            ["sysctl --system"]
+
+    def apply(self, auto_scaling_group: autoscaling.AutoScalingGroup) -> None:
+        """Adds the host sysctls to the user data of a node group, to be called before its bootstrap commands."""
+        auto_scaling_group.add_user_data(*self.user_data_commands())
+        if self.cni_patch:
+            # The nodes must not register their max pods before the CNI can assign as many addresses
+            auto_scaling_group.node.add_dependency(self.cni_patch)
+
+    def web_server_pod_sysctls(self) -> list:
+        return [{"name": name, "value": str(value)} for name, value in self.pod_sysctls.items()]
+
+    def listen_backlog(self) -> int:
+        """Backlog of the nginx listen sockets, capped by the somaxconn of the pods."""
+        return int(self.pod_sysctls.get("net.core.somaxconn", DEFAULT_LISTEN_BACKLOG))
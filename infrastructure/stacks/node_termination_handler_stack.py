@@ -0,0 +1,122 @@
+from aws_cdk import (
+    aws_autoscaling as autoscaling,
+    aws_eks as eks,
+    aws_events as events,
+    aws_events_targets as events_targets,
+    aws_iam as iam,
+    aws_sqs as sqs,
+    core,
+)
+
+# Tag checked by the handler before draining a node, only the nodes of the tagged groups are handled
+MANAGED_ASG_TAG = "aws-node-termination-handler/managed"
+
+# Events forwarded to the handler queue, each one gives the node a different notice before it goes away
+INTERRUPTION_EVENTS = {
+    "SpotInterruption": {"source": ["aws.ec2"], "detail_type": ["EC2 Spot Instance Interruption Warning"]},
+    "Rebalance": {"source": ["aws.ec2"], "detail_type": ["EC2 Instance Rebalance Recommendation"]},
+    "InstanceStateChange": {"source": ["aws.ec2"], "detail_type": ["EC2 Instance State-change Notification"]},
+    "ScheduledChange": {"source": ["aws.health"], "detail_type": ["AWS Health Event"]},
+    "AsgTerminate": {"source": ["aws.autoscaling"], "detail_type": ["EC2 Instance-terminate Lifecycle Action"]},
+}
+
+
+class NodeTerminationHandler(core.Construct):
+    """AWS Node Termination Handler in queue mode.
+
+    Spot interruptions, rebalance recommendations, scheduled maintenances and the terminations of the autoscaling
+    groups are sent by EventBridge to an SQS queue consumed by the handler, which cordons and drains the node
+    before it goes away. The terminating lifecycle hook keeps the instances of the autoscaling groups alive until
+    the drain is completed.
+    """
+
+    def __init__(self, scope: core.Construct, id: str, params, cluster: eks.Cluster,
+                 auto_scaling_groups: list) -> None:
+        super().__init__(scope, id)
+        self.cluster = cluster
+        self.handler_params = params.eks.node_termination_handler
+        self.validate_handler_params()
+
+        self.queue = sqs.Queue(
+            self, "SimpleEKS-NodeTerminationHandler-Queue",
+            retention_period=core.Duration.seconds(self.handler_params.message_retention_seconds)
+        )
+        # SQS managed encryption: the policy of the AWS managed alias/aws/sqs key doesn't let EventBridge send to
+        # the queue, and this CDK version has no SQS managed option in QueueEncryption
+        self.queue.node.default_child.add_property_override("SqsManagedSseEnabled", True)
+        self.rules = []
+        for name, event_pattern in INTERRUPTION_EVENTS.items():
+            rule = events.Rule(
+                self, f"SimpleEKS-NodeTerminationHandler-{name}Rule",
+                event_pattern=events.EventPattern(**event_pattern),
+                targets=[events_targets.SqsQueue(self.queue)]
+            )
+            self.rules.append(rule)
+
+        for auto_scaling_group in auto_scaling_groups:
+            core.Tags.of(auto_scaling_group).add(MANAGED_ASG_TAG, "true")
+            auto_scaling_group.add_lifecycle_hook(
+                "SimpleEKS-NodeTerminationHandler-LifecycleHook",
+                lifecycle_transition=autoscaling.LifecycleTransition.INSTANCE_TERMINATING,
+                heartbeat_timeout=core.Duration.seconds(self.handler_params.heartbeat_timeout_seconds),
+                default_result=autoscaling.DefaultResult.CONTINUE
+            )
+
+        self.service_account = self.cluster.add_service_account(
+            "SimpleEKS-NodeTerminationHandler-ServiceAccount",
+            name="aws-node-termination-handler",
+            namespace="kube-system"
+        )
+        self.service_account.add_to_principal_policy(iam.PolicyStatement(
+            actions=[
+                "autoscaling:CompleteLifecycleAction",
+                "autoscaling:DescribeAutoScalingInstances",
+                "autoscaling:DescribeTags",
+                "ec2:DescribeInstances"
+            ],
+            resources=["*"],
+            effect=iam.Effect.ALLOW
+        ))
+        self.queue.grant_consume_messages(self.service_account)
+
+        self.chart = self.cluster.add_helm_chart(
+            "SimpleEKS-EKS-NodeTerminationHandler-HelmChart",
+            chart="aws-node-termination-handler",
+            release="aws-node-termination-handler",
+            version=self.handler_params.chart_version,
+            namespace="kube-system",
+            repository="https://aws.github.io/eks-charts",
+            values=self.chart_values()
+        )
+        self.chart.node.add_dependency(self.service_account)
+
+    def validate_handler_params(self):
+        # The queue must keep the notices at least as long as a node may wait for its drain
+        if self.handler_params.message_retention_seconds < self.handler_params.heartbeat_timeout_seconds:
+            raise ValueError("message_retention_seconds of the node termination handler must be at least "
+                             "heartbeat_timeout_seconds")
+        if self.handler_params.node_termination_grace_period_seconds > \
+                self.handler_params.heartbeat_timeout_seconds:
+            raise ValueError("node_termination_grace_period_seconds of the node termination handler can't exceed "
+                             "heartbeat_timeout_seconds")
+
+    def chart_values(self):
+        return {
+            "enableSqsTerminationDraining": True,
+            "queueURL": self.queue.queue_url,
+            "awsRegion": core.Stack.of(self).region,
+            "serviceAccount": {
+                "create": False,
+                "name": "aws-node-termination-handler"
+            },
+            "checkASGTagBeforeDraining": True,
+            "managedAsgTag": MANAGED_ASG_TAG,
+            "enableRebalanceDraining": self.handler_params.rebalance_draining,
+            # -1 respects the termination grace period of the pods
+            "podTerminationGracePeriod": -1,
+            "nodeTerminationGracePeriod": self.handler_params.node_termination_grace_period_seconds,
+            # The handler must not run on the spot nodes it drains
+            "nodeSelector": {
+                "lifecycle": "OnDemand"
+            }
+        }
@@ -6,17 +6,33 @@ from aws_cdk import (
     aws_codepipeline_actions as codepipeline_actions,
     aws_codestarconnections as codestar,
     aws_iam as iam,
+    aws_s3 as s3,
     aws_secretsmanager as secretsmanager,
     core
 )
 
 from infrastructure.stacks.eks_stack import EksStack
 
+GITHUB_TRIGGERS = {
+    "webhook": codepipeline_actions.GitHubTrigger.WEBHOOK,
+    "poll": codepipeline_actions.GitHubTrigger.POLL,
+}
+BUILD_CACHES = ["s3", "local"]
+# pip and npm downloads and the synth cache of app.py, kept between builds
+CACHED_PATHS = ["/root/.cache/pip/**/*", "/root/.npm/**/*", ".cdk-synth-cache/**/*"]
+
 
 class PipelineStack(core.NestedStack):
     def __init__(self, scope: core.Construct, id: str, params, eks_stack: EksStack,
                  **kwargs) -> None:
         super().__init__(scope, id, **kwargs)
+        pipeline_params = params.pipeline
+        if pipeline_params.trigger not in GITHUB_TRIGGERS:
+            raise ValueError(f"Unsupported pipeline trigger {pipeline_params.trigger}, "
+                             f"use one of {', '.join(GITHUB_TRIGGERS)}")
+        if pipeline_params.cache not in BUILD_CACHES:
+            raise ValueError(f"Unsupported pipeline cache {pipeline_params.cache}, "
+                             f"use one of {', '.join(BUILD_CACHES)}")
 
         github_secret = secretsmanager.CfnSecret(
             self,
@@ -87,47 +103,46 @@ class PipelineStack(core.NestedStack):
             )
         ]
 
-        self.deploy_project = codebuild.PipelineProject(self,
-                                                        "SimpleEKS-CodeBuild-Project",
-                                                        environment=codebuild.BuildEnvironment(
-                                                            privileged=True,
-                                                            build_image=codebuild.LinuxBuildImage.STANDARD_5_0
-                                                        ),
-                                                        environment_variables={
-                                                            "ENVIRONMENT": codebuild.BuildEnvironmentVariable(
-                                                                value=params.name)
-                                                        },
-                                                        build_spec=codebuild.BuildSpec.from_object(
-                                                            {
-                                                                "version": '0.2',
-                                                                "env": {},
-                                                                "phases": {
-                                                                    "install": {
-                                                                        "runtime-versions": {
-                                                                            "nodejs": 14,
-                                                                            "python": "3.8"
-                                                                        },
-                                                                        "commands": [
-                                                                            "echo Build started on `date`",
-                                                                            "pip3 install -r requirements.txt",
-                                                                            "npm install -g aws-cdk@1.137.0"
-                                                                        ]
-                                                                    },
-                                                                    "build": {
-                                                                        "commands": [
-                                                                            "cd ${CODEBUILD_SRC_DIR}",
-                                                                            "cdk deploy"
-                                                                        ]
-                                                                    }
-                                                                }
-                                                            }
-                                                        )
-                                                        )
-
-        for policy in self.codebuild_policies:
-            self.deploy_project.add_to_role_policy(policy)
+        self.cache = self.build_cache(params, pipeline_params.cache)
+        self.synth_project = self.build_project(
+            "SimpleEKS-CodeBuild-Synth-Project", params,
+            commands=[
+                "cdk synth --quiet",
+                # The deploy is skipped when no stack differs from the deployed one
+                "if cdk diff --app cdk.out --fail > cdk.out/diff.txt 2>&1; then echo none > cdk.out/changes; "
+                "else echo changed > cdk.out/changes; fi",
+                "cat cdk.out/diff.txt"
+            ],
+            artifacts={
+                "base-directory": "cdk.out",
+                "files": ["**/*"]
+            }
+        )
+        self.image_project = self.build_project(
+            "SimpleEKS-CodeBuild-WebServerImage-Project", params,
+            commands=[
+                "cdk synth --quiet",
+                "aws ecr get-login-password | docker login --username AWS --password-stdin "
+                "${AWS_ACCOUNT_ID}.dkr.ecr.${AWS_DEFAULT_REGION}.amazonaws.com",
+                "python -m infrastructure.utils.container_assets cdk.out"
+            ]
+        )
+        # Deploys the cloud assembly of the synth action, the image assets are already published
+        self.deploy_project = self.build_project(
+            "SimpleEKS-CodeBuild-Project", params,
+            install_commands=["npm install -g aws-cdk@1.137.0"],
+            commands=[
+                'if [ "$(cat changes)" = "none" ]; then echo No stack changed, skipping the deploy; '
+                "else cdk deploy --app . --require-approval never; fi"
+            ]
+        )
+
+        for project in [self.synth_project, self.image_project, self.deploy_project]:
+            for policy in self.codebuild_policies:
+                project.add_to_role_policy(policy)
 
         self.source_output = codepipeline.Artifact()
+        self.cloud_assembly_output = codepipeline.Artifact("CloudAssembly")
 
         self.pipeline = codepipeline.Pipeline(self,
                                               "SimpleEKS-CodePipeline-Pipeline",
@@ -141,7 +156,7 @@ class PipelineStack(core.NestedStack):
                                                               output=self.source_output,
                                                               owner=params.github_repository_owner,
                                                               branch=params.branch,
-                                                              trigger=codepipeline_actions.GitHubTrigger.POLL,
+                                                              trigger=GITHUB_TRIGGERS[pipeline_params.trigger],
                                                               repo=params.git_repository_name,
                                                               oauth_token=core.SecretValue.secrets_manager(
                                                                   secret_id=github_secret.name,
@@ -149,15 +164,32 @@ class PipelineStack(core.NestedStack):
                                                           )
                                                       ]
                                                   ),
+                                                  # Same run order: the two actions run in parallel
                                                   codepipeline.StageProps(
-                                                      stage_name="BuildAndDeploy",
+                                                      stage_name="Build",
                                                       actions=[
                                                           codepipeline_actions.CodeBuildAction(
-                                                              action_name="BuildAndDeploy",
-                                                              project=self.deploy_project,
+                                                              action_name="SynthAndDiff",
+                                                              project=self.synth_project,
+                                                              input=self.source_output,
+                                                              outputs=[self.cloud_assembly_output]
+                                                          ),
+                                                          codepipeline_actions.CodeBuildAction(
+                                                              action_name="WebServerImage",
+                                                              project=self.image_project,
                                                               input=self.source_output
                                                           )
                                                       ]
+                                                  ),
+                                                  codepipeline.StageProps(
+                                                      stage_name="Deploy",
+                                                      actions=[
+                                                          codepipeline_actions.CodeBuildAction(
+                                                              action_name="Deploy",
+                                                              project=self.deploy_project,
+                                                              input=self.cloud_assembly_output
+                                                          )
+                                                      ]
                                                   )
                                               ]
                                               )
@@ -176,3 +208,61 @@ class PipelineStack(core.NestedStack):
 
         #eks_stack.cluster.aws_auth.add_role_mapping(role=self.deploy_project.role,
         #                                            groups=["system:masters"])
+
+    def build_cache(self, params, cache_type: str):
+        if cache_type == "local":
+            # Kept on the build host, only reused by the builds that land on the same host
+            return codebuild.Cache.local(codebuild.LocalCacheMode.CUSTOM, codebuild.LocalCacheMode.DOCKER_LAYER,
+                                         codebuild.LocalCacheMode.SOURCE)
+        self.cache_bucket = s3.Bucket(
+            self, "SimpleEKS-CodeBuild-Cache-Bucket",
+            encryption=s3.BucketEncryption.S3_MANAGED,
+            block_public_access=s3.BlockPublicAccess.BLOCK_ALL,
+            lifecycle_rules=[s3.LifecycleRule(expiration=core.Duration.days(30))]
+        )
+        return codebuild.Cache.bucket(self.cache_bucket, prefix=params.name)
+
+    def build_project(self, id: str, params, commands: list, install_commands: list = None,
+                      artifacts: dict = None) -> codebuild.PipelineProject:
+        build_spec = {
+            "version": '0.2',
+            "env": {},
+            "phases": {
+                "install": {
+                    "runtime-versions": {
+                        "nodejs": 14,
+                        "python": "3.8"
+                    },
+                    "commands": ["echo Build started on `date`"] + (install_commands or [
+                        "pip3 install -r requirements.txt",
+                        "npm install -g aws-cdk@1.137.0"
+                    ])
+                },
+                "build": {
+                    "commands": ["cd ${CODEBUILD_SRC_DIR}"] + commands
+                }
+            },
+            "cache": {
+                "paths": CACHED_PATHS
+            }
+        }
+        if artifacts:
+            build_spec["artifacts"] = artifacts
+        return codebuild.PipelineProject(self,
+                                         id,
+                                         environment=codebuild.BuildEnvironment(
+                                             privileged=True,
+                                             build_image=codebuild.LinuxBuildImage.STANDARD_5_0
+                                         ),
+                                         environment_variables={
+                                             "ENVIRONMENT": codebuild.BuildEnvironmentVariable(value=params.name),
+                                             "AWS_ACCOUNT_ID": codebuild.BuildEnvironmentVariable(
+                                                 value=core.Aws.ACCOUNT_ID),
+                                             "CDK_SYNTH_CACHE": codebuild.BuildEnvironmentVariable(
+                                                 value=".cdk-synth-cache"),
+                                             # Needed by the cache mounts of the Dockerfile and the inline layer cache
+                                             "DOCKER_BUILDKIT": codebuild.BuildEnvironmentVariable(value="1")
+                                         },
+                                         cache=self.cache,
+                                         build_spec=codebuild.BuildSpec.from_object(build_spec)
+                                         )
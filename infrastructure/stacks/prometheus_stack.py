@@ -0,0 +1,155 @@
+import json
+
+from aws_cdk import (
+    aws_eks as eks,
+    aws_iam as iam,
+    core,
+)
+
+from infrastructure.stacks.ebs_csi_driver_stack import EbsCsiDriver, claim_name, volume_size_gib
+from infrastructure.utils.monitoring import recording_rules, remote_write_config
+
+NAMESPACE = "prometheus"
+SERVER_SERVICE_ACCOUNT = "prometheus-server"
+# Durations and sizes as accepted by the prometheus flags
+DURATION_UNITS = ("ms", "s", "m", "h", "d", "w", "y")
+SIZE_UNITS = ("KB", "MB", "GB", "TB")
+# Prometheus sizes are powers of 1024, like the Gi of the volumes
+SIZE_UNIT_GIB = {"KB": 1 / 1024 ** 2, "MB": 1 / 1024, "GB": 1, "TB": 1024}
+# Share of the server volume the blocks may use, the rest is left to the WAL and to the compactions
+MAX_RETENTION_SIZE_RATIO = 0.8
+
+
+def split_unit(value: str, units: tuple):
+    for unit in sorted(units, key=len, reverse=True):
+        number = value[:-len(unit)]
+        if value.endswith(unit) and number.isdigit() and int(number) > 0:
+            return int(number), unit
+    raise ValueError(f"{value} must be a positive integer followed by one of {', '.join(units)}")
+
+
+class Prometheus(core.Construct):
+    """Prometheus server of the cluster, sized by the `eks.prometheus` parameters.
+
+    The recording rules of `infrastructure.utils.monitoring` precompute the web server SLIs at the evaluation
+    interval, the prometheus-adapter serves the per pod ones to the HPA. With `remote_write.enabled` the samples are
+    also sent to a remote storage (e.g. Amazon Managed Service for Prometheus with `sigv4`), by default only the
+    recorded series so that long term queries don't depend on the size of the local volume.
+    """
+
+    def __init__(self, scope: core.Construct, id: str, params, cluster: eks.Cluster, scrape_configs: list,
+                 ebs_csi_driver: EbsCsiDriver) -> None:
+        super().__init__(scope, id)
+        self.cluster = cluster
+        self.prometheus_params = params.eks.prometheus
+        self.web_server_scrape_interval = params.eks.web_server_metrics.scrape_interval
+        self.volumes = params.eks.storage.volumes
+        self.validate_prometheus_params()
+        self.rules = recording_rules(self.prometheus_params.evaluation_interval)
+
+        # The chart owns the namespace and the server service account, which only carries the IRSA role of the remote
+        # write, so that disabling it never deletes the namespace with the release and its claims
+        self.remote_write_role = None
+        remote_write_params = self.prometheus_params.remote_write
+        if remote_write_params.enabled and remote_write_params.sigv4:
+            self.remote_write_role = self.server_service_account_role()
+            self.remote_write_role.add_to_principal_policy(iam.PolicyStatement(
+                actions=["aps:RemoteWrite"],
+                resources=["*"],
+                effect=iam.Effect.ALLOW
+            ))
+
+        self.chart = self.cluster.add_helm_chart(
+            "SimpleEKS-EKS-Prometheus-HelmChart",
+            release="prometheus",
+            chart="prometheus",
+            version=self.prometheus_params.chart_version,
+            create_namespace=True,
+            namespace=NAMESPACE,
+            repository="https://prometheus-community.github.io/helm-charts",
+            values=self.chart_values(scrape_configs)
+        )
+
+        # The chart creates the namespace of the claims, its pods wait for them
+        self.claims = []
+        for volume in ("prometheus_server", "alertmanager"):
+            claim = ebs_csi_driver.add_claim(volume, NAMESPACE)
+            claim.node.add_dependency(self.chart)
+            self.claims.append(claim)
+
+    def server_service_account_role(self) -> iam.Role:
+        """IRSA role that only the server service account of the namespace can assume."""
+        issuer = self.cluster.cluster_open_id_connect_issuer
+        conditions = core.CfnJson(self, "SimpleEKS-Prometheus-ServerRoleConditions", value={
+            f"{issuer}:aud": "sts.amazonaws.com",
+            f"{issuer}:sub": f"system:serviceaccount:{NAMESPACE}:{SERVER_SERVICE_ACCOUNT}"
+        })
+        return iam.Role(
+            self,
+            "SimpleEKS-Prometheus-ServerRole",
+            assumed_by=iam.OpenIdConnectPrincipal(self.cluster.open_id_connect_provider).with_conditions({
+                "StringEquals": conditions
+            })
+        )
+
+    def validate_prometheus_params(self):
+        for interval in (self.prometheus_params.scrape_interval, self.prometheus_params.evaluation_interval,
+                         self.prometheus_params.retention):
+            split_unit(interval, DURATION_UNITS)
+        retention_size, unit = split_unit(self.prometheus_params.retention_size, SIZE_UNITS)
+        if retention_size * SIZE_UNIT_GIB[unit] > \
+                volume_size_gib(self.volumes.prometheus_server.size) * MAX_RETENTION_SIZE_RATIO:
+            raise ValueError(f"retention_size of prometheus can't exceed {MAX_RETENTION_SIZE_RATIO:.0%} of the "
+                             f"prometheus_server volume")
+        # The recording rules compute rate() over 1m windows, which need at least two samples of the web server
+        number, unit = split_unit(self.web_server_scrape_interval, DURATION_UNITS)
+        if unit not in ("ms", "s") or (unit == "s" and number > 30):
+            raise ValueError("The web server metrics scrape_interval must be at most 30s for the recording rules")
+        remote_write_params = self.prometheus_params.remote_write
+        if remote_write_params.enabled:
+            if not remote_write_params.url.startswith(("http://", "https://")):
+                raise ValueError("The prometheus remote write needs an http(s) url")
+            if remote_write_params.max_samples_per_send > remote_write_params.capacity:
+                raise ValueError("max_samples_per_send of the prometheus remote write can't exceed its capacity")
+
+    def chart_values(self, scrape_configs: list):
+        server = {
+            "global": {
+                "scrape_interval": self.prometheus_params.scrape_interval,
+                "evaluation_interval": self.prometheus_params.evaluation_interval
+            },
+            "retention": self.prometheus_params.retention,
+            "extraArgs": {
+                "storage.tsdb.retention.size": self.prometheus_params.retention_size
+            },
+            "resources": {kind: dict(quantities.__dict__)
+                          for kind, quantities in self.prometheus_params.resources.__dict__.items()},
+            "persistentVolume": self.persistent_volume_values("prometheus_server")
+        }
+        remote_write_params = self.prometheus_params.remote_write
+        if remote_write_params.enabled:
+            server["remoteWrite"] = [remote_write_config(remote_write_params, core.Stack.of(self).region, self.rules)]
+        values = {
+            "alertmanager": {
+                "persistentVolume": self.persistent_volume_values("alertmanager")
+            },
+            "server": server,
+            "serverFiles": {
+                "recording_rules.yml": self.rules
+            },
+            # json is valid yaml, the chart expects the extra jobs as a yaml string
+            "extraScrapeConfigs": json.dumps(scrape_configs)
+        }
+        if self.remote_write_role:
+            values["serviceAccounts"] = {"server": {
+                "create": True,
+                "name": SERVER_SERVICE_ACCOUNT,
+                "annotations": {"eks.amazonaws.com/role-arn": self.remote_write_role.role_arn}
+            }}
+        return values
+
+    @staticmethod
+    def persistent_volume_values(volume: str):
+        return {
+            "existingClaim": claim_name(volume)
+        }
@@ -5,6 +5,16 @@ from aws_cdk import (
 
 from infrastructure.utils.utils import tag_all_subnets
 
+# Interface endpoints of the AWS services called by the nodes and the controllers running on them
+INTERFACE_ENDPOINT_SERVICES = {
+    "ecr.api": ec2.InterfaceVpcEndpointAwsService.ECR,
+    "ecr.dkr": ec2.InterfaceVpcEndpointAwsService.ECR_DOCKER,
+    "sts": ec2.InterfaceVpcEndpointAwsService.STS,
+    "ec2": ec2.InterfaceVpcEndpointAwsService.EC2,
+    "logs": ec2.InterfaceVpcEndpointAwsService.CLOUDWATCH_LOGS,
+    "elasticloadbalancing": ec2.InterfaceVpcEndpointAwsService.ELASTIC_LOAD_BALANCING,
+}
+
 
 class VpcStack(core.NestedStack):
     def __init__(self, scope: core.Construct, id: str, params,
@@ -59,5 +69,47 @@ class VpcStack(core.NestedStack):
                 enable_dns_hostnames=True
             )
 
+        # CDK silently caps the zones of an environment agnostic stack at two and the nat gateways at one per zone
+        availability_zones = len(self.vpc.availability_zones)
+        if params.vpc.az_number > availability_zones:
+            raise ValueError(f"az_number is {params.vpc.az_number} but the VPC can only span {availability_zones} "
+                             f"availability zones, see the README before adding one")
+        if self.nats_number > availability_zones:
+            raise ValueError(f"nats_number can't exceed the {availability_zones} availability zones of the VPC")
+
         tag_all_subnets(self.vpc.private_subnets,
                         f"kubernetes.io/cluster/{params.eks.cluster_name}", "shared")
+
+        self.endpoints = {}
+        endpoints_params = params.vpc.get("endpoints", None)
+        if endpoints_params:
+            self.add_endpoints(endpoints_params)
+
+    def add_endpoints(self, endpoints_params):
+        """Keeps the traffic towards S3 and the AWS APIs inside the VPC, off the nat gateways."""
+        for service in endpoints_params.interface_services:
+            if service not in INTERFACE_ENDPOINT_SERVICES:
+                raise ValueError(f"Unsupported interface endpoint {service}, "
+                                 f"use one of {', '.join(INTERFACE_ENDPOINT_SERVICES)}")
+
+        if endpoints_params.s3_gateway:
+            # Gateway endpoints are free: S3 is reached through the route tables of every non public subnet
+            self.endpoints["s3"] = self.vpc.add_gateway_endpoint(
+                "S3Endpoint",
+                service=ec2.GatewayVpcEndpointAwsService.S3,
+                subnets=[ec2.SubnetSelection(subnet_type=subnet_type) for subnet_type in self.node_subnet_types()]
+            )
+
+        for service in endpoints_params.interface_services:
+            endpoint_id = "".join(part.capitalize() for part in service.split("."))
+            self.endpoints[service] = self.vpc.add_interface_endpoint(
+                f"{endpoint_id}Endpoint",
+                service=INTERFACE_ENDPOINT_SERVICES[service],
+                subnets=ec2.SubnetSelection(subnet_type=self.node_subnet_types()[0]),
+                private_dns_enabled=True
+            )
+
+    def node_subnet_types(self):
+        if self.nats_number == 0:
+            return [ec2.SubnetType.ISOLATED]
+        return [ec2.SubnetType.PRIVATE, ec2.SubnetType.ISOLATED]
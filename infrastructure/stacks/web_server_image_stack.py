@@ -0,0 +1,56 @@
+import os
+
+from aws_cdk import (
+    aws_ecr_assets as ecr_assets,
+    aws_iam as iam,
+    core,
+    custom_resources as cr,
+)
+
+IMAGE_DIRECTORY = f"{os.path.dirname(__file__)}/../../images/web_server"
+
+
+class WebServerImage(core.Construct):
+    """Web server image built for the architecture of the nodes running it, referenced by digest.
+
+    The tag of an image asset can be pushed again, while its digest identifies the exact image content: pods
+    started from the digest pinned uri can safely use the image cached by the node instead of pulling it again.
+    """
+
+    def __init__(self, scope: core.Construct, id: str, params, architecture: str) -> None:
+        super().__init__(scope, id)
+        self.image_asset = ecr_assets.DockerImageAsset(
+            self, "SimpleEKS-ECR-WebServer-Image",
+            directory=IMAGE_DIRECTORY,
+            file="Dockerfile",
+            repository_name=params.eks.container_image_name,
+            build_args={
+                "TARGET_PLATFORM": f"linux/{architecture}"
+            }
+        )
+
+        # <registry>/<repository>:<tag>, the tag is derived from the hash of the image sources
+        registry_and_repository, image_tag = [
+            core.Fn.select(index, core.Fn.split(":", self.image_asset.image_uri)) for index in (0, 1)
+        ]
+        describe_image = cr.AwsSdkCall(
+            service="ECR",
+            action="describeImages",
+            parameters={
+                "repositoryName": self.image_asset.repository.repository_name,
+                "imageIds": [{"imageTag": image_tag}]
+            },
+            physical_resource_id=cr.PhysicalResourceId.of(self.image_asset.asset_hash)
+        )
+        self.image_details = cr.AwsCustomResource(
+            self, "SimpleEKS-WebServer-ImageDigest",
+            on_create=describe_image,
+            on_update=describe_image,
+            policy=cr.AwsCustomResourcePolicy.from_statements([iam.PolicyStatement(
+                actions=["ecr:DescribeImages"],
+                resources=[self.image_asset.repository.repository_arn]
+            )]),
+            install_latest_aws_sdk=False
+        )
+        self.image_digest = self.image_details.get_response_field("imageDetails.0.imageDigest")
+        self.image_uri = core.Fn.join("", [registry_and_repository, "@", self.image_digest])
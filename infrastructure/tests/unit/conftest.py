@@ -0,0 +1,28 @@
+import pytest
+
+from aws_cdk import (
+    core,
+    assertions
+)
+
+from infrastructure.infrastructure_stack import InfrastructureStack
+from infrastructure.tests.unit.utils import TEST_ENVIRONMENT, load_params
+
+
+@pytest.fixture(scope="session")
+def dev_stack():
+    app = core.App()
+    return InfrastructureStack(app, "CC-MainStack", env=TEST_ENVIRONMENT,
+                               params=load_params("dev"))
+
+
+@pytest.fixture(scope="session")
+def prod_stack():
+    app = core.App()
+    return InfrastructureStack(app, "CC-MainStack", env=TEST_ENVIRONMENT,
+                               params=load_params("prod"))
+
+
+@pytest.fixture(scope="session")
+def eks_template(dev_stack):
+    return assertions.Template.from_stack(dev_stack.eks_stack)
@@ -0,0 +1,51 @@
+import pytest
+
+from aws_cdk import core
+
+from infrastructure.infrastructure_stack import InfrastructureStack
+from infrastructure.tests.unit.utils import helm_chart_values, load_params
+
+
+def test_web_server_ingress_uses_ip_targets(eks_template):
+    ingress = helm_chart_values(eks_template, "WebServerHelmChart")["ingress"]
+    assert ingress["targetType"] == "ip"
+    assert ingress["targetGroupAttributes"] == {
+        "deregistration_delay.timeout_seconds": 30,
+        "load_balancing.algorithm.type": "least_outstanding_requests"
+    }
+    assert ingress["healthCheck"]["path"] == "/healthz"
+    assert ingress["healthCheck"]["intervalSeconds"] == 10
+
+
+def test_slow_start_with_least_outstanding_requests_is_rejected():
+    params = load_params("dev")
+    params.eks.web_server_ingress.slow_start_seconds = 30
+    with pytest.raises(ValueError, match="slow start"):
+        InfrastructureStack(core.App(), "CC-MainStack", env=core.Environment(region="eu-west-1"), params=params)
+
+
+def test_unknown_target_type_is_rejected():
+    params = load_params("dev")
+    params.eks.web_server_ingress.target_type = "lambda"
+    with pytest.raises(ValueError, match="target type"):
+        InfrastructureStack(core.App(), "CC-MainStack", env=core.Environment(region="eu-west-1"), params=params)
+
+
+def test_connection_tuning_from_parameters(eks_template):
+    connection = helm_chart_values(eks_template, "WebServerHelmChart")["connection"]
+    assert connection == {"idleTimeoutSeconds": 60, "http2": True, "keepaliveTimeout": "75s",
+                          "keepaliveRequests": 1000}
+
+
+@pytest.mark.parametrize("env_name, section, key, value, match", [
+    ("dev", "web_server_connection", "keepalive_timeout", "60s", "longer than the ALB idle timeout"),
+    ("dev", "web_server_connection", "idle_timeout_seconds", 0, "between 1 and 4000"),
+    ("dev", "web_server_connection", "keepalive_requests", 10, "at least 100"),
+    ("prod", "cdn", "origin_keepalive_timeout_seconds", 60, "shorter than the ALB idle timeout"),
+])
+def test_mismatched_timeouts_are_rejected(env_name, section, key, value, match):
+    params = load_params(env_name)
+    section_params = params.cdn if section == "cdn" else params.eks.__dict__[section]
+    setattr(section_params, key, value)
+    with pytest.raises(ValueError, match=match):
+        InfrastructureStack(core.App(), "CC-MainStack", env=core.Environment(region="eu-west-1"), params=params)
@@ -0,0 +1,105 @@
+import json
+
+import pytest
+
+from aws_cdk import (
+    assertions,
+    core
+)
+
+from infrastructure.infrastructure_stack import InfrastructureStack
+from infrastructure.tests.unit.utils import TEST_ENVIRONMENT, helm_chart_values, load_params
+
+CHART_DIR = "helm/ccekswebserver/templates"
+
+
+def chart_template(name):
+    with open(f"{CHART_DIR}/{name}", "r") as f:
+        return f.read()
+
+
+@pytest.fixture(scope="module")
+def prod_template(prod_stack):
+    return assertions.Template.from_stack(prod_stack.eks_stack)
+
+
+def test_web_server_rollout_steps_and_analysis_from_parameters(prod_template):
+    rollout = helm_chart_values(prod_template, "WebServerHelmChart")["rollout"]
+    assert rollout["enabled"] is True
+    assert rollout["scaleDownDeployment"] is False
+    assert rollout["steps"] == [
+        {"setWeight": 10}, {"pause": {"duration": "60s"}},
+        {"setWeight": 25}, {"pause": {"duration": "60s"}},
+        {"setWeight": 50}, {"pause": {"duration": "120s"}}
+    ]
+    assert rollout["analysis"] == {
+        "prometheusAddress": "http://prometheus-server.prometheus.svc.cluster.local",
+        "interval": "30s",
+        "window": "60s",
+        "failureLimit": 2,
+        "maxErrorRate": 0.01,
+        "maxP95LatencySeconds": 0.3
+    }
+
+
+def test_rollout_migrates_from_the_deployment():
+    # Swapping the kind in the release would delete the serving Deployment before the Rollout has any pod
+    deployment = chart_template("deployment.yaml")
+    assert deployment.startswith("apiVersion: apps/v1\nkind: Deployment\n")
+    assert "kind: Rollout" not in deployment and "canaryStrategy" not in deployment
+    assert "{{- if and .Values.rollout.enabled .Values.rollout.scaleDownDeployment }}" in deployment
+    assert "  replicas: 0\n" in deployment
+
+    rollout = chart_template("rollout.yaml")
+    assert "kind: Rollout\n" in rollout
+    assert "  workloadRef:\n    apiVersion: apps/v1\n    kind: Deployment\n    name: {{ $fullName }}\n" in rollout
+    assert "template:" not in rollout.split("---")[0]
+
+    # The use-annotation backend forwards to the stable service until Argo Rollouts sets the weights
+    helpers = chart_template("_helpers.tpl")
+    assert "alb.ingress.kubernetes.io/actions.{{ $fullName }}: {{ toJson $action | quote }}" in helpers
+    assert '$stable := dict "serviceName" $fullName "servicePort" $port "weight" 100' in helpers
+
+
+def test_controller_is_installed_before_the_web_server(prod_template):
+    charts = prod_template.find_resources("Custom::AWSCDK-EKS-HelmChart")
+    controller_id = [logical_id for logical_id in charts if "ArgoRolloutsHelmChart" in logical_id][0]
+    assert charts[controller_id]["Properties"]["Chart"] == "argo-rollouts"
+    web_server = [chart for logical_id, chart in charts.items() if "WebServerHelmChart" in logical_id][0]
+    assert controller_id in web_server["DependsOn"]
+
+
+def test_canary_pods_are_told_apart_in_the_metrics(prod_template):
+    jobs = json.loads(helm_chart_values(prod_template, "EKSPrometheusHelmChart")["extraScrapeConfigs"])
+    assert {"source_labels": ["__meta_kubernetes_pod_label_rollouts_pod_template_hash"],
+            "target_label": "rollouts_pod_template_hash"} in jobs[0]["relabel_configs"]
+
+
+def test_canary_pods_are_scraped_without_a_service(prod_template):
+    # The stable and canary services of a rollout each select the pods of one template hash only
+    jobs = json.loads(helm_chart_values(prod_template, "EKSPrometheusHelmChart")["extraScrapeConfigs"])
+    assert jobs[0]["kubernetes_sd_configs"] == [{"role": "pod", "namespaces": {"names": ["default"]}}]
+    assert {"source_labels": ["__meta_kubernetes_pod_label_app_kubernetes_io_name"], "action": "keep",
+            "regex": "ccekswebserver"} in jobs[0]["relabel_configs"]
+    assert not [config for config in jobs[0]["relabel_configs"]
+                if config["source_labels"][0].startswith("__meta_kubernetes_service")]
+
+
+def test_rollout_is_disabled_in_dev(eks_template):
+    assert helm_chart_values(eks_template, "WebServerHelmChart")["rollout"] == {"enabled": False}
+    assert not [logical_id for logical_id in eks_template.find_resources("Custom::AWSCDK-EKS-HelmChart")
+                if "ArgoRollouts" in logical_id]
+
+
+def test_decreasing_weights_are_rejected():
+    params = load_params("prod")
+    params.eks.web_server_rollout.steps[1].weight = 5
+    with pytest.raises(ValueError, match="increasing weights"):
+        InfrastructureStack(core.App(), "CC-MainStack", env=TEST_ENVIRONMENT, params=params)
+
+
+def test_analysis_window_must_cover_two_samples():
+    params = load_params("prod")
+    params.eks.web_server_rollout.analysis.window_seconds = 30
+    with pytest.raises(ValueError, match="window_seconds"):
+        InfrastructureStack(core.App(), "CC-MainStack", env=TEST_ENVIRONMENT, params=params)
@@ -0,0 +1,79 @@
+import asyncio
+import socket
+
+import pytest
+
+from infrastructure.utils.benchmark import (
+    LoadGenerator,
+    StandInServer,
+    build_site,
+    compare,
+    percentile
+)
+
+
+@pytest.fixture(scope="module")
+def stand_in(tmp_path_factory):
+    build_dir = tmp_path_factory.mktemp("benchmark")
+    build_site(str(build_dir / "public"), str(build_dir / "cache"))
+    server = StandInServer(str(build_dir / "public"), keepalive_requests=10)
+    server.start()
+    yield server
+    server.stop()
+
+
+def test_percentile_interpolates_between_ranks():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == pytest.approx(50.5)
+    assert percentile(values, 99) == pytest.approx(99.01)
+    assert percentile([], 95) == 0.0
+
+
+def test_stand_in_serves_like_the_nginx_configuration(stand_in, tmp_path):
+    assert stand_in.response("/healthz", "")[0] == 200
+    status, headers, _ = stand_in.response("/", "gzip, br")
+    assert status == 200
+    assert headers["Cache-Control"] == "no-cache"
+    # The brotli copies are only built when the brotli package is installed
+    assert headers.get("Content-Encoding") == ("br" if "/index.html.br" in stand_in.files else
+                                               "gzip" if "/index.html.gz" in stand_in.files else None)
+    assert stand_in.response("/missing", "")[0] == 404
+
+    # brotli_static takes precedence over gzip_static, each only when the client accepts it and the copy exists
+    for name, content in (("index.html", b"html"), ("index.html.gz", b"gz"), ("index.html.br", b"br"),
+                          ("app.css", b"css"), ("app.css.gz", b"css gz")):
+        (tmp_path / name).write_bytes(content)
+    server = StandInServer(str(tmp_path))
+    assert [(headers.get("Content-Encoding"), body) for _, headers, body in (
+        server.response("/", "gzip, deflate, br"),
+        server.response("/", "gzip"),
+        server.response("/app.css", "br, gzip"),
+        server.response("/app.css", "br"),
+    )] == [("br", b"br"), ("gzip", b"gz"), ("gzip", b"css gz"), (None, b"css")]
+
+
+def test_load_report_counts_requests_and_latencies(stand_in):
+    report = asyncio.run(LoadGenerator(f"http://127.0.0.1:{stand_in.port}", ["/", "/healthz", "/missing"],
+                                       concurrency=4, duration=None, requests=60).run())
+    assert report["requests"] == 60
+    assert report["errors"] == 0
+    assert report["status_codes"] == {"200": 40, "404": 20}
+    latency = report["latency_ms"]
+    assert 0 < latency["p50"] <= latency["p95"] <= latency["p99"] <= latency["max"]
+    assert report["throughput_rps"] > 0
+
+
+def test_refused_connections_are_errors():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    report = asyncio.run(LoadGenerator(f"http://127.0.0.1:{port}", ["/"], concurrency=2, duration=None,
+                                       requests=4).run())
+    assert (report["requests"], report["errors"], report["error_rate"]) == (4, 4, 1.0)
+
+
+def test_regressions_beyond_the_tolerance_are_reported():
+    baseline = {"throughput_rps": 1000, "error_rate": 0.0, "latency_ms": {"p50": 1.0, "p95": 2.0, "p99": 4.0}}
+    report = {"throughput_rps": 950, "error_rate": 0.0, "latency_ms": {"p50": 1.05, "p95": 2.5, "p99": 4.0}}
+    assert compare(report, baseline, tolerance=0.1) == ["p95 latency 2.5 ms, baseline 2.0 ms"]
+    assert compare(baseline, baseline) == []
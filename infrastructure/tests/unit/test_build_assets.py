@@ -0,0 +1,61 @@
+import importlib.util
+import json
+
+spec = importlib.util.spec_from_file_location("build_assets", "images/web_server/build_assets.py")
+build_assets = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(build_assets)
+
+
+def make_site(root):
+    (root / "css").mkdir(parents=True)
+    (root / "img").mkdir()
+    (root / "img/logo.png").write_bytes(b"\x89PNG" + b"\x00" * 64)
+    (root / "css/site.css").write_text("/* theme */\nbody {\n  background: url('../img/logo.png');\n}\n" * 50)
+    (root / "index.html").write_text(
+        '<html>\n  <head>\n    <link href="/css/site.css" rel="stylesheet">\n  </head>\n'
+        '  <!-- comment -->\n  <body>\n    <img src="img/logo.png">\n  </body>\n</html>\n' + "<p>text</p>\n" * 200
+    )
+    (root / "robots.txt").write_text("User-agent: *\n")
+
+
+def test_assets_are_fingerprinted_and_references_rewritten(tmp_path):
+    make_site(tmp_path / "site")
+    result = build_assets.build(str(tmp_path / "site"), str(tmp_path / "public"), str(tmp_path / "cache"), workers=1)
+    manifest = result["manifest"]
+
+    assert manifest["index.html"] == "index.html"
+    assert manifest["robots.txt"] == "robots.txt"
+    assert manifest["css/site.css"].startswith("css/site.") and manifest["css/site.css"] != "css/site.css"
+
+    index = (tmp_path / "public/index.html").read_text()
+    assert f'href="/{manifest["css/site.css"]}"' in index
+    assert f'src="{manifest["img/logo.png"]}"' in index
+    assert "<!-- comment -->" not in index
+    css = (tmp_path / "public" / manifest["css/site.css"]).read_text()
+    assert f"url('../{manifest['img/logo.png']}')" in css
+    assert "/* theme */" not in css
+
+    assert (tmp_path / "public/index.html.gz").exists()
+    assert (tmp_path / "public" / (manifest["css/site.css"] + ".gz")).exists()
+    assert json.loads((tmp_path / "public/asset-manifest.json").read_text()) == manifest
+
+
+def test_assets_are_also_served_under_their_original_names(tmp_path):
+    # References outside html src/href and css url() (e.g. js imports and fetches) keep the original names
+    make_site(tmp_path / "site")
+    manifest = build_assets.build(str(tmp_path / "site"), str(tmp_path / "public"), str(tmp_path / "cache"),
+                                  workers=1)["manifest"]
+    for original in ["css/site.css", "img/logo.png"]:
+        assert (tmp_path / "public" / original).read_bytes() == (tmp_path / "public" / manifest[original]).read_bytes()
+    assert (tmp_path / "public/css/site.css.gz").exists()
+
+
+def test_rebuild_only_processes_changed_files(tmp_path):
+    make_site(tmp_path / "site")
+    first = build_assets.build(str(tmp_path / "site"), str(tmp_path / "public"), str(tmp_path / "cache"), workers=1)
+    assert first["processed"] == first["total"] == 4
+
+    (tmp_path / "site/robots.txt").write_text("User-agent: *\nDisallow: /private\n")
+    second = build_assets.build(str(tmp_path / "site"), str(tmp_path / "public"), str(tmp_path / "cache"), workers=1)
+    assert second["processed"] == 1
+    assert "Disallow" in (tmp_path / "public/robots.txt").read_text()
@@ -0,0 +1,69 @@
+import pytest
+
+from infrastructure.tests.unit.utils import load_params
+from infrastructure.utils.capacity import CapacityProfile, parse_cpu, parse_duration, parse_memory, plan_capacity
+
+
+def test_quantities():
+    assert parse_cpu("250m") == 250
+    assert parse_cpu("1.5") == 1500
+    assert parse_memory("376Mi") == 376
+    assert parse_memory("1Gi") == 1024
+    assert parse_memory("1Ti") == 1024 ** 2
+    assert parse_memory("256Ki") == 0.25
+    assert parse_memory("512M") == 512 * 1000 ** 2 / 1024 ** 2
+    assert parse_memory("1G") == 1000 ** 3 / 1024 ** 2
+    assert parse_memory("2k") == 2000 / 1024 ** 2
+    assert parse_memory("1e9") == parse_memory("1G")
+    assert parse_memory(1048576) == 1
+    for quantity in ("1GB", "1 Gi", "Mi", "-1Gi"):
+        with pytest.raises(ValueError, match="Unsupported memory quantity"):
+            parse_memory(quantity)
+    assert parse_duration("75s") == 75
+    assert parse_duration("500ms") == 0.5
+    assert parse_duration(60) == 60
+    with pytest.raises(ValueError):
+        parse_duration("1 minute")
+
+
+def test_compute_size_selects_the_profile():
+    # prod used to run on the small burstable instances since compute_size was never read
+    profile = CapacityProfile.from_params(load_params("prod"), load_params("prod").eks.compute_size)
+    assert profile.instance_types == ["c5.large", "c5a.large", "c5d.large"]
+    assert profile.architecture == "x86_64"
+
+
+def test_kubelet_arguments_from_the_profile():
+    profile = CapacityProfile.from_params(load_params("dev"), "small")
+    assert profile.kubelet_extra_args() == (
+        "--max-pods=20 --kube-reserved=cpu=70m,memory=475Mi,ephemeral-storage=1Gi "
+        "--system-reserved=cpu=100m,memory=100Mi,ephemeral-storage=1Gi "
+        "--eviction-hard=memory.available<100Mi,nodefs.available<10%"
+    )
+
+
+def test_profile_instance_types_must_match_the_architecture():
+    params = load_params("prod")
+    params.eks.capacity_profiles.__dict__["large-arm64"].instance_families.append("c5")
+    with pytest.raises(ValueError, match="c5.large isn't a arm64 instance type"):
+        CapacityProfile.from_params(params, "large-arm64")
+
+
+def test_reserved_resources_must_fit_the_node():
+    params = load_params("dev")
+    params.eks.capacity_profiles.small.kube_reserved.memory = "2Gi"
+    with pytest.raises(ValueError, match="exceed the node capacity"):
+        CapacityProfile.from_params(params, "small")
+
+
+def test_plan_capacity():
+    profile = CapacityProfile.from_params(load_params("prod"), "large")
+    # 1830m allocatable cpu - 125m of daemonsets fit 6 pods of 250m
+    plan = plan_capacity(profile, target_rps=5000, per_pod_rps=400, pod_cpu="250m", pod_memory="128Mi")
+    assert plan == {"profile": "large", "replicas": 17, "pods_per_node": 6, "nodes": 3}
+
+
+def test_plan_capacity_rejects_pods_larger_than_the_nodes():
+    profile = CapacityProfile.from_params(load_params("dev"), "small")
+    with pytest.raises(ValueError, match="doesn't fit"):
+        plan_capacity(profile, target_rps=100, per_pod_rps=50, pod_cpu="4")
@@ -0,0 +1,54 @@
+from aws_cdk import (
+    assertions,
+    core
+)
+
+from infrastructure.infrastructure_stack import InfrastructureStack
+from infrastructure.tests.unit.utils import TEST_ENVIRONMENT, load_params
+
+
+def test_cdn_is_opt_in(dev_stack, prod_stack):
+    assert not hasattr(dev_stack, "cdn_stack")
+    assert hasattr(prod_stack, "cdn_stack")
+
+
+def test_cdn_section_is_optional():
+    params = load_params("dev")
+    del params.__dict__["cdn"]
+    stack = InfrastructureStack(core.App(), "CC-MainStack", env=TEST_ENVIRONMENT, params=params)
+    assert not hasattr(stack, "cdn_stack")
+
+
+def test_distribution_points_to_web_server_ingress(prod_stack):
+    template = assertions.Template.from_stack(prod_stack.cdn_stack)
+    template.has_resource_properties("Custom::AWSCDK-EKS-KubernetesObjectValue", {
+        "ObjectType": "ingress",
+        "ObjectName": "web-server",
+        "ObjectNamespace": "default",
+        "JsonPath": ".status.loadBalancer.ingress[0].hostname"
+    })
+    template.has_resource_properties("AWS::CloudFront::Distribution", {
+        "DistributionConfig": assertions.Match.object_like({
+            "PriceClass": "PriceClass_100",
+            "Origins": [assertions.Match.object_like({
+                "CustomOriginConfig": assertions.Match.object_like({"OriginProtocolPolicy": "http-only"}),
+                "OriginShield": {"Enabled": True, "OriginShieldRegion": "eu-west-1"}
+            })],
+            "DefaultCacheBehavior": assertions.Match.object_like({"Compress": True})
+        })
+    })
+
+
+def test_cache_policy_from_parameters(prod_stack):
+    template = assertions.Template.from_stack(prod_stack.cdn_stack)
+    template.has_resource_properties("AWS::CloudFront::CachePolicy", {
+        "CachePolicyConfig": assertions.Match.object_like({
+            "DefaultTTL": 300,
+            "MinTTL": 0,
+            "MaxTTL": 31536000,
+            "ParametersInCacheKeyAndForwardedToOrigin": assertions.Match.object_like({
+                "EnableAcceptEncodingGzip": True,
+                "EnableAcceptEncodingBrotli": True
+            })
+        })
+    })
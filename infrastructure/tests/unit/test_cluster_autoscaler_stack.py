@@ -0,0 +1,52 @@
+import pytest
+
+from aws_cdk import (
+    assertions,
+    core
+)
+
+from infrastructure.infrastructure_stack import InfrastructureStack
+from infrastructure.tests.unit.utils import helm_chart_values, load_params
+
+
+def test_node_groups_are_discoverable_by_the_autoscaler(eks_template):
+    eks_template.resource_count_is("AWS::AutoScaling::ScalingPolicy", 0)
+    eks_template.has_resource_properties("AWS::AutoScaling::AutoScalingGroup", {
+        "MinSize": "1",
+        "MaxSize": "10",
+        "Tags": assertions.Match.array_with([
+            {"Key": "k8s.io/cluster-autoscaler/enabled", "PropagateAtLaunch": True, "Value": "true"},
+            {"Key": "k8s.io/cluster-autoscaler/SimpleEKS-Cluster", "PropagateAtLaunch": True, "Value": "owned"}
+        ])
+    })
+
+
+def test_autoscaler_can_only_resize_owned_node_groups(eks_template):
+    eks_template.has_resource_properties("AWS::IAM::Policy", {
+        "PolicyDocument": {
+            "Statement": assertions.Match.array_with([{
+                "Action": ["autoscaling:SetDesiredCapacity", "autoscaling:TerminateInstanceInAutoScalingGroup"],
+                "Condition": {
+                    "StringEquals": {"autoscaling:ResourceTag/k8s.io/cluster-autoscaler/SimpleEKS-Cluster": "owned"}
+                },
+                "Effect": "Allow",
+                "Resource": "*"
+            }]),
+            "Version": "2012-10-17"
+        }
+    })
+
+
+def test_autoscaler_values_from_parameters(eks_template):
+    values = helm_chart_values(eks_template, "ClusterAutoscalerHelmChart")
+    assert values["autoDiscovery"]["clusterName"] == "SimpleEKS-Cluster"
+    assert values["extraArgs"]["expander"] == "priority"
+    assert values["extraArgs"]["scale-down-unneeded-time"] == "5m"
+    assert values["expanderPriorities"] == {"50": [".*AsgSpot.*"], "10": [".*AsgOnDemand.*"]}
+
+
+def test_priority_expander_needs_priorities():
+    params = load_params("dev")
+    del params.eks.cluster_autoscaler.expander_priorities
+    with pytest.raises(ValueError, match="expander_priorities"):
+        InfrastructureStack(core.App(), "CC-MainStack", env=core.Environment(region="eu-west-1"), params=params)
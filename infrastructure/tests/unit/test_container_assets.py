@@ -0,0 +1,90 @@
+import json
+
+from infrastructure.utils.container_assets import BINFMT_IMAGE, ContainerAssetPublisher, cache_tag, container_assets
+
+ASSET = {
+    "repositoryName": "aws-cdk/assets",
+    "imageTag": "1ae30c75",
+    "id": "1ae30c75",
+    "packaging": "container-image",
+    "path": "asset.1ae30c75",
+    "buildArgs": {"TARGET_PLATFORM": "linux/arm64"},
+    "file": "Dockerfile"
+}
+REGISTRY = "123456789012.dkr.ecr.eu-west-1.amazonaws.com"
+
+
+class StubEcrClient:
+    class exceptions:
+        class RepositoryNotFoundException(Exception):
+            pass
+
+        class ImageNotFoundException(Exception):
+            pass
+
+    def __init__(self, tags):
+        self.tags = tags
+        self.created = []
+
+    def describe_images(self, repositoryName, imageIds):
+        if repositoryName not in self.tags:
+            raise self.exceptions.RepositoryNotFoundException()
+        if imageIds[0]["imageTag"] not in self.tags[repositoryName]:
+            raise self.exceptions.ImageNotFoundException()
+
+    def create_repository(self, repositoryName, **kwargs):
+        self.created.append(repositoryName)
+
+
+def write_assembly(path):
+    manifest = {"artifacts": {"CC-MainStack": {"type": "aws:cloudformation:stack", "metadata": {"/CC-MainStack": [
+        {"type": "aws:cdk:asset", "data": ASSET},
+        {"type": "aws:cdk:asset", "data": {"packaging": "zip", "id": "other"}}
+    ]}}}}
+    (path / "manifest.json").write_text(json.dumps(manifest))
+
+
+def test_container_assets_are_read_from_the_assembly(tmp_path):
+    write_assembly(tmp_path)
+    assert container_assets(str(tmp_path)) == [ASSET]
+    assert cache_tag(ASSET) == "cache-linux-arm64"
+
+
+def test_missing_image_is_built_with_the_previous_build_as_cache(tmp_path):
+    commands = []
+    ecr = StubEcrClient({})
+    publisher = ContainerAssetPublisher(str(tmp_path), REGISTRY, ecr_client=ecr,
+                                        run=lambda command, check: commands.append(command),
+                                        host_architecture="arm64")
+    assert publisher.publish(ASSET) is True
+    assert ecr.created == ["aws-cdk/assets"]
+
+    cache_image = f"{REGISTRY}/aws-cdk/assets:cache-linux-arm64"
+    assert commands[0] == ["docker", "pull", cache_image]
+    build = commands[1]
+    assert build[:4] == ["docker", "build", "--cache-from", cache_image]
+    assert "TARGET_PLATFORM=linux/arm64" in build
+    assert commands[2:] == [["docker", "push", f"{REGISTRY}/aws-cdk/assets:1ae30c75"],
+                            ["docker", "push", cache_image]]
+
+
+def test_published_image_is_skipped(tmp_path):
+    commands = []
+    ecr = StubEcrClient({"aws-cdk/assets": ["1ae30c75"]})
+    publisher = ContainerAssetPublisher(str(tmp_path), REGISTRY, ecr_client=ecr,
+                                        run=lambda command, check: commands.append(command),
+                                        host_architecture="arm64")
+    assert publisher.publish(ASSET) is False
+    assert commands == []
+
+
+def test_foreign_architecture_is_emulated_once(tmp_path):
+    commands = []
+    publisher = ContainerAssetPublisher(str(tmp_path), REGISTRY, ecr_client=StubEcrClient({}),
+                                        run=lambda command, check: commands.append(command),
+                                        host_architecture="amd64")
+    publisher.publish(ASSET)
+    publisher.publish(dict(ASSET, imageTag="2bf41d86"))
+    binfmt = ["docker", "run", "--privileged", "--rm", BINFMT_IMAGE, "--install", "arm64"]
+    assert commands[0] == binfmt
+    assert commands.count(binfmt) == 1
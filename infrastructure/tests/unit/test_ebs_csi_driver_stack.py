@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+from aws_cdk import (
+    assertions,
+    core
+)
+
+from infrastructure.infrastructure_stack import InfrastructureStack
+from infrastructure.tests.unit.utils import TEST_ENVIRONMENT, helm_chart_values, load_params, resolve
+
+
+@pytest.fixture(scope="module")
+def prod_template(prod_stack):
+    return assertions.Template.from_stack(prod_stack.eks_stack)
+
+
+def manifests(template):
+    return [json.loads(resolve(resource["Properties"]["Manifest"]))[0]
+            for resource in template.find_resources("Custom::AWSCDK-EKS-KubernetesResource").values()]
+
+
+def test_gp3_storage_class_per_volume(prod_template):
+    storage_classes = {manifest["metadata"]["name"]: manifest for manifest in manifests(prod_template)
+                       if manifest["kind"] == "StorageClass"}
+    assert set(storage_classes) == {"gp3-prometheus-server", "gp3-alertmanager", "gp3-grafana"}
+    prometheus_server = storage_classes["gp3-prometheus-server"]
+    assert prometheus_server["provisioner"] == "ebs.csi.aws.com"
+    assert prometheus_server["volumeBindingMode"] == "WaitForFirstConsumer"
+    assert prometheus_server["parameters"]["type"] == "gp3"
+    assert (prometheus_server["parameters"]["iops"], prometheus_server["parameters"]["throughput"]) == ("6000", "250")
+
+
+def test_driver_controller_uses_an_irsa_role(prod_template):
+    prod_template.has_resource_properties("AWS::IAM::Role", {
+        "ManagedPolicyArns": [{"Fn::Join": ["", ["arn:", {"Ref": "AWS::Partition"},
+                                                 ":iam::aws:policy/service-role/AmazonEBSCSIDriverPolicy"]]}]
+    })
+    values = helm_chart_values(prod_template, "EbsCsiDriverHelmChart")
+    assert values["controller"]["serviceAccount"] == {"create": False, "name": "ebs-csi-controller-sa"}
+
+
+def test_monitoring_volumes_use_new_gp3_claims(prod_template):
+    # The storage class of the gp2 claims created by the charts can't be changed, the gp3 volumes get new claims
+    claims = {manifest["metadata"]["name"]: manifest for manifest in manifests(prod_template)
+              if manifest["kind"] == "PersistentVolumeClaim"}
+    assert set(claims) == {"prometheus-server-gp3", "alertmanager-gp3", "grafana-gp3"}
+    assert claims["prometheus-server-gp3"]["metadata"]["namespace"] == "prometheus"
+    assert claims["prometheus-server-gp3"]["spec"]["storageClassName"] == "gp3-prometheus-server"
+    assert claims["prometheus-server-gp3"]["spec"]["resources"]["requests"]["storage"] == "50Gi"
+    assert claims["grafana-gp3"]["metadata"]["namespace"] == "grafana"
+
+    prometheus = helm_chart_values(prod_template, "EKSPrometheusHelmChart")
+    assert prometheus["server"]["persistentVolume"] == {"existingClaim": "prometheus-server-gp3"}
+    assert prometheus["alertmanager"]["persistentVolume"] == {"existingClaim": "alertmanager-gp3"}
+    grafana = helm_chart_values(prod_template, "GrafanaHelmChart")
+    assert grafana["persistence"] == {"existingClaim": "grafana-gp3", "enabled": True}
+
+    resources = prod_template.find_resources("Custom::AWSCDK-EKS-KubernetesResource")
+    for logical_id, resource in resources.items():
+        if "PersistentVolumeClaim" in logical_id:
+            assert any("StorageClass" in dependency for dependency in resource["DependsOn"]), logical_id
+            assert any("HelmChart" in dependency for dependency in resource["DependsOn"]), logical_id
+
+
+@pytest.mark.parametrize("volume, key, value, match", [
+    ("alertmanager", "iops", 6000, "at least 12Gi"),
+    ("grafana", "throughput", 1000, "at least 4000 iops"),
+    ("grafana", "size", "10G", "whole Gi"),
+    ("prometheus_server", "size", "40Gi", "retention_size"),
+])
+def test_invalid_volumes_are_rejected(volume, key, value, match):
+    params = load_params("prod")
+    setattr(params.eks.storage.volumes.__dict__[volume], key, value)
+    with pytest.raises(ValueError, match=match):
+        InfrastructureStack(core.App(), "CC-MainStack", env=TEST_ENVIRONMENT, params=params)
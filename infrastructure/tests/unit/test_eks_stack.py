@@ -0,0 +1,107 @@
+import json
+
+import pytest
+
+from aws_cdk import (
+    assertions,
+    core
+)
+
+from infrastructure.infrastructure_stack import InfrastructureStack
+from infrastructure.tests.unit.utils import helm_chart_values, load_params, resolve
+
+
+def test_prometheus_adapter_serves_web_server_metrics(eks_template):
+    values = helm_chart_values(eks_template, "PrometheusAdapterHelmChart")
+    names = [rule["name"]["as"] for rule in values["rules"]["custom"]]
+    assert names == ["nginx_http_requests_per_second", "nginx_http_request_duration_p95_seconds"]
+    assert values["rules"]["default"] is False
+
+
+def test_web_server_autoscales_on_request_rate_and_latency(eks_template):
+    autoscaling = helm_chart_values(eks_template, "WebServerHelmChart")["autoscaling"]
+    assert autoscaling["enabled"] is True
+    assert (autoscaling["minReplicas"], autoscaling["maxReplicas"]) == (3, 6)
+    assert autoscaling["targetRequestsPerSecondPerPod"] == "200"
+    assert autoscaling["targetP95LatencySeconds"] == "250m"
+    assert autoscaling["behavior"]["scaleUp"]["policies"] == [
+        {"type": "Pods", "value": 2, "periodSeconds": 15},
+        {"type": "Percent", "value": 100, "periodSeconds": 15}
+    ]
+    assert autoscaling["behavior"]["scaleDown"]["stabilizationWindowSeconds"] == 300
+
+
+def test_prometheus_scrapes_web_server_metrics_port(eks_template):
+    values = helm_chart_values(eks_template, "EKSPrometheusHelmChart")
+    jobs = json.loads(values["extraScrapeConfigs"])
+    assert [job["job_name"] for job in jobs] == ["web-server"]
+    assert jobs[0]["metrics_path"] == "/metrics"
+    assert {"source_labels": ["__meta_kubernetes_pod_container_port_name"], "action": "keep",
+            "regex": "prometheus"} in jobs[0]["relabel_configs"]
+
+    web_server_metrics = helm_chart_values(eks_template, "WebServerHelmChart")["metrics"]
+    assert web_server_metrics == {"enabled": True, "port": 9113, "path": "/metrics"}
+
+
+def test_web_server_nginx_tuning_from_parameters(eks_template):
+    nginx = helm_chart_values(eks_template, "WebServerHelmChart")["nginx"]
+    assert nginx["workerProcesses"] == 2
+    assert nginx["workerConnections"] == 2048
+    assert nginx["openFileCache"] == {"max": 10000, "inactive": "60s", "valid": "120s"}
+
+
+def test_web_server_scheduling_from_parameters(prod_stack):
+    values = helm_chart_values(assertions.Template.from_stack(prod_stack.eks_stack), "WebServerHelmChart")
+    assert values["scheduling"] == {
+        "topologySpread": {
+            "zone": {"enabled": True, "maxSkew": 1, "whenUnsatisfiable": "DoNotSchedule"},
+            "node": {"enabled": True, "maxSkew": 1, "whenUnsatisfiable": "ScheduleAnyway"}
+        },
+        "preferredLifecycle": "Ec2Spot",
+        "preferredLifecycleWeight": 50
+    }
+    assert values["service"] == {"topologyAwareRouting": True}
+
+
+def test_unknown_preferred_lifecycle_is_rejected():
+    params = load_params("dev")
+    params.eks.web_server_scheduling.preferred_lifecycle = "Spot"
+    with pytest.raises(ValueError, match="preferred_lifecycle Spot"):
+        InfrastructureStack(core.App(), "CC-MainStack", env=core.Environment(region="eu-west-1"), params=params)
+
+
+def test_web_server_image_is_pinned_by_digest(prod_stack, eks_template):
+    lookups = [resolve(resource["Properties"]["Create"])
+               for resource in eks_template.find_resources("Custom::AWS").values()]
+    assert len(lookups) == 1
+    assert json.loads(lookups[0].replace("TOKEN", ""))["action"] == "describeImages"
+    image = helm_chart_values(eks_template, "WebServerHelmChart")["image"]
+    assert "@" in image["uri"]
+    assert image["pullPolicy"] == "IfNotPresent"
+    assert image["prePull"] == {"enabled": False}
+
+    prod_values = helm_chart_values(assertions.Template.from_stack(prod_stack.eks_stack), "WebServerHelmChart")
+    assert prod_values["image"]["prePull"] == {"enabled": True}
+
+
+def test_web_server_resources_follow_the_qos_profile(eks_template, prod_stack):
+    resources = helm_chart_values(eks_template, "WebServerHelmChart")["resources"]
+    assert resources == {"requests": {"cpu": "250m", "memory": "128Mi"}, "limits": {"memory": "256Mi"}}
+
+    prod_resources = helm_chart_values(assertions.Template.from_stack(prod_stack.eks_stack),
+                                       "WebServerHelmChart")["resources"]
+    assert prod_resources["requests"] == prod_resources["limits"] == {"cpu": "1", "memory": "256Mi"}
+
+
+@pytest.mark.parametrize("env_name, change, match", [
+    ("dev", lambda params: setattr(params.eks.web_server_resources, "qos", "BestEffort"), "Unsupported qos"),
+    ("dev", lambda params: setattr(params.eks.web_server_resources.limits, "memory", "64Mi"), "lower than"),
+    ("prod", lambda params: setattr(params.eks.web_server_resources.requests, "cpu", "1500m"), "whole cpu"),
+    ("prod", lambda params: setattr(params.eks.web_server_nginx, "worker_processes", 2), "worker_processes"),
+    ("prod", lambda params: setattr(params.eks.web_server_resources.requests, "memory", "8Gi"), "doesn't fit"),
+])
+def test_invalid_web_server_resources_are_rejected(env_name, change, match):
+    params = load_params(env_name)
+    change(params)
+    with pytest.raises(ValueError, match=match):
+        InfrastructureStack(core.App(), "CC-MainStack", env=core.Environment(region="eu-west-1"), params=params)
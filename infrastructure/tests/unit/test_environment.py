@@ -0,0 +1,143 @@
+import json
+
+import pytest
+
+from infrastructure.utils.environment import Environment
+from infrastructure.utils.secrets import (
+    ChainSecretProvider,
+    EnvironmentSecretProvider,
+    FileCacheSecretProvider,
+    SecretProvider,
+    SecretsManagerSecretProvider
+)
+
+SECRET_NAME = "simple_eks_secret_github_token"
+
+
+class StubSecretsManagerClient:
+    def __init__(self, secrets):
+        self.secrets = secrets
+        self.calls = 0
+
+    def get_secret_value(self, SecretId):
+        self.calls += 1
+        return {"SecretString": json.dumps(self.secrets[SecretId])}
+
+
+class StubClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_environment_provider_reads_json_variable():
+    provider = EnvironmentSecretProvider(environ={"SIMPLE_EKS_SECRET_GITHUB_TOKEN": '{"github_token": "env"}'})
+    assert provider.get_secret(SECRET_NAME) == {"github_token": "env"}
+    assert provider.get_secret("missing") is None
+
+
+def test_secrets_manager_provider_uses_client():
+    client = StubSecretsManagerClient({SECRET_NAME: {"github_token": "sm"}})
+    assert SecretsManagerSecretProvider(client=client).get_secret(SECRET_NAME) == {"github_token": "sm"}
+
+
+def test_file_cache_provider_honours_ttl(tmp_path):
+    client = StubSecretsManagerClient({SECRET_NAME: {"github_token": "sm"}})
+    clock = StubClock()
+    provider = FileCacheSecretProvider(SecretsManagerSecretProvider(client=client),
+                                       path=str(tmp_path / "secrets.json"), ttl_seconds=60, clock=clock)
+
+    assert provider.get_secret(SECRET_NAME) == {"github_token": "sm"}
+    clock.now += 30
+    assert provider.get_secret(SECRET_NAME) == {"github_token": "sm"}
+    assert client.calls == 1
+
+    clock.now += 60
+    client.secrets[SECRET_NAME] = {"github_token": "rotated"}
+    assert provider.get_secret(SECRET_NAME) == {"github_token": "rotated"}
+    assert client.calls == 2
+
+
+def test_chain_provider_stops_at_first_hit():
+    client = StubSecretsManagerClient({SECRET_NAME: {"github_token": "sm"}})
+    provider = ChainSecretProvider(
+        EnvironmentSecretProvider(environ={"SIMPLE_EKS_SECRET_GITHUB_TOKEN": '{"github_token": "env"}'}),
+        SecretsManagerSecretProvider(client=client)
+    )
+    assert provider.get_secret(SECRET_NAME) == {"github_token": "env"}
+    assert client.calls == 0
+
+
+def test_secret_is_fetched_lazily(tmp_path):
+    client = StubSecretsManagerClient({SECRET_NAME: {"github_token": "sm"}})
+    params = Environment.from_file(env_path="infrastructure/parameters/dev.json",
+                                   uncommitted_env_path=str(tmp_path / "missing.env.json"),
+                                   secret_provider=SecretsManagerSecretProvider(client=client))
+    assert params.eks.cluster_name == "SimpleEKS-Cluster"
+    assert client.calls == 0
+
+    assert params.github_token == "sm"
+    assert params.github_token == "sm"
+    assert client.calls == 1
+
+
+def test_unknown_keys_dont_fetch_the_secret(tmp_path):
+    client = StubSecretsManagerClient({SECRET_NAME: {"github_token": "sm"}})
+    params = Environment.from_file(env_path="infrastructure/parameters/dev.json",
+                                   uncommitted_env_path=str(tmp_path / "missing.env.json"),
+                                   secret_provider=SecretsManagerSecretProvider(client=client))
+    with pytest.raises(AttributeError):
+        params.github_tokn
+    assert params.get("github_tokn", None) is None
+    assert client.calls == 0
+
+
+def test_get_fetches_the_secret_lazily(tmp_path):
+    client = StubSecretsManagerClient({SECRET_NAME: {"github_token": "sm"}})
+    params = Environment.from_file(env_path="infrastructure/parameters/dev.json",
+                                   uncommitted_env_path=str(tmp_path / "missing.env.json"),
+                                   secret_provider=SecretsManagerSecretProvider(client=client))
+    assert params.get("github_token", None) == "sm"
+    assert params.github_token == "sm"
+    assert client.calls == 1
+
+
+def test_uncommitted_file_takes_precedence():
+    params = Environment.from_file(env_path="infrastructure/parameters/dev.json",
+                                   uncommitted_env_path="infrastructure/parameters/uncommitted/example.env.json",
+                                   secret_provider=SecretsManagerSecretProvider(client=object()))
+    assert params.github_token == "abcdefghilmnopqrstuvz1234567890"
+
+
+def test_uncommitted_values_fetch_the_secret_once(tmp_path):
+    client = StubSecretsManagerClient({SECRET_NAME: {"github_token": "sm"}})
+    params = Environment.from_file(env_path="infrastructure/parameters/dev.json",
+                                   uncommitted_env_path=str(tmp_path / "missing.env.json"),
+                                   secret_provider=SecretsManagerSecretProvider(client=client))
+    assert params.uncommitted_values() == {"github_token": "sm"}
+    assert params.github_token == "sm"
+    assert client.calls == 1
+
+
+def test_secret_is_fetched_again_after_a_failure(tmp_path):
+    class FlakySecretsManagerClient(StubSecretsManagerClient):
+        def get_secret_value(self, SecretId):
+            if self.calls == 0:
+                self.calls += 1
+                raise ConnectionError("throttled")
+            return super().get_secret_value(SecretId)
+
+    client = FlakySecretsManagerClient({SECRET_NAME: {"github_token": "sm"}})
+    params = Environment.from_file(env_path="infrastructure/parameters/dev.json",
+                                   uncommitted_env_path=str(tmp_path / "missing.env.json"),
+                                   secret_provider=SecretsManagerSecretProvider(client=client))
+    with pytest.raises(ConnectionError):
+        params.github_token
+    assert params.github_token == "sm"
+
+
+def test_secret_providers_must_implement_get_secret():
+    with pytest.raises(TypeError):
+        SecretProvider()
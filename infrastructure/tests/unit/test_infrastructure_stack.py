@@ -1,19 +1,175 @@
-# from aws_cdk import (
-#         core,
-#         assertions
-#     )
+import pytest
 
-# from infrastructure.infrastructure_stack import InfrastructureStack
+from aws_cdk import (
+    assertions,
+    core
+)
 
+from infrastructure.infrastructure_stack import InfrastructureStack
+from infrastructure.tests.unit.utils import TEST_ENVIRONMENT, StubSecretProvider, helm_chart_values, load_params
+from infrastructure.utils.capacity import ARM64_INSTANCE_TYPE, CapacityProfile
 
-# example tests. To run these tests, uncomment this file along with the example
-# resource in infrastructure/infrastructure_stack.py
-def test_sqs_queue_created():
-#     app = core.App()
-#     stack = InfrastructureStack(app, "infrastructure")
-#     template = assertions.Template.from_stack(stack)
+# Properties that change the cost or the capacity of an environment, pinned so that a parameter change is deliberate
+EXPECTED = {
+    "dev": {
+        "nested_stacks": 3,
+        "nat_gateways": 1,
+        "on_demand_instance_type": "t3.small",
+        "spot_pools": {"X86": ("1", "10", ["t3.small", "t3a.small"])},
+        "web_server_replicas": (3, 3, 6),
+        "custom_resources": {"Custom::AWSCDK-EKS-HelmChart": 8, "Custom::AWSCDK-EKS-KubernetesResource": 12,
+                             "Custom::AWS": 1, "Custom::AWSCDK-EKS-KubernetesObjectValue": 0}
+    },
+    "prod": {
+        "nested_stacks": 4,
+        "nat_gateways": 2,
+        "on_demand_instance_type": "c5.large",
+        "spot_pools": {"X86": ("1", "10", ["c5.large", "c5a.large", "c5d.large"]),
+                       "Arm64": ("3", "12", ["c6g.large", "c6gd.large", "c6gn.large"])},
+        "web_server_replicas": (3, 3, 12),
+        "custom_resources": {"Custom::AWSCDK-EKS-HelmChart": 9, "Custom::AWSCDK-EKS-KubernetesResource": 12,
+                             "Custom::AWS": 1, "Custom::AWSCDK-EKS-KubernetesObjectValue": 1}
+    }
+}
 
-#     template.has_resource_properties("AWS::SQS::Queue", {
-#         "VisibilityTimeout": 300
-#     })
-  pass
+# Burstable instances run out of cpu credits under sustained load
+BURSTABLE_INSTANCE_FAMILIES = ("t2.", "t3.", "t3a.", "t4g.")
+
+
+@pytest.fixture(params=["dev", "prod"])
+def env_name(request):
+    return request.param
+
+
+@pytest.fixture
+def stack(request, env_name):
+    return request.getfixturevalue(f"{env_name}_stack")
+
+
+@pytest.fixture
+def params(env_name):
+    return load_params(env_name)
+
+
+def nested_templates(stack):
+    nested_stacks = [stack.vpc_stack, stack.eks_stack, getattr(stack, "cdn_stack", None),
+                     getattr(stack, "pipeline_stack", None)]
+    return [assertions.Template.from_stack(nested) for nested in nested_stacks if nested is not None]
+
+
+def instance_types(template):
+    types = [config["Properties"]["InstanceType"]
+             for config in template.find_resources("AWS::AutoScaling::LaunchConfiguration").values()]
+    for group in template.find_resources("AWS::AutoScaling::AutoScalingGroup").values():
+        policy = group["Properties"].get("MixedInstancesPolicy")
+        if policy:
+            types += [override["InstanceType"] for override in policy["LaunchTemplate"]["Overrides"]]
+    return types
+
+
+def test_nested_stacks(env_name, stack, params):
+    template = assertions.Template.from_stack(stack)
+    template.resource_count_is("AWS::CloudFormation::Stack", EXPECTED[env_name]["nested_stacks"])
+    assert hasattr(stack, "cdn_stack") == params.cdn.enabled
+    assert hasattr(stack, "pipeline_stack") == params.ci_cd_enabled
+
+
+def test_nat_gateways_and_availability_zones(env_name, stack, params):
+    template = assertions.Template.from_stack(stack.vpc_stack)
+    template.resource_count_is("AWS::EC2::NatGateway", EXPECTED[env_name]["nat_gateways"])
+    assert EXPECTED[env_name]["nat_gateways"] == params.vpc.nats_number
+    assert len(stack.vpc_stack.vpc.availability_zones) == params.vpc.az_number
+
+
+def test_on_demand_group_uses_the_compute_size_profile(env_name, stack, params):
+    template = assertions.Template.from_stack(stack.eks_stack)
+    profile = CapacityProfile.from_params(params, params.eks.compute_size)
+    expected_type = EXPECTED[env_name]["on_demand_instance_type"]
+    assert profile.instance_types[0] == expected_type
+
+    template.resource_count_is("AWS::AutoScaling::LaunchConfiguration", 1)
+    template.has_resource_properties("AWS::AutoScaling::LaunchConfiguration", {"InstanceType": expected_type})
+    template.has_resource_properties("AWS::AutoScaling::AutoScalingGroup", {
+        "MinSize": str(params.eks.on_demand_instance_count),
+        "MaxSize": str(params.eks.on_demand_max_instance_count),
+        "LaunchConfigurationName": assertions.Match.any_value()
+    })
+
+
+def test_spot_node_pools(env_name, stack, params):
+    template = assertions.Template.from_stack(stack.eks_stack)
+    pools = EXPECTED[env_name]["spot_pools"]
+    assert [pool.name for pool in params.eks.spot_node_pools] == list(pools)
+    template.resource_count_is("AWS::AutoScaling::AutoScalingGroup", 1 + len(pools))
+    template.resource_count_is("AWS::EC2::LaunchTemplate", len(pools))
+
+    for pool in params.eks.spot_node_pools:
+        min_size, max_size, overrides = pools[pool.name]
+        template.has_resource_properties("AWS::AutoScaling::AutoScalingGroup", {
+            "MinSize": min_size,
+            "MaxSize": max_size,
+            "MixedInstancesPolicy": {
+                "InstancesDistribution": {
+                    "OnDemandBaseCapacity": pool.get("on_demand_base_capacity", 0),
+                    "OnDemandPercentageAboveBaseCapacity": pool.get("on_demand_percentage_above_base_capacity", 0),
+                    "SpotAllocationStrategy": "capacity-optimized"
+                },
+                "LaunchTemplate": {
+                    "Overrides": [{"InstanceType": instance_type} for instance_type in overrides]
+                }
+            }
+        })
+
+
+def test_prod_runs_no_burstable_nodes(prod_stack):
+    types = instance_types(assertions.Template.from_stack(prod_stack.eks_stack))
+    assert types
+    assert not [instance_type for instance_type in types if instance_type.startswith(BURSTABLE_INSTANCE_FAMILIES)]
+
+
+def test_web_server_replicas_and_autoscaling(env_name, stack):
+    values = helm_chart_values(assertions.Template.from_stack(stack.eks_stack), "WebServerHelmChart")
+    replicas, min_replicas, max_replicas = EXPECTED[env_name]["web_server_replicas"]
+    assert values["replicaCount"] == replicas
+    assert values["autoscaling"]["enabled"] is True
+    assert (values["autoscaling"]["minReplicas"], values["autoscaling"]["maxReplicas"]) == (min_replicas,
+                                                                                           max_replicas)
+
+
+def test_web_server_runs_on_the_nodes_of_its_architecture(stack, params):
+    values = helm_chart_values(assertions.Template.from_stack(stack.eks_stack), "WebServerHelmChart")
+    architecture = {"x86_64": "amd64", "arm64": "arm64"}[params.eks.web_server_architecture]
+    assert values["nodeSelector"] == {"kubernetes.io/arch": architecture}
+
+    pool_architectures = {CapacityProfile.from_params(params, pool.capacity_profile).architecture
+                          for pool in params.eks.spot_node_pools}
+    assert params.eks.web_server_architecture in pool_architectures | {
+        CapacityProfile.from_params(params, params.eks.compute_size).architecture}
+
+
+def test_custom_resources(env_name, stack):
+    templates = nested_templates(stack)
+    for resource_type, count in EXPECTED[env_name]["custom_resources"].items():
+        assert sum(len(template.find_resources(resource_type)) for template in templates) == count, resource_type
+
+
+def test_arm64_instance_types_are_only_in_arm64_pools(stack, params):
+    template = assertions.Template.from_stack(stack.eks_stack)
+    arm64_types = {instance_type for instance_type in instance_types(template)
+                   if ARM64_INSTANCE_TYPE.match(instance_type)}
+    profiles = [CapacityProfile.from_params(params, pool.capacity_profile) for pool in params.eks.spot_node_pools]
+    expected = {instance_type for profile in profiles if profile.architecture == "arm64"
+                for instance_type in profile.instance_types}
+    assert arm64_types == expected
+
+
+def test_synth_reads_the_uncommitted_parameters_through_the_secret_provider():
+    secret_provider = StubSecretProvider()
+    params = load_params("dev", secret_provider=secret_provider)
+    stack = InfrastructureStack(core.App(), "CC-MainStack", env=TEST_ENVIRONMENT, params=params)
+
+    assert secret_provider.requested == [params.github_token_secret_name]
+    assertions.Template.from_stack(stack.pipeline_stack).has_resource_properties("AWS::SecretsManager::Secret", {
+        "Name": params.github_token_secret_name,
+        "SecretString": assertions.Match.serialized_json({"github_token": secret_provider.secret["github_token"]})
+    })
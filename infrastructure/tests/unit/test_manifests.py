@@ -0,0 +1,39 @@
+import json
+
+from infrastructure.utils.manifests import chunk_manifests, sort_manifests
+
+
+def test_manifests_sorted_by_apply_order():
+    manifests = [
+        {"kind": "APIService", "metadata": {"name": "api"}},
+        {"kind": "Deployment", "metadata": {"name": "deployment"}},
+        {"kind": "ClusterRole", "metadata": {"name": "role"}},
+        {"kind": "Service", "metadata": {"name": "service"}},
+        {"kind": "ServiceAccount", "metadata": {"name": "account"}},
+    ]
+    kinds = [m["kind"] for m in sort_manifests(manifests)]
+    assert kinds == ["ServiceAccount", "ClusterRole", "Service", "Deployment", "APIService"]
+
+
+def test_unknown_kinds_are_applied_last_in_declaration_order():
+    manifests = [{"kind": "Foo", "metadata": {"name": "a"}},
+                 {"kind": "ConfigMap", "metadata": {"name": "b"}},
+                 {"kind": "Bar", "metadata": {"name": "c"}}]
+    names = [m["metadata"]["name"] for m in sort_manifests(manifests)]
+    assert names == ["b", "a", "c"]
+
+
+def test_chunks_split_on_size():
+    manifests = [{"kind": "ConfigMap", "data": {"key": "x" * 100}} for _ in range(10)]
+    chunks = chunk_manifests(manifests, max_bytes=3 * len(json.dumps(manifests[0])))
+    assert [len(c) for c in chunks] == [3, 3, 3, 1]
+
+
+def test_metrics_server_is_a_single_custom_resource(eks_template):
+    resources = eks_template.find_resources("Custom::AWSCDK-EKS-KubernetesResource")
+    metrics_server = [r for r in resources.values() if "metrics-server" in json.dumps(r)]
+    assert len(metrics_server) == 1
+    manifest = json.dumps(metrics_server[0]["Properties"]["Manifest"])
+    for kind in ["ServiceAccount", "ClusterRoleBinding", "Deployment", "APIService"]:
+        assert kind in manifest
+    assert manifest.index("ServiceAccount") < manifest.index("Deployment") < manifest.index("APIService")
@@ -0,0 +1,61 @@
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+from infrastructure.tests.unit.utils import load_params
+from infrastructure.utils.monitoring import (
+    REMOTE_WRITE_HEADERS,
+    RemoteWriteReceiver,
+    recorded_series,
+    recording_rules,
+    render
+)
+
+
+@pytest.fixture
+def receiver():
+    receiver = RemoteWriteReceiver()
+    receiver.start()
+    yield receiver
+    receiver.stop()
+
+
+def post(url, headers, body=b"\x00batch"):
+    request = urllib.request.Request(url, data=body, headers=headers, method="POST")
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def test_recording_rules_aggregate_the_raw_series():
+    rules = recording_rules("30s")
+    series = recorded_series(rules)
+    assert len(series) == len(set(series))
+    assert all(name.startswith(("web_server:", "web_server_pod:")) for name in series)
+    for group in rules["groups"]:
+        for rule in group["rules"]:
+            assert rule["expr"].count("(") == rule["expr"].count(")")
+            # Recorded series are only aggregates, never a copy of a raw series
+            assert rule["expr"].startswith(("sum by", "max by", "histogram_quantile", "web_server:"))
+
+
+def test_receiver_accepts_remote_write_batches(receiver):
+    assert post(receiver.url, REMOTE_WRITE_HEADERS) == 204
+    assert post(receiver.url, {**REMOTE_WRITE_HEADERS, "Content-Encoding": "gzip"}) == 400
+    assert post(receiver.url.replace("/api/v1/write", "/write"), REMOTE_WRITE_HEADERS) == 400
+    assert (receiver.batches, receiver.rejected) == ([6], 2)
+
+
+def test_render_points_the_local_prometheus_at_the_receiver(tmp_path):
+    render(load_params("prod"), str(tmp_path), "http://receiver:9201/api/v1/write", [{"job_name": "web-server"}])
+    config = json.loads((tmp_path / "prometheus.yml").read_text())
+    rules = json.loads((tmp_path / "recording_rules.yml").read_text())
+    assert config["global"] == {"scrape_interval": "30s", "evaluation_interval": "30s"}
+    remote_write, = config["remote_write"]
+    assert remote_write["url"] == "http://receiver:9201/api/v1/write"
+    assert "sigv4" not in remote_write
+    assert remote_write["write_relabel_configs"][0]["regex"] == "|".join(recorded_series(rules))
@@ -0,0 +1,68 @@
+import pytest
+
+from aws_cdk import (
+    assertions,
+    core
+)
+
+from infrastructure.infrastructure_stack import InfrastructureStack
+from infrastructure.tests.unit.utils import helm_chart_values, load_params
+
+
+def test_spot_pools_use_capacity_optimized_mixed_instances(eks_template):
+    eks_template.resource_count_is("AWS::EC2::LaunchTemplate", 1)
+    eks_template.has_resource_properties("AWS::AutoScaling::AutoScalingGroup", {
+        "MinSize": "1",
+        "MaxSize": "10",
+        "LaunchConfigurationName": assertions.Match.absent(),
+        "MixedInstancesPolicy": {
+            "InstancesDistribution": {
+                "OnDemandBaseCapacity": 0,
+                "OnDemandPercentageAboveBaseCapacity": 0,
+                "SpotAllocationStrategy": "capacity-optimized"
+            },
+            "LaunchTemplate": {
+                "LaunchTemplateSpecification": assertions.Match.any_value(),
+                "Overrides": [{"InstanceType": "t3.small"}, {"InstanceType": "t3a.small"}]
+            }
+        }
+    })
+
+
+def test_spot_pool_nodes_are_labelled_from_their_lifecycle(eks_template):
+    launch_template = list(eks_template.find_resources("AWS::EC2::LaunchTemplate").values())[0]
+    user_data = "".join(part for part in launch_template["Properties"]["LaunchTemplateData"]["UserData"]["Fn::Base64"]
+                        ["Fn::Join"][1] if isinstance(part, str))
+    assert "meta-data/instance-life-cycle" in user_data
+    assert "--node-labels lifecycle=Ec2Spot --register-with-taints=spotInstance=true:PreferNoSchedule" in user_data
+    assert "--max-pods=20 --kube-reserved=cpu=70m,memory=475Mi,ephemeral-storage=1Gi" in user_data
+    assert "--use-max-pods false" in user_data
+    assert "/opt/aws/bin/cfn-signal" in user_data
+
+
+def test_graviton_pool_runs_the_web_server(prod_stack):
+    template = assertions.Template.from_stack(prod_stack.eks_stack)
+    template.resource_count_is("AWS::EC2::LaunchTemplate", 2)
+    template.has_resource_properties("AWS::AutoScaling::AutoScalingGroup", {
+        "MixedInstancesPolicy": {
+            "InstancesDistribution": assertions.Match.object_like({"OnDemandBaseCapacity": 2}),
+            "LaunchTemplate": assertions.Match.object_like({
+                "Overrides": assertions.Match.array_with([{"InstanceType": "c6g.large"}])
+            })
+        }
+    })
+    assert helm_chart_values(template, "WebServerHelmChart")["nodeSelector"] == {"kubernetes.io/arch": "arm64"}
+
+
+def test_pool_capacity_profile_must_exist():
+    params = load_params("dev")
+    params.eks.spot_node_pools[0].capacity_profile = "huge"
+    with pytest.raises(ValueError, match="Unknown capacity profile huge"):
+        InfrastructureStack(core.App(), "CC-MainStack", env=core.Environment(region="eu-west-1"), params=params)
+
+
+def test_web_server_architecture_needs_a_node_pool():
+    params = load_params("dev")
+    params.eks.web_server_architecture = "arm64"
+    with pytest.raises(ValueError, match="No node pool can run the arm64 web server image"):
+        InfrastructureStack(core.App(), "CC-MainStack", env=core.Environment(region="eu-west-1"), params=params)
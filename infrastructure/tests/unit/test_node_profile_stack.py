@@ -0,0 +1,98 @@
+import pytest
+
+from aws_cdk import (
+    assertions,
+    core
+)
+
+from infrastructure.infrastructure_stack import InfrastructureStack
+from infrastructure.tests.unit.utils import TEST_ENVIRONMENT, helm_chart_values, load_params, resolve
+
+
+@pytest.fixture(scope="module")
+def prod_template(prod_stack):
+    return assertions.Template.from_stack(prod_stack.eks_stack)
+
+
+def user_data(resource):
+    properties = resource["Properties"]
+    encoded = properties["LaunchTemplateData"]["UserData"] if "LaunchTemplateData" in properties \
+        else properties["UserData"]
+    return resolve(encoded["Fn::Base64"]).splitlines()
+
+
+def node_user_data(template):
+    resources = list(template.find_resources("AWS::AutoScaling::LaunchConfiguration").values()) + \
+        list(template.find_resources("AWS::EC2::LaunchTemplate").values())
+    return [user_data(resource) for resource in resources]
+
+
+def test_every_node_group_applies_the_host_sysctls_before_its_bootstrap(prod_template):
+    groups = node_user_data(prod_template)
+    assert len(groups) == 3
+    for lines in groups:
+        bootstrap = [i for i, line in enumerate(lines) if line.startswith("/etc/eks/bootstrap.sh")][0]
+        sysctls = [i for i, line in enumerate(lines) if "/etc/sysctl.d/99-node-profile.conf" in line]
+        assert [lines[i] for i in sysctls] == [
+            "echo 'fs.file-max = 2097152' >> /etc/sysctl.d/99-node-profile.conf",
+            "echo 'net.core.netdev_max_backlog = 16384' >> /etc/sysctl.d/99-node-profile.conf"
+        ]
+        assert max(sysctls) < lines.index("sysctl --system") < bootstrap
+
+
+def test_kubelet_arguments_from_the_node_profile(prod_template):
+    for lines in node_user_data(prod_template):
+        bootstrap = [line for line in lines if line.startswith("/etc/eks/bootstrap.sh")][0]
+        assert "--image-gc-high-threshold=80 --image-gc-low-threshold=60" in bootstrap
+        assert "--cpu-manager-policy=static" in bootstrap
+        # ip_local_port_range is a safe sysctl, allowed by default
+        assert "--allowed-unsafe-sysctls=net.core.somaxconn,net.ipv4.tcp_tw_reuse" in bootstrap
+
+
+def test_vpc_cni_prefix_delegation_before_the_nodes(prod_template):
+    patches = prod_template.find_resources("Custom::AWSCDK-EKS-KubernetesPatch")
+    patch_id, patch = [(logical_id, patch) for logical_id, patch in patches.items()
+                       if "CniPrefixDelegation" in logical_id][0]
+    assert patch["Properties"]["ResourceName"] == "daemonset/aws-node"
+    assert '{"name":"ENABLE_PREFIX_DELEGATION","value":"true"}' in resolve(patch["Properties"]["ApplyPatchJson"])
+    for group in prod_template.find_resources("AWS::AutoScaling::AutoScalingGroup").values():
+        assert patch_id in group["DependsOn"]
+
+
+def test_vpc_cni_is_upgraded_before_the_prefix_delegation(prod_template):
+    addons = prod_template.find_resources("AWS::EKS::Addon")
+    assert len(addons) == 1
+    addon_id, addon = list(addons.items())[0]
+    assert addon["Properties"]["AddonName"] == "vpc-cni"
+    assert addon["Properties"]["AddonVersion"] == "v1.10.1-eksbuild.1"
+    assert addon["Properties"]["ResolveConflicts"] == "OVERWRITE"
+    patch = [patch for logical_id, patch in prod_template.find_resources("Custom::AWSCDK-EKS-KubernetesPatch").items()
+             if "CniPrefixDelegation" in logical_id][0]
+    assert addon_id in patch["DependsOn"]
+
+
+def test_web_server_pods_set_the_namespaced_sysctls(prod_template):
+    values = helm_chart_values(prod_template, "WebServerHelmChart")
+    assert values["podSecurityContext"]["sysctls"] == [
+        {"name": "net.core.somaxconn", "value": "16384"},
+        {"name": "net.ipv4.ip_local_port_range", "value": "1024 65000"},
+        {"name": "net.ipv4.tcp_tw_reuse", "value": "1"}
+    ]
+    assert values["nginx"]["listenBacklog"] == 16384
+
+
+@pytest.mark.parametrize("change, match", [
+    (lambda params: setattr(params.eks.node_profile.host_sysctls, "net.core.somaxconn", 4096),
+     "namespaced sysctl, set it in pod_sysctls"),
+    (lambda params: setattr(params.eks.node_profile.pod_sysctls, "fs.file-max", 1048576), "host_sysctls"),
+    (lambda params: setattr(params.eks.node_profile, "image_gc_low_threshold_percent", 90), "image_gc"),
+    (lambda params: setattr(params.eks.capacity_profiles.small, "max_pods", 40), "at least 695Mi"),
+    (lambda params: params.eks.capacity_profiles.small.instance_families.append("t2"), "Nitro"),
+    (lambda params: setattr(params.eks.node_profile, "vpc_cni_version", "v1.7.5-eksbuild.2"), "v1.9.0 or later"),
+    (lambda params: params.eks.node_profile.__dict__.pop("vpc_cni_version"), "v1.9.0 or later"),
+])
+def test_invalid_node_profiles_are_rejected(change, match):
+    params = load_params("dev")
+    change(params)
+    with pytest.raises(ValueError, match=match):
+        InfrastructureStack(core.App(), "CC-MainStack", env=TEST_ENVIRONMENT, params=params)
@@ -0,0 +1,78 @@
+import pytest
+
+from aws_cdk import (
+    assertions,
+    core
+)
+
+from infrastructure.infrastructure_stack import InfrastructureStack
+from infrastructure.tests.unit.utils import helm_chart_values, load_params
+
+
+def test_interruption_events_are_sent_to_the_queue(eks_template):
+    queue_id = list(eks_template.find_resources("AWS::SQS::Queue").keys())
+    assert len(queue_id) == 1
+    eks_template.resource_count_is("AWS::Events::Rule", 5)
+    for source, detail_type in [("aws.ec2", "EC2 Spot Instance Interruption Warning"),
+                                ("aws.ec2", "EC2 Instance Rebalance Recommendation"),
+                                ("aws.ec2", "EC2 Instance State-change Notification"),
+                                ("aws.health", "AWS Health Event"),
+                                ("aws.autoscaling", "EC2 Instance-terminate Lifecycle Action")]:
+        eks_template.has_resource_properties("AWS::Events::Rule", {
+            "EventPattern": {"source": [source], "detail-type": [detail_type]},
+            "State": "ENABLED",
+            "Targets": [assertions.Match.object_like({"Arn": {"Fn::GetAtt": [queue_id[0], "Arn"]}})]
+        })
+
+
+def test_eventbridge_can_send_to_the_queue(eks_template):
+    eks_template.has_resource_properties("AWS::SQS::QueuePolicy", {
+        "PolicyDocument": {
+            "Statement": assertions.Match.array_with([assertions.Match.object_like({
+                "Action": ["sqs:SendMessage", "sqs:GetQueueAttributes", "sqs:GetQueueUrl"],
+                "Principal": {"Service": "events.amazonaws.com"}
+            })]),
+            "Version": "2012-10-17"
+        }
+    })
+
+
+def test_queue_is_encrypted_with_a_key_eventbridge_can_use(eks_template):
+    queues = list(eks_template.find_resources("AWS::SQS::Queue").values())
+    assert queues[0]["Properties"]["SqsManagedSseEnabled"] is True
+    assert "KmsMasterKeyId" not in queues[0]["Properties"]
+
+
+def test_node_groups_wait_for_the_drain(eks_template):
+    eks_template.resource_count_is("AWS::AutoScaling::LifecycleHook", 2)
+    eks_template.has_resource_properties("AWS::AutoScaling::LifecycleHook", {
+        "LifecycleTransition": "autoscaling:EC2_INSTANCE_TERMINATING",
+        "DefaultResult": "CONTINUE",
+        "HeartbeatTimeout": 300
+    })
+    eks_template.has_resource_properties("AWS::AutoScaling::AutoScalingGroup", {
+        "Tags": assertions.Match.array_with([
+            {"Key": "aws-node-termination-handler/managed", "PropagateAtLaunch": True, "Value": "true"}
+        ])
+    })
+
+
+def test_handler_runs_in_queue_mode(eks_template):
+    values = helm_chart_values(eks_template, "NodeTerminationHandlerHelmChart")
+    assert values["enableSqsTerminationDraining"] is True
+    assert values["queueURL"] == "TOKEN"
+    assert values["serviceAccount"] == {"create": False, "name": "aws-node-termination-handler"}
+    assert values["nodeSelector"] == {"lifecycle": "OnDemand"}
+
+
+def test_web_server_drains_before_shutdown(eks_template):
+    values = helm_chart_values(eks_template, "WebServerHelmChart")
+    assert values["shutdown"] == {"preStopSleepSeconds": 20, "terminationGracePeriodSeconds": 60}
+    assert values["podDisruptionBudget"] == {"enabled": True, "maxUnavailable": 1}
+
+
+def test_termination_grace_period_must_cover_the_drain():
+    params = load_params("dev")
+    params.eks.web_server_shutdown.termination_grace_period_seconds = 30
+    with pytest.raises(ValueError, match="at least 50"):
+        InfrastructureStack(core.App(), "CC-MainStack", env=core.Environment(region="eu-west-1"), params=params)
@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+from aws_cdk import (
+    assertions,
+    core
+)
+
+from infrastructure.infrastructure_stack import InfrastructureStack
+from infrastructure.tests.unit.utils import TEST_ENVIRONMENT, load_params
+
+
+@pytest.fixture(scope="module")
+def pipeline_template(dev_stack):
+    return assertions.Template.from_stack(dev_stack.pipeline_stack)
+
+
+def test_source_changes_are_pushed_by_a_webhook(pipeline_template):
+    pipeline_template.resource_count_is("AWS::CodePipeline::Webhook", 1)
+    pipeline_template.has_resource_properties("AWS::CodePipeline::Pipeline", {
+        "Stages": assertions.Match.array_with([assertions.Match.object_like({
+            "Name": "Source",
+            "Actions": [assertions.Match.object_like({
+                "Configuration": assertions.Match.object_like({"PollForSourceChanges": False})
+            })]
+        })])
+    })
+
+
+def test_image_is_built_in_parallel_with_the_synth(pipeline_template):
+    pipeline = list(pipeline_template.find_resources("AWS::CodePipeline::Pipeline").values())[0]
+    stages = {stage["Name"]: stage["Actions"] for stage in pipeline["Properties"]["Stages"]}
+    assert list(stages) == ["Source", "Build", "Deploy"]
+    assert {(action["Name"], action["RunOrder"]) for action in stages["Build"]} == {("SynthAndDiff", 1),
+                                                                                    ("WebServerImage", 1)}
+    assert stages["Deploy"][0]["InputArtifacts"] == [{"Name": "CloudAssembly"}]
+
+
+def test_builds_share_the_s3_cache(pipeline_template):
+    projects = pipeline_template.find_resources("AWS::CodeBuild::Project").values()
+    assert len(projects) == 3
+    for project in projects:
+        assert project["Properties"]["Cache"]["Type"] == "S3"
+        build_spec = json.loads(project["Properties"]["Source"]["BuildSpec"])
+        assert "/root/.cache/pip/**/*" in build_spec["cache"]["paths"]
+
+
+def test_deploy_is_skipped_without_changes(pipeline_template):
+    build_specs = [json.loads(project["Properties"]["Source"]["BuildSpec"])
+                   for project in pipeline_template.find_resources("AWS::CodeBuild::Project").values()]
+    deploy_commands = [command for build_spec in build_specs for command in build_spec["phases"]["build"]["commands"]
+                       if "cdk deploy" in command]
+    assert len(deploy_commands) == 1
+    assert deploy_commands[0].startswith('if [ "$(cat changes)" = "none" ]')
+    assert "cdk deploy --app ." in deploy_commands[0]
+
+
+def test_local_cache_keeps_docker_layers():
+    params = load_params("dev")
+    params.pipeline.cache = "local"
+    stack = InfrastructureStack(core.App(), "CC-MainStack", env=TEST_ENVIRONMENT, params=params)
+    template = assertions.Template.from_stack(stack.pipeline_stack)
+    template.resource_count_is("AWS::S3::Bucket", 1)
+    template.has_resource_properties("AWS::CodeBuild::Project", {
+        "Cache": {"Type": "LOCAL", "Modes": assertions.Match.array_with(["LOCAL_DOCKER_LAYER_CACHE"])}
+    })
+
+
+def test_unknown_trigger_is_rejected():
+    params = load_params("dev")
+    params.pipeline.trigger = "push"
+    with pytest.raises(ValueError, match="Unsupported pipeline trigger push"):
+        InfrastructureStack(core.App(), "CC-MainStack", env=TEST_ENVIRONMENT, params=params)
@@ -0,0 +1,104 @@
+import pytest
+
+from aws_cdk import (
+    assertions,
+    core
+)
+
+from infrastructure.infrastructure_stack import InfrastructureStack
+from infrastructure.tests.unit.utils import TEST_ENVIRONMENT, helm_chart_values, load_params
+from infrastructure.utils.monitoring import POD_REQUESTS_RATE, recorded_series
+
+
+@pytest.fixture(scope="module")
+def remote_write_template():
+    params = load_params("prod")
+    params.eks.prometheus.remote_write.enabled = True
+    params.eks.prometheus.remote_write.url = \
+        "https://aps-workspaces.eu-west-1.amazonaws.com/workspaces/ws-1/api/v1/remote_write"
+    stack = InfrastructureStack(core.App(), "CC-MainStack", env=TEST_ENVIRONMENT, params=params)
+    return assertions.Template.from_stack(stack.eks_stack)
+
+
+def test_server_sized_by_the_environment_parameters(eks_template):
+    values = helm_chart_values(eks_template, "EKSPrometheusHelmChart")
+    server = values["server"]
+    assert server["global"] == {"scrape_interval": "60s", "evaluation_interval": "30s"}
+    assert (server["retention"], server["extraArgs"]) == ("3d", {"storage.tsdb.retention.size": "6GB"})
+    assert server["resources"] == {"requests": {"cpu": "200m", "memory": "512Mi"}, "limits": {"memory": "1Gi"}}
+    assert "remoteWrite" not in server
+
+
+def test_recording_rules_are_installed(eks_template):
+    rules = helm_chart_values(eks_template, "EKSPrometheusHelmChart")["serverFiles"]["recording_rules.yml"]
+    assert {group["interval"] for group in rules["groups"]} == {"30s"}
+    assert POD_REQUESTS_RATE in recorded_series(rules)
+
+
+def test_adapter_reads_the_recorded_series(eks_template):
+    rules = helm_chart_values(eks_template, "PrometheusAdapterHelmChart")["rules"]["custom"]
+    assert rules[0]["seriesQuery"] == POD_REQUESTS_RATE + '{namespace!="",pod!=""}'
+    assert all("rate(" not in rule["metricsQuery"] for rule in rules)
+
+
+def test_remote_write_sends_the_recorded_series_with_sigv4(remote_write_template):
+    values = helm_chart_values(remote_write_template, "EKSPrometheusHelmChart")
+    remote_write, = values["server"]["remoteWrite"]
+    assert remote_write["sigv4"] == {"region": "eu-west-1"}
+    assert remote_write["queue_config"] == {"capacity": 2500, "max_samples_per_send": 500, "max_shards": 50}
+    keep, = remote_write["write_relabel_configs"]
+    assert keep["action"] == "keep"
+    assert keep["regex"].split("|") == recorded_series(values["serverFiles"]["recording_rules.yml"])
+    assert values["serviceAccounts"] == {"server": {
+        "create": True,
+        "name": "prometheus-server",
+        "annotations": {"eks.amazonaws.com/role-arn": "TOKEN"}
+    }}
+
+
+def test_remote_write_role_is_given_to_the_server_service_account(remote_write_template):
+    remote_write_template.has_resource_properties("AWS::IAM::Policy", {
+        "PolicyDocument": {
+            "Statement": [{"Action": "aps:RemoteWrite", "Effect": "Allow", "Resource": "*"}]
+        }
+    })
+    remote_write_template.has_resource_properties("AWS::IAM::Role", {
+        "AssumeRolePolicyDocument": {
+            "Statement": [assertions.Match.object_like({
+                "Action": "sts:AssumeRoleWithWebIdentity",
+                "Condition": {"StringEquals": assertions.Match.any_value()}
+            })]
+        }
+    })
+
+
+def test_remote_write_leaves_the_namespace_to_the_chart(remote_write_template):
+    # A namespace or service account manifest owned by the stack would delete the release and its claims once the
+    # remote write is disabled
+    manifests = remote_write_template.find_resources("Custom::AWSCDK-EKS-KubernetesResource")
+    assert not any("Prometheus" in logical_id for logical_id in manifests)
+
+
+@pytest.mark.parametrize("key, value, match", [
+    ("retention", "15 days", "retention|positive integer"),
+    ("retention_size", "6G", "positive integer"),
+])
+def test_invalid_durations_and_sizes_are_rejected(key, value, match):
+    params = load_params("dev")
+    setattr(params.eks.prometheus, key, value)
+    with pytest.raises(ValueError, match=match):
+        InfrastructureStack(core.App(), "CC-MainStack", env=TEST_ENVIRONMENT, params=params)
+
+
+def test_web_server_scrape_interval_must_feed_the_recording_rules():
+    params = load_params("dev")
+    params.eks.web_server_metrics.scrape_interval = "1m"
+    with pytest.raises(ValueError, match="at most 30s"):
+        InfrastructureStack(core.App(), "CC-MainStack", env=TEST_ENVIRONMENT, params=params)
+
+
+def test_remote_write_needs_an_url():
+    params = load_params("dev")
+    params.eks.prometheus.remote_write.enabled = True
+    with pytest.raises(ValueError, match="http"):
+        InfrastructureStack(core.App(), "CC-MainStack", env=TEST_ENVIRONMENT, params=params)
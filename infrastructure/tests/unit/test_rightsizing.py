@@ -0,0 +1,60 @@
+import io
+import json
+import urllib.parse
+
+import pytest
+
+from infrastructure.tests.unit.utils import load_params
+from infrastructure.utils.rightsizing import PrometheusClient, observed_usage, report
+
+# Usage recorded over the window: cpu in cores, memory in bytes
+RECORDED = {
+    "count(": 6,
+    "max(quantile_over_time": 0.41,
+    "max(max_over_time(web_server_pod:container_cpu": 0.9,
+    "max(max_over_time(web_server_pod:container_memory": 150 * 1024 * 1024
+}
+
+
+def stand_in_urlopen(recorded):
+    def urlopen(url):
+        expr = urllib.parse.parse_qs(urllib.parse.urlparse(url).query)["query"][0]
+        result = [{"metric": {}, "value": [0, str(value)]} for prefix, value in recorded.items()
+                  if expr.startswith(prefix)]
+        return io.BytesIO(json.dumps({"status": "success", "data": {"resultType": "vector",
+                                                                    "result": result}}).encode())
+    return urlopen
+
+
+@pytest.fixture
+def usage():
+    return observed_usage(PrometheusClient("http://prometheus:9090/", urlopen=stand_in_urlopen(RECORDED)),
+                          "default", "7d")
+
+
+def test_usage_is_read_from_the_recorded_series(usage):
+    assert usage == {"pods": 6, "cpu_p95_millis": 410, "cpu_max_millis": 900, "memory_max_mib": 150}
+
+
+def test_missing_usage_is_reported():
+    client = PrometheusClient("http://prometheus:9090", urlopen=stand_in_urlopen({}))
+    with pytest.raises(ValueError, match="No web server usage"):
+        observed_usage(client, "default", "7d")
+
+
+def test_burstable_recommendation_keeps_the_limit_ratio(usage):
+    result = report(load_params("dev"), usage, headroom=0.2)
+    assert result["utilization"] == {"cpu": 1.64, "memory": 1.17}
+    assert result["recommended"] == {"web_server_resources": {
+        "qos": "Burstable",
+        "requests": {"cpu": "500m", "memory": "192Mi"},
+        "limits": {"memory": "384Mi"},
+        "integer_cpus": False
+    }}
+
+
+def test_integer_cpus_are_rounded_to_whole_cores(usage):
+    result = report(load_params("prod"), usage, headroom=0.2)
+    assert result["recommended"]["web_server_resources"]["requests"] == {"cpu": "1", "memory": "192Mi"}
+    assert "limits" not in result["recommended"]["web_server_resources"]
+    assert result["recommended"]["web_server_nginx"] == {"worker_processes": 1}
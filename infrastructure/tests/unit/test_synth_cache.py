@@ -0,0 +1,67 @@
+import json
+import os
+
+from infrastructure.utils.synth_cache import SynthCache, fingerprint
+
+
+def make_tree(root):
+    for path, content in {
+        "app.py": "print('app')",
+        "cdk.json": "{}",
+        "infrastructure/stacks/vpc_stack.py": "vpc",
+        "infrastructure/stacks/eks_stack.py": "eks",
+        "infrastructure/parameters/dev.json": json.dumps({"vpc": {"nats_number": 1}, "eks": {}}),
+        "helm/chart/values.yaml": "replicaCount: 1",
+    }.items():
+        os.makedirs(os.path.dirname(os.path.join(root, path)) or root, exist_ok=True)
+        with open(os.path.join(root, path), "w") as f:
+            f.write(content)
+
+
+def test_fingerprint_tracks_file_content(tmp_path):
+    make_tree(tmp_path)
+    before = fingerprint(["helm"], root=str(tmp_path))
+    (tmp_path / "helm/chart/values.yaml").write_text("replicaCount: 2")
+    assert fingerprint(["helm"], root=str(tmp_path)) != before
+
+
+def test_store_and_restore_assembly(tmp_path):
+    root = tmp_path / "repo"
+    make_tree(root)
+    outdir = tmp_path / "cdk.out"
+    outdir.mkdir()
+    (outdir / "manifest.json").write_text("{}")
+
+    cache = SynthCache(cache_dir=str(tmp_path / "cache"), env_path="infrastructure/parameters/dev.json",
+                       root=str(root))
+    assert not cache.restore(str(tmp_path / "restored"))
+    cache.store(str(outdir))
+    assert cache.restore(str(tmp_path / "restored"))
+    assert (tmp_path / "restored/manifest.json").exists()
+    assert cache.changed_stacks() == []
+
+
+def test_parameter_change_marks_only_affected_stacks(tmp_path):
+    make_tree(tmp_path)
+    outdir = tmp_path / "cdk.out"
+    outdir.mkdir()
+    cache = SynthCache(cache_dir=str(tmp_path / "cache"), env_path="infrastructure/parameters/dev.json",
+                       root=str(tmp_path))
+    cache.store(str(outdir))
+
+    (tmp_path / "infrastructure/parameters/dev.json").write_text(json.dumps({"vpc": {"nats_number": 1}, "eks": {},
+                                                                             "branch": "main"}))
+    changed_cache = SynthCache(cache_dir=str(tmp_path / "cache"), env_path="infrastructure/parameters/dev.json",
+                               root=str(tmp_path))
+    assert changed_cache.key != cache.key
+    assert changed_cache.changed_stacks() == ["PipelineStack"]
+
+
+def test_rotated_uncommitted_values_change_the_key(tmp_path):
+    make_tree(tmp_path)
+    cache = SynthCache(cache_dir=str(tmp_path / "cache"), env_path="infrastructure/parameters/dev.json",
+                       root=str(tmp_path), uncommitted={"github_token": "old"})
+    rotated = SynthCache(cache_dir=str(tmp_path / "cache"), env_path="infrastructure/parameters/dev.json",
+                         root=str(tmp_path), uncommitted={"github_token": "new"})
+    assert rotated.key != cache.key
+    assert "old" not in cache.key and "new" not in rotated.key
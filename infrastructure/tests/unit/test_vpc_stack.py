@@ -0,0 +1,65 @@
+import pytest
+
+from aws_cdk import (
+    assertions,
+    core
+)
+
+from infrastructure.infrastructure_stack import InfrastructureStack
+from infrastructure.tests.unit.utils import load_params
+
+INTERFACE_SERVICES = ["ecr.api", "ecr.dkr", "sts", "ec2", "logs", "elasticloadbalancing"]
+
+
+def route_table_ids(template, subnet_name):
+    return [{"Ref": logical_id} for logical_id in template.find_resources("AWS::EC2::RouteTable")
+            if subnet_name in logical_id]
+
+
+def test_s3_gateway_endpoint_on_the_node_route_tables(prod_stack):
+    template = assertions.Template.from_stack(prod_stack.vpc_stack)
+    route_tables = route_table_ids(template, "NattedSubnet") + route_table_ids(template, "PrivateSubnet")
+    assert route_tables
+    template.has_resource_properties("AWS::EC2::VPCEndpoint", {
+        "VpcEndpointType": "Gateway",
+        "ServiceName": {"Fn::Join": ["", ["com.amazonaws.", {"Ref": "AWS::Region"}, ".s3"]]},
+        "RouteTableIds": route_tables
+    })
+
+
+def test_interface_endpoints_in_the_natted_subnets(prod_stack):
+    template = assertions.Template.from_stack(prod_stack.vpc_stack)
+    subnets = [{"Ref": logical_id} for logical_id in template.find_resources("AWS::EC2::Subnet")
+               if "NattedSubnet" in logical_id]
+    for service in INTERFACE_SERVICES:
+        template.has_resource_properties("AWS::EC2::VPCEndpoint", {
+            "VpcEndpointType": "Interface",
+            "ServiceName": f"com.amazonaws.eu-west-1.{service}",
+            "PrivateDnsEnabled": True,
+            "SubnetIds": subnets
+        })
+
+
+def test_endpoints_are_configured_per_environment(dev_stack, prod_stack):
+    dev_template = assertions.Template.from_stack(dev_stack.vpc_stack)
+    dev_template.resource_count_is("AWS::EC2::VPCEndpoint", 1)
+    assertions.Template.from_stack(prod_stack.vpc_stack).resource_count_is("AWS::EC2::VPCEndpoint",
+                                                                           1 + len(INTERFACE_SERVICES))
+
+
+def test_unknown_interface_endpoint_is_rejected():
+    params = load_params("dev")
+    params.vpc.endpoints.interface_services = ["sqs"]
+    with pytest.raises(ValueError, match="Unsupported interface endpoint sqs"):
+        InfrastructureStack(core.App(), "CC-MainStack", env=core.Environment(region="eu-west-1"), params=params)
+
+
+@pytest.mark.parametrize("key, value, match", [
+    ("az_number", 3, "can only span 2 availability zones"),
+    ("nats_number", 3, "nats_number can't exceed"),
+])
+def test_zones_and_nat_gateways_beyond_the_synthesized_ones_are_rejected(key, value, match):
+    params = load_params("prod")
+    setattr(params.vpc, key, value)
+    with pytest.raises(ValueError, match=match):
+        InfrastructureStack(core.App(), "CC-MainStack", env=core.Environment(region="eu-west-1"), params=params)
@@ -0,0 +1,28 @@
+import os
+import re
+
+IMAGE_DIR = "images/web_server"
+
+
+def template_variables():
+    variables = set()
+    for root, _, files in os.walk(f"{IMAGE_DIR}/templates"):
+        for name in files:
+            with open(os.path.join(root, name), "r") as f:
+                variables.update(re.findall(r"\$\{(NGINX_[A-Z_]+)\}", f.read()))
+    return variables
+
+
+def test_every_template_variable_has_an_image_default():
+    with open(f"{IMAGE_DIR}/Dockerfile", "r") as f:
+        dockerfile = f.read()
+    defaults = set(re.findall(r"(NGINX_[A-Z_]+)=", dockerfile))
+    assert template_variables() <= defaults
+
+
+def test_every_template_variable_is_set_by_the_chart():
+    chart_templates = ""
+    for name in ["templates/deployment.yaml", "templates/_helpers.tpl"]:
+        with open(f"helm/ccekswebserver/{name}", "r") as f:
+            chart_templates += f.read()
+    assert template_variables() <= set(re.findall(r"name: (NGINX_[A-Z_]+)", chart_templates))
@@ -0,0 +1,45 @@
+import json
+
+from aws_cdk import core
+
+from infrastructure.utils.environment import Environment
+from infrastructure.utils.secrets import SecretProvider
+
+# Same environment as app.py: without an account the stack is environment agnostic and its VPC spans at most
+# two availability zones
+TEST_ENVIRONMENT = core.Environment(region="eu-west-1")
+
+
+class StubSecretProvider(SecretProvider):
+    """Serves the example uncommitted parameters in place of Secrets Manager, keeping the synth offline."""
+
+    def __init__(self, path="infrastructure/parameters/uncommitted/example.env.json"):
+        with open(path, "r") as f:
+            self.secret = json.loads(f.read())
+        self.requested = []
+
+    def get_secret(self, secret_id):
+        self.requested.append(secret_id)
+        return self.secret
+
+
+def load_params(env_name, secret_provider=None):
+    return Environment.from_file(env_path=f"infrastructure/parameters/{env_name}.json", uncommitted_env_path=None,
+                                 secret_provider=secret_provider or StubSecretProvider())
+
+
+def resolve(value):
+    """Render an intrinsic Fn::Join as a plain string, replacing unresolved references with a placeholder."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict) and "Fn::Join" in value:
+        separator, parts = value["Fn::Join"]
+        return separator.join(resolve(part) for part in parts)
+    return "TOKEN"
+
+
+def helm_chart_values(template, logical_id_fragment):
+    charts = template.find_resources("Custom::AWSCDK-EKS-HelmChart")
+    matches = [chart for logical_id, chart in charts.items() if logical_id_fragment in logical_id]
+    assert len(matches) == 1, f"{len(matches)} helm charts match {logical_id_fragment}"
+    return json.loads(resolve(matches[0]["Properties"]["Values"]))
@@ -0,0 +1,323 @@
+"""Web server load benchmark.
+
+Run with `python -m infrastructure.utils.benchmark [--output report.json]` from the repository root: the static
+content of the web server image is built by its asset pipeline and served on localhost by a stand-in of the nginx
+configuration (same routes, cache headers, precompressed copies and keepalive limits of `eks.web_server_connection`),
+then driven by an async load generator. `--url` benchmarks a running web server instead, e.g. the image started with
+`docker run -p 8080:80`. Throughput, p50/p95/p99 latency and error rate are reported as json and, with
+`--baseline`, compared with a previous report: the exit code is 1 when a metric regresses beyond `--tolerance`.
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+from typing import Optional
+from urllib.parse import urlsplit
+
+from infrastructure.utils.capacity import parse_duration
+from infrastructure.utils.environment import Environment
+
+IMAGE_DIR = f"{os.path.dirname(__file__)}/../../images/web_server"
+HEALTH_CHECK_PATH = "/healthz"
+# Same pattern of the fingerprinted assets location of the nginx configuration
+FINGERPRINTED_ASSET = re.compile(r"\.[0-9a-f]{8}\.[a-z0-9]+$", re.IGNORECASE)
+CONTENT_TYPES = {".html": "text/html", ".css": "text/css", ".js": "application/javascript",
+                 ".json": "application/json", ".svg": "image/svg+xml", ".png": "image/png", ".txt": "text/plain"}
+PERCENTILES = {"p50": 50, "p95": 95, "p99": 99}
+# Content encodings of the precompressed copies in the order nginx prefers them, brotli_static before gzip_static
+PRECOMPRESSED_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Linear interpolation between the closest ranks."""
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * q / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (rank - lower)
+
+
+def build_site(output_dir: str, cache_dir: str) -> None:
+    spec = importlib.util.spec_from_file_location("build_assets", f"{IMAGE_DIR}/build_assets.py")
+    build_assets = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(build_assets)
+    build_assets.build(f"{IMAGE_DIR}/site", output_dir, cache_dir, workers=1)
+
+
+class StandInServer:
+    """Serves a directory on localhost the way the nginx configuration of the image does.
+
+    The files are read once at start up, like the open file cache keeps them, and the connections are closed after
+    `keepalive_requests` requests or `keepalive_timeout` seconds of inactivity.
+    """
+
+    def __init__(self, root: str, keepalive_timeout: float = 75, keepalive_requests: int = 1000,
+                 asset_max_age: int = 31536000):
+        self.keepalive_timeout = keepalive_timeout
+        self.keepalive_requests = keepalive_requests
+        self.asset_max_age = asset_max_age
+        self.files = {}
+        for directory, _, names in os.walk(root):
+            for name in names:
+                path = os.path.join(directory, name)
+                with open(path, "rb") as f:
+                    self.files["/" + os.path.relpath(path, root).replace(os.sep, "/")] = f.read()
+        self.port = None
+        self._loop = None
+        self._server = None
+        self._thread = None
+
+    @classmethod
+    def from_params(cls, params, root: str) -> "StandInServer":
+        connection_params = params.eks.web_server_connection
+        return cls(root, keepalive_timeout=parse_duration(connection_params.keepalive_timeout),
+                   keepalive_requests=connection_params.keepalive_requests,
+                   asset_max_age=params.eks.web_server_nginx.asset_max_age)
+
+    def response(self, path: str, accept_encoding: str):
+        """Status, headers and body served for a path."""
+        if path == HEALTH_CHECK_PATH:
+            return 200, {"Content-Type": "text/plain"}, b"ok"
+        if path.endswith("/"):
+            path += "index.html"
+        if path not in self.files:
+            return 404, {"Content-Type": "text/html"}, b"<html><body>404 Not Found</body></html>"
+        headers = {
+            "Content-Type": CONTENT_TYPES.get(os.path.splitext(path)[1], "application/octet-stream"),
+            "Cache-Control": f"public, max-age={self.asset_max_age}, immutable" if FINGERPRINTED_ASSET.search(path)
+            else "no-cache"
+        }
+        # brotli_static and gzip_static serve the copies precompressed by the asset pipeline
+        accepted = {encoding.split(";")[0].strip() for encoding in accept_encoding.split(",")}
+        for encoding, suffix in PRECOMPRESSED_SUFFIXES.items():
+            if encoding in accepted and f"{path}{suffix}" in self.files:
+                headers.update({"Content-Encoding": encoding, "Vary": "Accept-Encoding"})
+                return 200, headers, self.files[f"{path}{suffix}"]
+        return 200, headers, self.files[path]
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            for served in range(1, self.keepalive_requests + 1):
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.keepalive_timeout)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+                    return
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                method, target, _ = request_line.split(" ", 2)
+                request_headers = {name.strip().lower(): value.strip() for name, value in
+                                   (line.split(":", 1) for line in header_lines if ":" in line)}
+                status, headers, body = self.response(urlsplit(target).path, request_headers.get("accept-encoding", ""))
+                close = served == self.keepalive_requests or request_headers.get("connection", "").lower() == "close"
+                headers.update({"Content-Length": str(len(body)), "Connection": "close" if close else "keep-alive"})
+                writer.write(f"HTTP/1.1 {status} {'OK' if status == 200 else 'Not Found'}\r\n".encode() +
+                             "".join(f"{name}: {value}\r\n" for name, value in headers.items()).encode() + b"\r\n" +
+                             (body if method != "HEAD" else b""))
+                await writer.drain()
+                if close:
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def start(self) -> int:
+        """Starts serving on an ephemeral port in a background thread, returns the port."""
+        started = threading.Event()
+
+        def serve():
+            self._loop = asyncio.new_event_loop()
+            self._server = self._loop.run_until_complete(asyncio.start_server(self.handle, "127.0.0.1", 0))
+            self.port = self._server.sockets[0].getsockname()[1]
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=serve, daemon=True)
+        self._thread.start()
+        started.wait()
+        return self.port
+
+    def stop(self) -> None:
+        self._loop.call_soon_threadsafe(self._server.close)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+async def read_response(reader: asyncio.StreamReader):
+    """Status and whether the server keeps the connection open, the body is read and discarded."""
+    head = await reader.readuntil(b"\r\n\r\n")
+    status_line, *header_lines = head.decode("latin-1").split("\r\n")
+    status = int(status_line.split(" ", 2)[1])
+    headers = {name.strip().lower(): value.strip() for name, value in
+               (line.split(":", 1) for line in header_lines if ":" in line)}
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        # gzip on the fly responses have no length
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(int(headers.get("content-length", 0)))
+    return status, headers.get("connection", "").lower() != "close"
+
+
+class LoadGenerator:
+    """Closed loop load: `concurrency` keepalive connections sending requests back to back, optionally paced to a
+    total `rate` of requests per second, for `duration` seconds or until `requests` requests are sent."""
+
+    def __init__(self, url: str, paths: list, concurrency: int = 16, duration: Optional[float] = 10,
+                 requests: Optional[int] = None, rate: Optional[float] = None, timeout: float = 5,
+                 accept_encoding: str = "gzip, br"):
+        if concurrency < 1 or (duration is None and requests is None):
+            raise ValueError("The load needs a positive concurrency and a duration or a number of requests")
+        url = urlsplit(url)
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.paths = paths
+        self.concurrency = concurrency
+        self.duration = duration
+        self.requests = requests
+        self.rate = rate
+        self.timeout = timeout
+        self.accept_encoding = accept_encoding
+        self.latencies = []
+        self.status_codes = {}
+        self.connection_errors = 0
+        self._sent = 0
+
+    def _next_request(self, start: float) -> Optional[tuple]:
+        """Index and scheduled send time of the next request, None when the load is over."""
+        if self.requests is not None and self._sent >= self.requests:
+            return None
+        if self.duration is not None and time.perf_counter() - start >= self.duration:
+            return None
+        index = self._sent
+        self._sent += 1
+        return index, start + index / self.rate if self.rate else time.perf_counter()
+
+    async def _client(self, start: float) -> None:
+        reader = writer = None
+        while (next_request := self._next_request(start)) is not None:
+            index, scheduled = next_request
+            await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+            path = self.paths[index % len(self.paths)]
+            sent_at = time.perf_counter()
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port),
+                                                            self.timeout)
+                writer.write(f"GET {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                             f"Accept-Encoding: {self.accept_encoding}\r\n\r\n".encode())
+                status, keepalive = await asyncio.wait_for(read_response(reader), self.timeout)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                self.connection_errors += 1
+                keepalive = False
+            else:
+                self.latencies.append(time.perf_counter() - sent_at)
+                self.status_codes[status] = self.status_codes.get(status, 0) + 1
+            if not keepalive and writer is not None:
+                writer.close()
+                reader = writer = None
+        if writer is not None:
+            writer.close()
+
+    async def run(self) -> dict:
+        start = time.perf_counter()
+        await asyncio.gather(*(self._client(start) for _ in range(self.concurrency)))
+        return self.report(time.perf_counter() - start)
+
+    def report(self, elapsed: float) -> dict:
+        latencies = sorted(self.latencies)
+        total = len(latencies) + self.connection_errors
+        errors = self.connection_errors + sum(count for status, count in self.status_codes.items() if status >= 500)
+        return {
+            "url": f"http://{self.host}:{self.port}",
+            "paths": self.paths,
+            "concurrency": self.concurrency,
+            "rate": self.rate,
+            "duration_seconds": round(elapsed, 3),
+            "requests": total,
+            "errors": errors,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+            "latency_ms": {
+                **{name: round(percentile(latencies, q) * 1000, 3) for name, q in PERCENTILES.items()},
+                "max": round(latencies[-1] * 1000, 3) if latencies else 0.0
+            },
+            "status_codes": {str(status): count for status, count in sorted(self.status_codes.items())}
+        }
+
+
+def compare(report: dict, baseline: dict, tolerance: float = 0.1) -> list:
+    """Metrics of the report worse than the baseline by more than `tolerance` (a fraction of the baseline)."""
+    regressions = []
+    if report["throughput_rps"] < baseline["throughput_rps"] * (1 - tolerance):
+        regressions.append(f"throughput {report['throughput_rps']} rps, baseline {baseline['throughput_rps']} rps")
+    for name in PERCENTILES:
+        if report["latency_ms"][name] > baseline["latency_ms"][name] * (1 + tolerance):
+            regressions.append(f"{name} latency {report['latency_ms'][name]} ms, "
+                               f"baseline {baseline['latency_ms'][name]} ms")
+    if report["error_rate"] > baseline["error_rate"] + tolerance / 100:
+        regressions.append(f"error rate {report['error_rate']}, baseline {baseline['error_rate']}")
+    return regressions
+
+
+def run_benchmark(params, url: Optional[str], paths: list, **load_options) -> dict:
+    if url:
+        return asyncio.run(LoadGenerator(url, paths, **load_options).run())
+    with tempfile.TemporaryDirectory() as build_dir:
+        build_site(os.path.join(build_dir, "public"), os.path.join(build_dir, "cache"))
+        server = StandInServer.from_params(params, os.path.join(build_dir, "public"))
+        port = server.start()
+        try:
+            report = asyncio.run(LoadGenerator(f"http://127.0.0.1:{port}", paths, **load_options).run())
+        finally:
+            server.stop()
+    report["server"] = "stand-in"
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the web server under load")
+    parser.add_argument("--environment", default=os.environ.get("ENVIRONMENT", "dev"),
+                        help="Parameters of the nginx stand-in")
+    parser.add_argument("--url", help="Running web server to benchmark instead of the local stand-in")
+    parser.add_argument("--path", action="append", dest="paths", help="Requested path, repeatable")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--requests", type=int, help="Stop after this many requests instead of the duration")
+    parser.add_argument("--rate", type=float, help="Total requests per second, as fast as possible by default")
+    parser.add_argument("--timeout", type=float, default=5)
+    parser.add_argument("--accept-encoding", default="gzip, br")
+    parser.add_argument("--output", help="Path of the json report")
+    parser.add_argument("--baseline", help="Previous json report the results are compared with")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    params = Environment.from_file(env_path=f"infrastructure/parameters/{args.environment}.json",
+                                   uncommitted_env_path=None)
+    report = run_benchmark(params, args.url, args.paths or ["/"], concurrency=args.concurrency,
+                           duration=None if args.requests else args.duration, requests=args.requests,
+                           rate=args.rate, timeout=args.timeout, accept_encoding=args.accept_encoding)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(json.dumps(report, indent=2))
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            regressions = compare(report, json.loads(f.read()), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""Capacity profiles of the EKS node groups.
+
+A capacity profile declared in `eks.capacity_profiles` describes the nodes of a node group: the interchangeable
+instance families and sizes, their architecture and shape, the pod density and the resources reserved to the
+kubelet and the system daemons. The on demand group uses the `eks.compute_size` profile, every spot node pool
+names its own `capacity_profile`.
+
+The node counts needed for a target load can be estimated from the per pod throughput measured in benchmarks:
+
+    python -m infrastructure.utils.capacity --environment prod --target-rps 5000 --per-pod-rps 400
+"""
+import argparse
+import math
+import os
+import re
+
+from infrastructure.utils.environment import Environment
+
+ARCHITECTURES = ["x86_64", "arm64"]
+# Graviton instance families, e.g. m6g, c6gn, t4g, r6gd and the first generation a1
+ARM64_INSTANCE_TYPE = re.compile(r"^(a1|[a-z]+\d+g[a-z]*)\.")
+
+# aws-node and kube-proxy run on every node, with their cpu requests
+DAEMONSET_PODS = 2
+DAEMONSET_CPU_MILLIS = 125
+
+# Binary and decimal suffixes of the Kubernetes memory quantities, in bytes
+MEMORY_UNITS = {"Ki": 1024, "Mi": 1024 ** 2, "Gi": 1024 ** 3, "Ti": 1024 ** 4,
+                "k": 1000, "M": 1000 ** 2, "G": 1000 ** 3, "T": 1000 ** 4}
+MEMORY_QUANTITY = re.compile(r"(\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)(Ki|Mi|Gi|Ti|k|M|G|T)?")
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_cpu(quantity) -> int:
+    """Kubernetes cpu quantity in millicores."""
+    quantity = str(quantity)
+    if quantity.endswith("m"):
+        return int(quantity[:-1])
+    return int(float(quantity) * 1000)
+
+
+def parse_memory(quantity) -> float:
+    """Kubernetes memory quantity in MiB, e.g. 512Mi, 512M or 1e9."""
+    match = MEMORY_QUANTITY.fullmatch(str(quantity))
+    if not match:
+        raise ValueError(f"Unsupported memory quantity {quantity}")
+    return float(match.group(1)) * MEMORY_UNITS.get(match.group(2), 1) / 1024 ** 2
+
+
+def parse_duration(value) -> float:
+    """nginx time value in seconds, e.g. 75s or 500ms."""
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)(ms|s|m|h)?", str(value))
+    if not match:
+        raise ValueError(f"Invalid duration {value}")
+    return float(match.group(1)) * DURATION_UNITS[match.group(2) or "s"]
+
+
+def format_quantities(quantities) -> str:
+    return ",".join(f"{name}={value}" for name, value in quantities.__dict__.items())
+
+
+class CapacityProfile:
+
+    def __init__(self, name: str, profile_params) -> None:
+        self.name = name
+        self.architecture = profile_params.architecture
+        self.instance_types = [f"{family}.{size}" for size in profile_params.instance_sizes
+                               for family in profile_params.instance_families]
+        self.vcpus = profile_params.vcpus
+        self.memory_mib = profile_params.memory_mib
+        self.max_pods = profile_params.max_pods
+        self.kube_reserved = profile_params.kube_reserved
+        self.system_reserved = profile_params.system_reserved
+        self.eviction_hard = profile_params.eviction_hard
+        self.validate()
+
+    @classmethod
+    def from_params(cls, params, name: str) -> "CapacityProfile":
+        profiles = params.eks.capacity_profiles.__dict__
+        if name not in profiles:
+            raise ValueError(f"Unknown capacity profile {name}, the declared ones are {', '.join(profiles)}")
+        return cls(name, profiles[name])
+
+    def validate(self):
+        if self.architecture not in ARCHITECTURES:
+            raise ValueError(f"Unsupported architecture {self.architecture} of the {self.name} capacity profile")
+        if not self.instance_types:
+            raise ValueError(f"The {self.name} capacity profile needs at least an instance family and size")
+        for instance_type in self.instance_types:
+            if bool(ARM64_INSTANCE_TYPE.match(instance_type)) != (self.architecture == "arm64"):
+                raise ValueError(f"{instance_type} isn't a {self.architecture} instance type, "
+                                 f"used by the {self.name} capacity profile")
+        if self.max_pods <= DAEMONSET_PODS:
+            raise ValueError(f"max_pods of the {self.name} capacity profile leaves no room for the workloads")
+        if self.allocatable_cpu_millis <= 0 or self.allocatable_memory_mib <= 0:
+            raise ValueError(f"The resources reserved by the {self.name} capacity profile exceed the node capacity")
+
+    @property
+    def allocatable_cpu_millis(self) -> int:
+        return self.vcpus * 1000 - parse_cpu(self.kube_reserved.cpu) - parse_cpu(self.system_reserved.cpu)
+
+    @property
+    def allocatable_memory_mib(self) -> float:
+        return self.memory_mib - parse_memory(self.kube_reserved.memory) - \
+            parse_memory(self.system_reserved.memory) - parse_memory(self.eviction_hard.__dict__["memory.available"])
+
+    def kubelet_extra_args(self) -> str:
+        eviction_hard = ",".join(f"{signal}<{value}" for signal, value in self.eviction_hard.__dict__.items())
+        return f"--max-pods={self.max_pods} --kube-reserved={format_quantities(self.kube_reserved)} " \
+               f"--system-reserved={format_quantities(self.system_reserved)} --eviction-hard={eviction_hard}"
+
+    def pods_per_node(self, pod_cpu, pod_memory) -> int:
+        """How many pods with the given requests fit on a node, besides the daemonsets."""
+        return min(
+            self.max_pods - DAEMONSET_PODS,
+            (self.allocatable_cpu_millis - DAEMONSET_CPU_MILLIS) // parse_cpu(pod_cpu),
+            int(self.allocatable_memory_mib // parse_memory(pod_memory))
+        )
+
+
+def validate_node_group(name: str, min_capacity: int, max_capacity: int):
+    if not 0 <= min_capacity <= max_capacity:
+        raise ValueError(f"The {name} node group needs 0 <= min_capacity ({min_capacity}) <= "
+                         f"max_capacity ({max_capacity})")
+
+
+def plan_capacity(profile: CapacityProfile, target_rps: float, per_pod_rps: float, pod_cpu="250m",
+                  pod_memory="128Mi", target_utilization: float = 0.75) -> dict:
+    """Replicas and nodes needed to serve `target_rps` keeping the pods at `target_utilization` of the
+    throughput measured for a single pod."""
+    if per_pod_rps <= 0 or not 0 < target_utilization <= 1:
+        raise ValueError("per_pod_rps must be positive and target_utilization between 0 and 1")
+    replicas = math.ceil(target_rps / (per_pod_rps * target_utilization))
+    pods_per_node = profile.pods_per_node(pod_cpu, pod_memory)
+    if pods_per_node < 1:
+        raise ValueError(f"A {pod_cpu} cpu, {pod_memory} memory pod doesn't fit on the {profile.name} nodes")
+    return {
+        "profile": profile.name,
+        "replicas": replicas,
+        "pods_per_node": pods_per_node,
+        "nodes": math.ceil(replicas / pods_per_node)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Estimate the web server replicas and nodes for a target load")
+    parser.add_argument("--environment", default=os.environ.get("ENVIRONMENT", "dev"))
+    parser.add_argument("--profile", help="Capacity profile, the eks.compute_size one by default")
+    parser.add_argument("--target-rps", type=float, required=True)
+    parser.add_argument("--per-pod-rps", type=float, required=True, help="Throughput of a pod measured in benchmarks")
+    parser.add_argument("--pod-cpu", default="250m")
+    parser.add_argument("--pod-memory", default="128Mi")
+    parser.add_argument("--target-utilization", type=float, default=0.75)
+    args = parser.parse_args(argv)
+
+    params = Environment.from_file(env_path=f"infrastructure/parameters/{args.environment}.json",
+                                   uncommitted_env_path=None)
+    profile = CapacityProfile.from_params(params, args.profile or params.eks.compute_size)
+    plan = plan_capacity(profile, args.target_rps, args.per_pod_rps, args.pod_cpu, args.pod_memory,
+                         args.target_utilization)
+    print(f"{plan['replicas']} replicas, {plan['pods_per_node']} per {profile.name} node: {plan['nodes']} nodes")
+
+
+if __name__ == "__main__":
+    main()
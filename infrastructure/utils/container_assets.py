@@ -0,0 +1,126 @@
+"""Container image assets publishing.
+
+Run with `python -m infrastructure.utils.container_assets cdk.out` after `cdk synth`: every container image asset of
+the cloud assembly is built and pushed to the ECR repository and tag `cdk deploy` expects, so that the deploy finds
+the image already published and skips its build. The CI/CD pipeline runs it in an action parallel to the synth and
+diff of the stacks.
+
+The previous build of the same platform is pulled as a layer cache (`--cache-from`), so only the layers whose
+inputs changed are built again, even on a fresh build host. The nginx stages of an image built for another
+architecture than the one of the build host (e.g. arm64 on the x86 CodeBuild hosts) run under QEMU, whose binfmt
+handlers are registered before the first such build.
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import subprocess
+
+import boto3
+
+# Tag of the last image built for a combination of build args, pulled as the layer cache of the next build
+CACHE_TAG_PREFIX = "cache"
+# Registers the QEMU binfmt handlers of the host kernel, needs a privileged docker daemon
+BINFMT_IMAGE = "tonistiigi/binfmt:qemu-v6.2.0"
+# Docker architectures of the machine names reported by the kernel
+MACHINE_ARCHITECTURES = {"x86_64": "amd64", "amd64": "amd64", "aarch64": "arm64", "arm64": "arm64"}
+
+
+def container_assets(assembly_dir: str) -> list:
+    """Container image assets declared by the stacks of a cloud assembly."""
+    with open(os.path.join(assembly_dir, "manifest.json"), "r") as f:
+        manifest = json.loads(f.read())
+    assets = {}
+    for artifact in manifest.get("artifacts", {}).values():
+        for entries in artifact.get("metadata", {}).values():
+            for entry in entries:
+                if entry["type"] == "aws:cdk:asset" and entry["data"]["packaging"] == "container-image":
+                    assets[entry["data"]["id"]] = entry["data"]
+    return list(assets.values())
+
+
+def cache_tag(asset: dict) -> str:
+    build_args = "-".join(re.sub(r"[^A-Za-z0-9_.-]", "-", value) for _, value in
+                          sorted(asset.get("buildArgs", {}).items()))
+    return f"{CACHE_TAG_PREFIX}-{build_args}" if build_args else CACHE_TAG_PREFIX
+
+
+def target_architecture(asset: dict):
+    target_platform = asset.get("buildArgs", {}).get("TARGET_PLATFORM")
+    return target_platform.split("/")[1] if target_platform else None
+
+
+class ContainerAssetPublisher:
+    def __init__(self, assembly_dir: str, registry: str, ecr_client=None, run=subprocess.run,
+                 host_architecture: str = None):
+        self.assembly_dir = assembly_dir
+        self.registry = registry
+        self.ecr_client = ecr_client or boto3.client("ecr")
+        self.run = run
+        self.host_architecture = host_architecture or MACHINE_ARCHITECTURES.get(platform.machine(), platform.machine())
+        self.emulated_architectures = set()
+
+    def image_exists(self, repository: str, tag: str) -> bool:
+        try:
+            self.ecr_client.describe_images(repositoryName=repository, imageIds=[{"imageTag": tag}])
+        except self.ecr_client.exceptions.RepositoryNotFoundException:
+            self.ecr_client.create_repository(repositoryName=repository,
+                                              imageScanningConfiguration={"scanOnPush": True})
+            return False
+        except self.ecr_client.exceptions.ImageNotFoundException:
+            return False
+        return True
+
+    def docker(self, *args, check=True):
+        return self.run(["docker", *args], check=check)
+
+    def enable_emulation(self, architecture: str) -> None:
+        """Registers the QEMU handlers of an architecture, the RUN steps of its stages fail with "exec format error"
+        without them."""
+        if architecture is None or architecture == self.host_architecture or \
+                architecture in self.emulated_architectures:
+            return
+        self.docker("run", "--privileged", "--rm", BINFMT_IMAGE, "--install", architecture)
+        self.emulated_architectures.add(architecture)
+
+    def publish(self, asset: dict) -> bool:
+        """Builds and pushes an asset, returns False when the image was already published."""
+        repository = f"{self.registry}/{asset['repositoryName']}"
+        if self.image_exists(asset["repositoryName"], asset["imageTag"]):
+            return False
+
+        self.enable_emulation(target_architecture(asset))
+        cache_image = f"{repository}:{cache_tag(asset)}"
+        # The first build of a platform has no cache to pull
+        self.docker("pull", cache_image, check=False)
+        build_args = [arg for name, value in sorted(asset.get("buildArgs", {}).items())
+                      for arg in ("--build-arg", f"{name}={value}")]
+        self.docker("build", "--cache-from", cache_image, "--build-arg", "BUILDKIT_INLINE_CACHE=1", *build_args,
+                    "--tag", f"{repository}:{asset['imageTag']}", "--tag", cache_image,
+                    "--file", os.path.join(self.assembly_dir, asset["path"], asset.get("file", "Dockerfile")),
+                    os.path.join(self.assembly_dir, asset["path"]))
+        self.docker("push", f"{repository}:{asset['imageTag']}")
+        self.docker("push", cache_image)
+        return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and push the container image assets of a cloud assembly")
+    parser.add_argument("assembly_dir", nargs="?", default="cdk.out")
+    parser.add_argument("--registry", help="ECR registry, the one of the current account and region by default")
+    args = parser.parse_args(argv)
+
+    registry = args.registry
+    if not registry:
+        session = boto3.session.Session()
+        account = session.client("sts").get_caller_identity()["Account"]
+        registry = f"{account}.dkr.ecr.{session.region_name}.amazonaws.com"
+    publisher = ContainerAssetPublisher(args.assembly_dir, registry)
+    for asset in container_assets(args.assembly_dir):
+        published = publisher.publish(asset)
+        print(f"{asset['repositoryName']}:{asset['imageTag']} {'published' if published else 'already published'}")
+
+
+if __name__ == "__main__":
+    main()
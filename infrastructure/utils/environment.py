@@ -1,31 +1,60 @@
 from __future__ import annotations
 
-import boto3
 import json
 import os
 
 from types import SimpleNamespace
 from typing import Optional
 
+from infrastructure.utils.secrets import SecretProvider, default_secret_provider
+
+# Keys of the uncommitted file or secret, see parameters/uncommitted/example.env.json
+UNCOMMITTED_KEYS = ("github_token",)
+
 
 class Environment(SimpleNamespace):
     def get(self, key, default):
+        if key in UNCOMMITTED_KEYS and "_uncommitted_loader" in self.__dict__:
+            self._load_uncommitted()
         return self.__dict__.get(key, default)
 
+    def __getattr__(self, key):
+        # Only called for missing attributes: the uncommitted values are fetched the first time one is read, any
+        # other missing key (e.g. a typo) fails without a call to the secret backend
+        if key not in UNCOMMITTED_KEYS or "_uncommitted_loader" not in self.__dict__:
+            raise AttributeError(key)
+        self._load_uncommitted()
+        if key not in self.__dict__:
+            raise AttributeError(key)
+        return self.__dict__[key]
+
+    def _load_uncommitted(self):
+        # The loader is only dropped once it succeeded, a transient error of the secret backend is retried
+        uncommitted = self.__dict__["_uncommitted_loader"]() or {}
+        del self.__dict__["_uncommitted_loader"]
+        self.__dict__["_uncommitted"] = uncommitted
+        self.__dict__.update(uncommitted)
+
+    def uncommitted_values(self) -> dict:
+        """Values of the uncommitted file or secret, fetched if none was read yet."""
+        if "_uncommitted_loader" in self.__dict__:
+            self._load_uncommitted()
+        return self.__dict__.get("_uncommitted", {})
+
     @classmethod
-    def from_file(cls, env_path: str, uncommitted_env_path: Optional[str]) -> Environment:
+    def from_file(cls, env_path: str, uncommitted_env_path: Optional[str],
+                  secret_provider: Optional[SecretProvider] = None) -> Environment:
         instance = cls()
         with open(env_path, "r") as f:
             instance = json.loads(f.read(), object_hook=lambda d: cls(**d))
 
-        if uncommitted_env_path:
-                with open(uncommitted_env_path, "r") as f:
-                    uncommitted_env = json.loads(f.read())
+        if uncommitted_env_path and os.path.exists(uncommitted_env_path):
+            with open(uncommitted_env_path, "r") as f:
+                uncommitted_env = json.loads(f.read())
+            instance.__dict__["_uncommitted"] = uncommitted_env
+            instance.__dict__.update(uncommitted_env)
         else:
-            secrets_manager = boto3.client("secretsmanager")
-            secret = secrets_manager.get_secret_value(
-                    SecretId=instance.github_token_secret_name
-                )
-            uncommitted_env = json.loads(secret['SecretString'])
-        instance.__dict__.update(uncommitted_env)
+            secret_provider = secret_provider or default_secret_provider()
+            instance.__dict__["_uncommitted_loader"] = \
+                lambda: secret_provider.get_secret(instance.github_token_secret_name)
         return instance
@@ -0,0 +1,73 @@
+import json
+
+from aws_cdk import (
+    aws_eks as eks
+)
+
+# Order in which kubectl has to apply the objects of a bundle: identities and RBAC first,
+# then the workloads that use them and finally the API registrations pointing to those workloads.
+KIND_ORDER = [
+    "Namespace",
+    "CustomResourceDefinition",
+    "ServiceAccount",
+    "Secret",
+    "ConfigMap",
+    "StorageClass",
+    "ClusterRole",
+    "ClusterRoleBinding",
+    "Role",
+    "RoleBinding",
+    "Service",
+    "DaemonSet",
+    "Deployment",
+    "StatefulSet",
+    "HorizontalPodAutoscaler",
+    "PodDisruptionBudget",
+    "Ingress",
+    "APIService",
+    "MutatingWebhookConfiguration",
+    "ValidatingWebhookConfiguration",
+]
+
+# The kubectl provider receives the manifest inside the custom resource properties,
+# bundles bigger than this are split to stay well below the Lambda payload limit.
+MAX_BUNDLE_BYTES = 200 * 1024
+
+
+def kind_priority(manifest: dict) -> int:
+    kind = manifest.get("kind", "")
+    return KIND_ORDER.index(kind) if kind in KIND_ORDER else len(KIND_ORDER)
+
+
+def sort_manifests(manifests: list) -> list:
+    # sorted() is stable, so objects of the same kind keep their declaration order
+    return sorted(manifests, key=kind_priority)
+
+
+def chunk_manifests(manifests: list, max_bytes: int = MAX_BUNDLE_BYTES) -> list:
+    chunks = []
+    current = []
+    current_size = 0
+    for manifest in sort_manifests(manifests):
+        size = len(json.dumps(manifest))
+        if current and current_size + size > max_bytes:
+            chunks.append(current)
+            current = []
+            current_size = 0
+        current.append(manifest)
+        current_size += size
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def add_bundled_manifest(cluster: eks.Cluster, id: str, manifests: list,
+                         max_bytes: int = MAX_BUNDLE_BYTES) -> list:
+    """Apply a group of related kubernetes objects with as few kubectl custom resources as possible."""
+    resources = []
+    for i, chunk in enumerate(chunk_manifests(manifests, max_bytes)):
+        resource = cluster.add_manifest(id if i == 0 else f"{id}-{i}", *chunk)
+        if resources:
+            resource.node.add_dependency(resources[-1])
+        resources.append(resource)
+    return resources
@@ -0,0 +1,207 @@
+"""Prometheus recording rules and remote write of the web server SLIs.
+
+The recording rules precompute the request rate, error ratio and latency quantiles of the web server from the raw
+nginx VTS series, so that dashboards, the HPA custom metrics and the rollout analysis read a few cheap series instead
+of aggregating every pod and histogram bucket on each evaluation. The cpu and memory usage of its containers is
+recorded too, for the right-sizing report of `infrastructure.utils.rightsizing`.
+
+The remote write configuration can be checked locally: `python -m infrastructure.utils.monitoring render` writes the
+prometheus.yml and rules of an environment pointing at a stand-in receiver started by
+`python -m infrastructure.utils.monitoring receive --port 9201`, which logs the batches sent by a Prometheus server
+(e.g. `docker run -v $PWD/prometheus:/etc/prometheus prom/prometheus`).
+"""
+import argparse
+import json
+import os
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from infrastructure.utils.environment import Environment
+
+# Raw series exported by the nginx VTS module, the "*" host aggregates all the virtual servers
+REQUESTS_SERIES = 'nginx_vts_server_requests_total{host!="*"}'
+DURATION_BUCKETS_SERIES = 'nginx_vts_server_request_duration_seconds_bucket{host!="*"}'
+
+# Per pod series read by the prometheus-adapter, per namespace ones by dashboards and alerts
+POD_REQUESTS_RATE = "web_server_pod:requests:rate2m"
+POD_P95_LATENCY = "web_server_pod:request_duration_seconds:p95_2m"
+QUANTILES = {"p50": 0.5, "p95": 0.95, "p99": 0.99}
+
+# cAdvisor usage of the web server containers, read by the right-sizing report
+WEB_SERVER_CONTAINER = "ccekswebserver"
+POD_CPU_USAGE = "web_server_pod:container_cpu_usage_seconds:rate5m"
+POD_MEMORY_WORKING_SET = "web_server_pod:container_memory_working_set_bytes:max"
+
+REMOTE_WRITE_PATH = "/api/v1/write"
+REMOTE_WRITE_HEADERS = {
+    "Content-Encoding": "snappy",
+    "Content-Type": "application/x-protobuf",
+    "X-Prometheus-Remote-Write-Version": "0.1.0"
+}
+
+
+def with_code(series: str, code: str) -> str:
+    return series.replace("}", f',code="{code}"}}')
+
+
+def recording_rules(interval: str) -> dict:
+    """Rule groups of the web server SLIs, in the format of a Prometheus rules file."""
+    requests_total = with_code(REQUESTS_SERIES, "total")
+    errors_total = with_code(REQUESTS_SERIES, "5xx")
+    namespace_rules = [
+        {"record": "web_server:requests:rate1m", "expr": f"sum by (namespace) (rate({requests_total}[1m]))"},
+        {"record": "web_server:errors:rate1m", "expr": f"sum by (namespace) (rate({errors_total}[1m]))"},
+        {"record": "web_server:error_ratio:rate1m",
+         "expr": "web_server:errors:rate1m / web_server:requests:rate1m"},
+    ] + [
+        {"record": f"web_server:request_duration_seconds:{name}_1m",
+         "expr": f"histogram_quantile({quantile}, sum by (le, namespace) (rate({DURATION_BUCKETS_SERIES}[1m])))"}
+        for name, quantile in QUANTILES.items()
+    ]
+    pod_rules = [
+        {"record": POD_REQUESTS_RATE, "expr": f"sum by (namespace, pod) (rate({requests_total}[2m]))"},
+        {"record": POD_P95_LATENCY,
+         "expr": f"histogram_quantile(0.95, sum by (le, namespace, pod) (rate({DURATION_BUCKETS_SERIES}[2m])))"},
+    ]
+    container = f'{{container="{WEB_SERVER_CONTAINER}"}}'
+    usage_rules = [
+        {"record": POD_CPU_USAGE,
+         "expr": f"sum by (namespace, pod) (rate(container_cpu_usage_seconds_total{container}[5m]))"},
+        {"record": POD_MEMORY_WORKING_SET,
+         "expr": f"max by (namespace, pod) (container_memory_working_set_bytes{container})"},
+    ]
+    return {
+        "groups": [
+            {"name": "web-server-slis", "interval": interval, "rules": namespace_rules},
+            {"name": "web-server-pods", "interval": interval, "rules": pod_rules},
+            {"name": "web-server-usage", "interval": interval, "rules": usage_rules}
+        ]
+    }
+
+
+def recorded_series(rules: dict) -> list:
+    return [rule["record"] for group in rules["groups"] for rule in group["rules"]]
+
+
+def remote_write_config(remote_write_params, region: str, rules: dict) -> dict:
+    config = {
+        "url": remote_write_params.url,
+        "queue_config": {
+            "capacity": remote_write_params.capacity,
+            "max_samples_per_send": remote_write_params.max_samples_per_send,
+            "max_shards": remote_write_params.max_shards
+        }
+    }
+    if remote_write_params.recorded_series_only:
+        # The raw series stay in the local TSDB, only the precomputed SLIs leave the cluster
+        config["write_relabel_configs"] = [{
+            "source_labels": ["__name__"],
+            "regex": "|".join(recorded_series(rules)),
+            "action": "keep"
+        }]
+    if remote_write_params.sigv4:
+        config["sigv4"] = {"region": region}
+    return config
+
+
+class RemoteWriteReceiver:
+    """Local stand-in of a remote write endpoint: checks the protocol headers of the batches and counts them."""
+
+    def __init__(self, port: int = 0):
+        self.batches = []
+        self.rejected = 0
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                valid = self.path == REMOTE_WRITE_PATH and all(
+                    self.headers.get(name) == value for name, value in REMOTE_WRITE_HEADERS.items())
+                if valid and body:
+                    receiver.batches.append(len(body))
+                    self.send_response(204)
+                else:
+                    receiver.rejected += 1
+                    self.send_response(400)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.port = self.server.server_address[1]
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}{REMOTE_WRITE_PATH}"
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        self._thread.join()
+
+
+def render(params, output_dir: str, remote_write_url: str, scrape_configs: list) -> None:
+    """Writes a prometheus.yml and its rules file with the settings of an environment."""
+    prometheus_params = params.eks.prometheus
+    rules = recording_rules(prometheus_params.evaluation_interval)
+    remote_write = remote_write_config(prometheus_params.remote_write, "", rules)
+    remote_write.pop("sigv4", None)
+    remote_write["url"] = remote_write_url
+    config = {
+        "global": {
+            "scrape_interval": prometheus_params.scrape_interval,
+            "evaluation_interval": prometheus_params.evaluation_interval
+        },
+        "rule_files": ["recording_rules.yml"],
+        "scrape_configs": scrape_configs,
+        "remote_write": [remote_write]
+    }
+    os.makedirs(output_dir, exist_ok=True)
+    # json is valid yaml
+    with open(os.path.join(output_dir, "prometheus.yml"), "w") as f:
+        f.write(json.dumps(config, indent=2))
+    with open(os.path.join(output_dir, "recording_rules.yml"), "w") as f:
+        f.write(json.dumps(rules, indent=2))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the Prometheus remote write of the web server SLIs locally")
+    commands = parser.add_subparsers(dest="command", required=True)
+    receive = commands.add_parser("receive", help="Run the remote write stand-in")
+    receive.add_argument("--port", type=int, default=9201)
+    render_command = commands.add_parser("render", help="Write the prometheus.yml and rules of an environment")
+    render_command.add_argument("--environment", default=os.environ.get("ENVIRONMENT", "dev"))
+    render_command.add_argument("--output-dir", default="prometheus")
+    render_command.add_argument("--remote-write-url", default=f"http://host.docker.internal:9201{REMOTE_WRITE_PATH}")
+    render_command.add_argument("--target", default="host.docker.internal:9113",
+                                help="Web server metrics endpoint scraped by the local Prometheus")
+    args = parser.parse_args(argv)
+
+    if args.command == "receive":
+        receiver = RemoteWriteReceiver(args.port)
+        print(f"Receiving remote writes on {receiver.url}")
+        try:
+            receiver.server.serve_forever()
+        except KeyboardInterrupt:
+            print(f"{len(receiver.batches)} batches, {sum(receiver.batches)} bytes, {receiver.rejected} rejected")
+        return
+
+    params = Environment.from_file(env_path=f"infrastructure/parameters/{args.environment}.json",
+                                   uncommitted_env_path=None)
+    render(params, args.output_dir, args.remote_write_url, [{
+        "job_name": "web-server",
+        "metrics_path": params.eks.web_server_metrics.path,
+        "static_configs": [{"targets": [args.target], "labels": {"namespace": "default", "pod": "local"}}]
+    }])
+    print(f"Written {args.output_dir}/prometheus.yml and {args.output_dir}/recording_rules.yml")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Synth profiling harness.
+
+Run with `python -m infrastructure.utils.profiling [--output report.json]` from the repository root:
+the app is built exactly like app.py does and the time spent constructing every nested stack
+and construct is reported together with the nested stacks changed since the last cached synth.
+"""
+import argparse
+import functools
+import json
+import os
+import tempfile
+import time
+
+from contextlib import contextmanager
+
+from aws_cdk import core
+
+from infrastructure.infrastructure_stack import InfrastructureStack
+from infrastructure.stacks.alb_ingress_stack import ALBIngressController
+from infrastructure.stacks.argo_rollouts_stack import ArgoRollouts
+from infrastructure.stacks.cdn_stack import CdnStack
+from infrastructure.stacks.cluster_autoscaler_stack import ClusterAutoscaler
+from infrastructure.stacks.ebs_csi_driver_stack import EbsCsiDriver
+from infrastructure.stacks.eks_stack import EksStack
+from infrastructure.stacks.metrics_server_stack import MetricsServerManifest
+from infrastructure.stacks.node_pool_stack import SpotNodePool
+from infrastructure.stacks.node_profile_stack import NodeProfile
+from infrastructure.stacks.node_termination_handler_stack import NodeTerminationHandler
+from infrastructure.stacks.pipeline_stack import PipelineStack
+from infrastructure.stacks.prometheus_stack import Prometheus
+from infrastructure.stacks.vpc_stack import VpcStack
+from infrastructure.stacks.web_server_image_stack import WebServerImage
+from infrastructure.utils.environment import Environment
+from infrastructure.utils.synth_cache import SynthCache
+
+PROFILED_CONSTRUCTS = [VpcStack, EksStack, ALBIngressController, MetricsServerManifest, NodeProfile, SpotNodePool,
+                       NodeTerminationHandler, ClusterAutoscaler, WebServerImage, ArgoRollouts, EbsCsiDriver,
+                       Prometheus, CdnStack, PipelineStack]
+
+
+class SynthProfiler:
+    def __init__(self):
+        self.timings = []
+        self._depth = 0
+
+    @contextmanager
+    def measure(self, name: str):
+        entry = {"name": name, "depth": self._depth, "seconds": None}
+        self.timings.append(entry)
+        self._depth += 1
+        start = time.perf_counter()
+        try:
+            yield entry
+        finally:
+            entry["seconds"] = round(time.perf_counter() - start, 3)
+            self._depth -= 1
+
+    def instrument(self, cls) -> None:
+        original_init = cls.__init__
+        profiler = self
+
+        @functools.wraps(original_init)
+        def timed_init(construct, scope, id, *args, **kwargs):
+            with profiler.measure(f"{cls.__name__}({id})"):
+                original_init(construct, scope, id, *args, **kwargs)
+
+        cls.__init__ = timed_init
+
+    def report(self) -> dict:
+        return {"timings": self.timings, "total_seconds": sum(t["seconds"] for t in self.timings if t["depth"] == 0)}
+
+    def format(self) -> str:
+        return "\n".join(f"{'  ' * t['depth']}{t['name']}: {t['seconds']:.3f}s" for t in self.timings)
+
+
+def profile_synth(env_name: str, uncommitted_env_path: str, outdir: str):
+    env_path = f"infrastructure/parameters/{env_name}.json"
+    profiler = SynthProfiler()
+    for cls in PROFILED_CONSTRUCTS:
+        profiler.instrument(cls)
+
+    with profiler.measure("Environment.from_file"):
+        params = Environment.from_file(env_path=env_path, uncommitted_env_path=uncommitted_env_path)
+
+    app = core.App(outdir=outdir)
+    with profiler.measure("InfrastructureStack"):
+        InfrastructureStack(app, "CC-MainStack", env=core.Environment(region="eu-west-1"), params=params)
+    with profiler.measure("App.synth"):
+        app.synth()
+
+    report = profiler.report()
+    report["changed_stacks"] = SynthCache(cache_dir=os.environ.get("CDK_SYNTH_CACHE", ".cdk-synth-cache"),
+                                          env_path=env_path).changed_stacks()
+    return report, profiler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile the synthesis of the CDK app")
+    parser.add_argument("--environment", default=os.environ.get("ENVIRONMENT", "dev"))
+    parser.add_argument("--uncommitted-env-path", default="infrastructure/parameters/uncommitted/.env.json")
+    parser.add_argument("--output", help="Path of the json report")
+    args = parser.parse_args(argv)
+
+    uncommitted_env_path = args.uncommitted_env_path if os.path.exists(args.uncommitted_env_path) else None
+    with tempfile.TemporaryDirectory() as outdir:
+        report, profiler = profile_synth(args.environment, uncommitted_env_path, outdir)
+
+    print(profiler.format())
+    print(f"Changed nested stacks: {', '.join(report['changed_stacks']) or 'none'}")
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
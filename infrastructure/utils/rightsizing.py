@@ -0,0 +1,131 @@
+"""Right-sizing of the web server resources.
+
+Derives the requests and limits of `eks.web_server_resources` from the cpu and memory usage of the web server pods
+recorded by Prometheus (see `infrastructure.utils.monitoring`): the cpu request covers the p95 usage of the busiest
+pod and the memory request its peak working set, both with a headroom. The QoS class and the limit to request ratios
+of the current parameters are kept.
+
+    kubectl -n prometheus port-forward svc/prometheus-server 9090:80
+    python -m infrastructure.utils.rightsizing --environment prod --window 7d
+"""
+import argparse
+import json
+import math
+import os
+import urllib.parse
+import urllib.request
+
+from infrastructure.utils.capacity import parse_cpu, parse_memory
+from infrastructure.utils.environment import Environment
+from infrastructure.utils.monitoring import POD_CPU_USAGE, POD_MEMORY_WORKING_SET
+
+# Granularity of the recommended quantities
+CPU_STEP_MILLIS = 50
+MEMORY_STEP_MIB = 16
+
+
+class PrometheusClient:
+    def __init__(self, url: str, urlopen=urllib.request.urlopen):
+        self.url = url.rstrip("/")
+        self.urlopen = urlopen
+
+    def query(self, expr: str) -> list:
+        """Values of the instant vector returned by an expression."""
+        with self.urlopen(f"{self.url}/api/v1/query?{urllib.parse.urlencode({'query': expr})}") as response:
+            body = json.loads(response.read())
+        if body.get("status") != "success":
+            raise RuntimeError(f"Prometheus query {expr} failed: {body.get('error')}")
+        return [float(sample["value"][1]) for sample in body["data"]["result"]]
+
+
+def observed_usage(client: PrometheusClient, namespace: str, window: str) -> dict:
+    cpu = f'{POD_CPU_USAGE}{{namespace="{namespace}"}}[{window}]'
+    memory = f'{POD_MEMORY_WORKING_SET}{{namespace="{namespace}"}}[{window}]'
+    queries = {
+        "pods": f"count(count_over_time({cpu}))",
+        "cpu_p95": f"max(quantile_over_time(0.95, {cpu}))",
+        "cpu_max": f"max(max_over_time({cpu}))",
+        "memory_max": f"max(max_over_time({memory}))"
+    }
+    results = {name: client.query(expr) for name, expr in queries.items()}
+    if not all(results.values()):
+        raise ValueError(f"No web server usage recorded in the {namespace} namespace over the last {window}")
+    return {
+        "pods": int(results["pods"][0]),
+        "cpu_p95_millis": round(results["cpu_p95"][0] * 1000),
+        "cpu_max_millis": round(results["cpu_max"][0] * 1000),
+        "memory_max_mib": round(results["memory_max"][0] / (1024 * 1024))
+    }
+
+
+def round_up(value: float, step: int) -> int:
+    return max(step, math.ceil(value / step) * step)
+
+
+def format_cpu(millis: int) -> str:
+    return str(millis // 1000) if millis % 1000 == 0 else f"{millis}m"
+
+
+def format_memory(mib: int) -> str:
+    return f"{mib}Mi"
+
+
+def recommend(resources_params, usage: dict, headroom: float = 0.2) -> dict:
+    """Resources in the format of `eks.web_server_resources` sized for the observed usage."""
+    integer_cpus = resources_params.get("integer_cpus", False)
+    cpu_millis = round_up(usage["cpu_p95_millis"] * (1 + headroom), 1000 if integer_cpus else CPU_STEP_MILLIS)
+    memory_mib = round_up(usage["memory_max_mib"] * (1 + headroom), MEMORY_STEP_MIB)
+    recommended = {
+        "qos": resources_params.qos,
+        "requests": {"cpu": format_cpu(cpu_millis), "memory": format_memory(memory_mib)},
+        "integer_cpus": integer_cpus
+    }
+    limits_params = resources_params.get("limits", None)
+    if resources_params.qos == "Burstable" and limits_params:
+        limits = {}
+        if limits_params.get("cpu", None):
+            ratio = parse_cpu(limits_params.cpu) / parse_cpu(resources_params.requests.cpu)
+            limits["cpu"] = format_cpu(round_up(cpu_millis * ratio, CPU_STEP_MILLIS))
+        if limits_params.get("memory", None):
+            ratio = parse_memory(limits_params.memory) / parse_memory(resources_params.requests.memory)
+            limits["memory"] = format_memory(round_up(memory_mib * ratio, MEMORY_STEP_MIB))
+        recommended["limits"] = limits
+    return recommended
+
+
+def report(params, usage: dict, headroom: float = 0.2) -> dict:
+    resources_params = params.eks.web_server_resources
+    recommended = recommend(resources_params, usage, headroom)
+    result = {
+        "observed": usage,
+        "utilization": {
+            "cpu": round(usage["cpu_p95_millis"] / parse_cpu(resources_params.requests.cpu), 2),
+            "memory": round(usage["memory_max_mib"] / parse_memory(resources_params.requests.memory), 2)
+        },
+        "recommended": {"web_server_resources": recommended}
+    }
+    if recommended["integer_cpus"]:
+        # One nginx worker per exclusive core
+        result["recommended"]["web_server_nginx"] = {
+            "worker_processes": parse_cpu(recommended["requests"]["cpu"]) // 1000
+        }
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recommend the web server resources from its recorded usage")
+    parser.add_argument("--environment", default=os.environ.get("ENVIRONMENT", "dev"))
+    parser.add_argument("--prometheus-url", default="http://localhost:9090")
+    parser.add_argument("--namespace", default="default")
+    parser.add_argument("--window", default="7d", help="Range of the usage considered, as a Prometheus duration")
+    parser.add_argument("--headroom", type=float, default=0.2, help="Share added to the observed usage")
+    args = parser.parse_args(argv)
+
+    params = Environment.from_file(env_path=f"infrastructure/parameters/{args.environment}.json",
+                                   uncommitted_env_path=None)
+    usage = observed_usage(PrometheusClient(args.prometheus_url), args.namespace, args.window)
+    print(json.dumps(report(params, usage, args.headroom), indent=2))
+
+
+if __name__ == "__main__":
+    main()
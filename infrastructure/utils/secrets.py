@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import time
+
+from abc import ABC, abstractmethod
+from typing import Optional
+
+import boto3
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "ccekswebserver", "secrets.json")
+DEFAULT_CACHE_TTL_SECONDS = 3600
+
+
+class SecretProvider(ABC):
+    """Returns the json payload of a secret, or None when the backend doesn't know it."""
+
+    @abstractmethod
+    def get_secret(self, secret_id: str) -> Optional[dict]:
+        pass
+
+
+class EnvironmentSecretProvider(SecretProvider):
+    """Reads the secret payload from an environment variable named after the secret id.
+
+    e.g. the secret `simple_eks_secret_github_token` is read from `SIMPLE_EKS_SECRET_GITHUB_TOKEN`.
+    """
+
+    def __init__(self, environ: Optional[dict] = None):
+        self.environ = os.environ if environ is None else environ
+
+    @staticmethod
+    def variable_name(secret_id: str) -> str:
+        return re.sub(r"[^A-Za-z0-9]", "_", secret_id).upper()
+
+    def get_secret(self, secret_id: str) -> Optional[dict]:
+        value = self.environ.get(self.variable_name(secret_id))
+        return json.loads(value) if value else None
+
+
+class SecretsManagerSecretProvider(SecretProvider):
+    def __init__(self, client=None):
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = boto3.client("secretsmanager")
+        return self._client
+
+    def get_secret(self, secret_id: str) -> Optional[dict]:
+        secret = self.client.get_secret_value(SecretId=secret_id)
+        return json.loads(secret['SecretString'])
+
+
+class FileCacheSecretProvider(SecretProvider):
+    """Caches the secrets returned by another provider in a local file for `ttl_seconds`."""
+
+    def __init__(self, source: SecretProvider, path: str = DEFAULT_CACHE_PATH,
+                 ttl_seconds: int = DEFAULT_CACHE_TTL_SECONDS, clock=time.time):
+        self.source = source
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+
+    def _read(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r") as f:
+            return json.loads(f.read())
+
+    def _write(self, entries: dict) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(json.dumps(entries))
+
+    def get_secret(self, secret_id: str) -> Optional[dict]:
+        entries = self._read()
+        entry = entries.get(secret_id)
+        if entry and self.clock() - entry["fetched_at"] < self.ttl_seconds:
+            return entry["value"]
+
+        value = self.source.get_secret(secret_id)
+        if value is not None:
+            entries[secret_id] = {"value": value, "fetched_at": self.clock()}
+            self._write(entries)
+        return value
+
+
+class ChainSecretProvider(SecretProvider):
+    def __init__(self, *providers: SecretProvider):
+        self.providers = providers
+
+    def get_secret(self, secret_id: str) -> Optional[dict]:
+        for provider in self.providers:
+            value = provider.get_secret(secret_id)
+            if value is not None:
+                return value
+        return None
+
+
+def default_secret_provider() -> SecretProvider:
+    """Environment variables first, then Secrets Manager behind the local file cache.
+
+    The cache is configured with `SECRETS_CACHE_PATH` and `SECRETS_CACHE_TTL` (seconds, 0 disables it).
+    """
+    ttl_seconds = int(os.environ.get("SECRETS_CACHE_TTL", DEFAULT_CACHE_TTL_SECONDS))
+    secrets_manager = SecretsManagerSecretProvider()
+    if ttl_seconds <= 0:
+        return ChainSecretProvider(EnvironmentSecretProvider(), secrets_manager)
+    return ChainSecretProvider(
+        EnvironmentSecretProvider(),
+        FileCacheSecretProvider(secrets_manager, path=os.environ.get("SECRETS_CACHE_PATH", DEFAULT_CACHE_PATH),
+                                ttl_seconds=ttl_seconds)
+    )
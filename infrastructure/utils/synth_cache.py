@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import shutil
+
+from typing import Optional
+
+ROOT_DIR = os.path.abspath(f"{os.path.dirname(__file__)}/../..")
+
+# Inputs that end up in the cloud assembly: any change to them invalidates the cached synth.
+APP_SOURCES = ["app.py", "cdk.json", "infrastructure", "helm", "images"]
+APP_ENVIRONMENT_VARIABLES = ["ENVIRONMENT", "CDK_DEFAULT_ACCOUNT", "CDK_DEFAULT_REGION", "CDK_CONTEXT_JSON"]
+
+# Sources and parameter sections each nested stack is built from
+STACK_SOURCES = {
+    "VpcStack": {
+        "paths": ["infrastructure/stacks/vpc_stack.py", "infrastructure/utils"],
+        "params": ["vpc", "eks"]
+    },
+    "EksStack": {
+        "paths": ["infrastructure/stacks/eks_stack.py", "infrastructure/stacks/alb_ingress_stack.py",
+                  "infrastructure/stacks/metrics_server_stack.py", "infrastructure/stacks/cluster_autoscaler_stack.py",
+                  "infrastructure/stacks/node_pool_stack.py", "infrastructure/stacks/node_profile_stack.py",
+                  "infrastructure/stacks/node_termination_handler_stack.py",
+                  "infrastructure/stacks/web_server_image_stack.py",
+                  "infrastructure/stacks/argo_rollouts_stack.py", "infrastructure/stacks/prometheus_stack.py",
+                  "infrastructure/stacks/ebs_csi_driver_stack.py", "infrastructure/utils", "helm", "images"],
+        "params": ["eks", "vpc"]
+    },
+    "CdnStack": {
+        "paths": ["infrastructure/stacks/cdn_stack.py"],
+        "params": ["name", "cdn"]
+    },
+    "PipelineStack": {
+        "paths": ["infrastructure/stacks/pipeline_stack.py"],
+        "params": ["name", "branch", "ci_cd_enabled", "git_repository_name", "github_repository_owner",
+                   "github_token_secret_name", "pipeline"]
+    }
+}
+
+IGNORED_NAMES = {"__pycache__", "tests", ".pytest_cache"}
+
+
+def _iter_files(path: str):
+    if os.path.isfile(path):
+        yield path
+        return
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if d not in IGNORED_NAMES)
+        for name in sorted(files):
+            if not name.endswith(".pyc"):
+                yield os.path.join(root, name)
+
+
+def fingerprint(paths: list, extra: Optional[dict] = None, root: str = ROOT_DIR) -> str:
+    digest = hashlib.sha256()
+    for path in paths:
+        for file_path in _iter_files(os.path.join(root, path)):
+            digest.update(os.path.relpath(file_path, root).encode())
+            with open(file_path, "rb") as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+    digest.update(json.dumps(extra or {}, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+class SynthCache:
+    """Content addressed cache of the cloud assembly produced by app.py.
+
+    Nested stacks are synthesized together with their parent, so a cache hit restores the
+    whole assembly while the per stack fingerprints tell which nested stacks actually changed.
+    The uncommitted values embedded in the assembly (the github token of the pipeline secret) are
+    part of the key through their hash, so that a rotated token is never restored stale.
+    """
+
+    def __init__(self, cache_dir: str, env_path: str, max_entries: int = 5, root: str = ROOT_DIR,
+                 uncommitted: Optional[dict] = None):
+        self.cache_dir = cache_dir
+        self.env_path = env_path
+        self.max_entries = max_entries
+        self.root = root
+        extra = {name: os.environ.get(name) for name in APP_ENVIRONMENT_VARIABLES}
+        if uncommitted:
+            extra["uncommitted"] = hashlib.sha256(json.dumps(uncommitted, sort_keys=True).encode()).hexdigest()
+        self.key = fingerprint(APP_SOURCES + [env_path], extra=extra, root=root)
+
+    @classmethod
+    def from_environment(cls, env_path: str, params) -> Optional["SynthCache"]:
+        cache_dir = os.environ.get("CDK_SYNTH_CACHE")
+        if not cache_dir:
+            return None
+        # Only the pipeline stack embeds uncommitted values, the secret isn't fetched otherwise
+        uncommitted = params.uncommitted_values() if params.get("ci_cd_enabled", False) else None
+        return cls(cache_dir=cache_dir, env_path=env_path, uncommitted=uncommitted)
+
+    @property
+    def entry_path(self) -> str:
+        return os.path.join(self.cache_dir, self.key)
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.cache_dir, "index.json")
+
+    def stack_fingerprints(self) -> dict:
+        with open(os.path.join(self.root, self.env_path), "r") as f:
+            params = json.loads(f.read())
+        return {
+            stack: fingerprint(sources["paths"], extra={key: params.get(key) for key in sources["params"]},
+                               root=self.root)
+            for stack, sources in STACK_SOURCES.items()
+        }
+
+    def _read_index(self) -> dict:
+        if not os.path.exists(self.index_path):
+            return {}
+        with open(self.index_path, "r") as f:
+            return json.loads(f.read())
+
+    def changed_stacks(self) -> list:
+        previous = self._read_index().get("stacks", {})
+        return [stack for stack, value in self.stack_fingerprints().items() if previous.get(stack) != value]
+
+    def restore(self, outdir: str) -> bool:
+        if not os.path.exists(os.path.join(self.entry_path, "manifest.json")):
+            return False
+        shutil.copytree(self.entry_path, outdir, dirs_exist_ok=True)
+        os.utime(self.entry_path)
+        return True
+
+    def store(self, outdir: str) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        if os.path.exists(self.entry_path):
+            shutil.rmtree(self.entry_path)
+        shutil.copytree(outdir, self.entry_path)
+        with open(self.index_path, "w") as f:
+            f.write(json.dumps({"key": self.key, "stacks": self.stack_fingerprints()}, indent=2))
+        self._prune()
+
+    def _prune(self) -> None:
+        entries = sorted(
+            (os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+             if os.path.isdir(os.path.join(self.cache_dir, name))),
+            key=os.path.getmtime, reverse=True
+        )
+        for entry in entries[self.max_entries:]:
+            shutil.rmtree(entry)